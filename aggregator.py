@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+窗口聚合
+在一个时间窗口内按订阅源、频道或主题收集条目，把各条目中的编号内容合并去重并排序，
+每个窗口只发送一条汇总消息（可选把其余内容放进线程回复），API 调用次数随窗口数而不是条目数增长
+"""
+
+import re
+import threading
+import time
+
+# format_message_for_channel_a 输出的单条格式: "1. 内容 <链接|【详情】>"
+ITEM_PATTERN = re.compile(r'^(\d+)\.\s*(.*?)(?:\s*<([^|>]+)\|【详情】>)?$', re.S)
+DATE_PATTERN = re.compile(r'[｜|]?\s*\d{4}/\d{1,2}/\d{1,2}')
+
+
+def topic_of(entry):
+    """条目主题：去掉日期后的标题"""
+    return DATE_PATTERN.sub('', entry.get('title', '')).strip() or '其他'
+
+
+def parse_item(line):
+    """把一条编号内容拆成 (序号, 文本, 链接)"""
+    match = ITEM_PATTERN.match(line.strip())
+    if not match:
+        return None
+    return int(match.group(1)), match.group(2).strip(), match.group(3)
+
+
+def item_key(text, link):
+    """去重键：优先用链接，没有链接时用规范化后的文本"""
+    if link:
+        return link.rstrip('/')
+    return re.sub(r'[\W_]+', '', text).lower()
+
+
+def rank_items(item_lists):
+    """合并多个条目的编号内容：出现次数多的在前，其次原序号靠前的在前，再按先出现的顺序"""
+    merged = {}
+    for items in item_lists:
+        for line in items:
+            parsed = parse_item(line)
+            if not parsed:
+                continue
+            position, text, link = parsed
+            key = item_key(text, link)
+            if not key:
+                continue
+            item = merged.get(key)
+            if item is None:
+                merged[key] = {'text': text, 'link': link, 'count': 1, 'position': position, 'order': len(merged)}
+            else:
+                item['count'] += 1
+                item['position'] = min(item['position'], position)
+                item['link'] = item['link'] or link
+    return sorted(merged.values(), key=lambda item: (-item['count'], item['position'], item['order']))
+
+
+class DigestWindow:
+    """一个聚合窗口：同一频道、同一分组键下收集到的条目"""
+
+    def __init__(self, key, workspace, channel):
+        self.key = key
+        self.workspace = workspace
+        self.channel = channel
+        self.opened = time.time()
+        self.entries = {}  # 条目ID -> (条目, 编号内容, 格式化后的消息, 内容哈希)
+        self.feeds = set()
+        self.attempts = 0  # 发送失败的次数
+
+    def add(self, feed_name, entry_id, entry, items, message, content_hash):
+        # 同一条目在窗口内多次出现时保留最新版本
+        self.entries[entry_id] = (entry, items, message, content_hash)
+        self.feeds.add(feed_name)
+
+
+class DigestAggregator:
+    """按窗口收集条目，到期后交给调用方发送"""
+
+    GROUP_BY = ('feed', 'channel', 'topic')
+
+    def __init__(self, window_seconds, group_by='feed', max_items=10):
+        if group_by not in self.GROUP_BY:
+            raise ValueError(f"不支持的聚合方式: {group_by}")
+        self.window_seconds = window_seconds
+        self.group_by = group_by
+        self.max_items = max_items
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def group_key(self, feed_name, entry, workspace, channel):
+        # 消息总是发到具体频道，分组键里始终包含工作区和频道
+        base = (workspace.name, channel)
+        if self.group_by == 'feed':
+            return base + (feed_name,)
+        if self.group_by == 'topic':
+            return base + (topic_of(entry),)
+        return base
+
+    def add(self, feed_name, entry_id, entry, items, message, content_hash, workspace, channel):
+        """把一个条目放进对应窗口"""
+        key = self.group_key(feed_name, entry, workspace, channel)
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None:
+                window = self.windows[key] = DigestWindow(key, workspace, channel)
+            window.add(feed_name, entry_id, entry, items, message, content_hash)
+
+    def is_pending(self, entry_id, channel, content_hash):
+        """条目是否已在某个未发送的窗口中"""
+        with self.lock:
+            for window in self.windows.values():
+                pending = window.entries.get(entry_id)
+                if window.channel == channel and pending and pending[3] == content_hash:
+                    return True
+        return False
+
+    def pop_due(self, force=False):
+        """取出已到期的窗口，force=True 时取出全部"""
+        now = time.time()
+        with self.lock:
+            due = [key for key, window in self.windows.items()
+                   if force or now - window.opened >= self.window_seconds]
+            return [self.windows.pop(key) for key in due]
+
+    def restore(self, window):
+        """发送失败的窗口放回去，下次 pop_due 时重试；期间同一分组新开的窗口并入其中（新内容优先）"""
+        with self.lock:
+            newer = self.windows.get(window.key)
+            if newer is not None:
+                window.entries.update(newer.entries)
+                window.feeds |= newer.feeds
+            self.windows[window.key] = window
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+异步守护进程
+订阅源抓取、推送队列和过期消息删除是三个独立的 asyncio 任务，各自使用单独的线程池执行阻塞调用：
+抓取慢不会推迟删除，删除积压也不会推迟下一次抓取。下载共用 mirror_fetch 的连接池，
+Slack 调用共用每个工作区的客户端和限流器；收到 SIGINT/SIGTERM 后停止接收新任务，发送完队列中的内容、
+等待进行中的调用结束后再退出
+"""
+
+import asyncio
+import signal
+from concurrent.futures import ThreadPoolExecutor
+import schedule
+from config import Config
+
+
+class AsyncDaemon:
+    """以 asyncio 任务运行机器人的抓取、推送和删除"""
+
+    def __init__(self, bot, tick_seconds=60, reap_seconds=None):
+        self.bot = bot
+        self.tick_seconds = tick_seconds
+        self.reap_seconds = reap_seconds or Config.REAP_INTERVAL_SECONDS
+        self.loop = None
+        self.stop_event = None
+        self.queues = {}  # 工作区名称 -> 推送队列，同一工作区按入队顺序发送
+        self.consumers = {}  # 工作区名称 -> 推送任务，任务退出后再入队时重新创建
+        self.flush_future = None  # 后台发送到期聚合窗口的调用
+        # 每类任务一个线程池，一类任务的阻塞调用不会占用其他任务的线程
+        self.executors = {
+            'fetch': ThreadPoolExecutor(max_workers=1, thread_name_prefix='fetch'),
+            'post': ThreadPoolExecutor(max_workers=Config.ASYNC_POST_WORKERS, thread_name_prefix='post'),
+            'reap': ThreadPoolExecutor(max_workers=1, thread_name_prefix='reap'),
+        }
+
+    async def run_blocking(self, kind, func, *args):
+        """在对应的线程池中执行阻塞调用"""
+        return await self.loop.run_in_executor(self.executors[kind], func, *args)
+
+    async def sleep(self, seconds):
+        """等待 seconds 秒，收到停止信号时提前返回 False"""
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), seconds)
+            return False
+        except asyncio.TimeoutError:
+            return True
+
+    def put(self, entry, content, channel, workspace, feed=None):
+        """供抓取线程、Telegram 监听和推送接收线程调用，把推送交给事件循环"""
+        try:
+            self.loop.call_soon_threadsafe(self.enqueue, (entry, content, channel, workspace, feed))
+        except RuntimeError:
+            # 事件循环已关闭（正在退出），在当前线程直接推送
+            self.bot.deliver_or_defer(entry, content, channel, workspace, feed)
+
+    def enqueue(self, item):
+        name = item[3].name
+        queue = self.queues.get(name)
+        if queue is None:
+            queue = self.queues[name] = asyncio.Queue()
+        queue.put_nowait(item)
+        consumer = self.consumers.get(name)
+        if consumer is None or consumer.done():
+            # 退出中推送任务已经结束时，重新创建一个把新内容发完
+            self.consumers[name] = asyncio.create_task(self.post_loop(name, queue))
+
+    async def post_loop(self, name, queue):
+        """推送任务：按入队顺序推送一个工作区的内容，速度由该工作区的限流器决定；收到停止信号后发完队列中的内容再退出"""
+        while True:
+            if queue.empty():
+                if self.stop_event.is_set():
+                    break
+                getter = asyncio.ensure_future(queue.get())
+                stopper = asyncio.ensure_future(self.stop_event.wait())
+                done, _ = await asyncio.wait({getter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+                stopper.cancel()
+                if getter not in done:
+                    getter.cancel()
+                    continue
+                item = getter.result()
+            else:
+                item = queue.get_nowait()
+            try:
+                await self.run_blocking('post', self.bot.deliver_or_defer, *item)
+            except Exception as e:
+                print(f"❌ 推送失败 {name}: {type(e).__name__}: {e}")
+
+    async def drain(self):
+        """等待所有推送任务发完队列后退出；等待期间新入队的内容会创建新的推送任务，一并等待"""
+        while True:
+            # 先让出一次事件循环，其他线程已经提交的入队回调在这里执行
+            await asyncio.sleep(0)
+            pending = [task for task in self.consumers.values() if not task.done()]
+            if not pending:
+                return
+            await asyncio.gather(*pending)
+
+    def start_flush(self):
+        """在推送线程池发送到期的聚合窗口，上一次还没结束时不重复提交"""
+        if self.flush_future is not None and not self.flush_future.done():
+            return
+        self.flush_future = self.loop.run_in_executor(self.executors['post'], self.bot.flush_digests)
+        self.flush_future.add_done_callback(self.report_flush)
+
+    @staticmethod
+    def report_flush(future):
+        if not future.cancelled() and future.exception() is not None:
+            e = future.exception()
+            print(f"❌ 发送聚合消息失败: {type(e).__name__}: {e}")
+
+    async def fetch_loop(self):
+        """抓取任务：启动时抓取一次，之后按定时抓取，并重试上一轮推迟的工作"""
+        if Config.INGEST_MODE == 'rss':
+            await self.run_blocking('fetch', self.bot.fetch_and_process)
+            self.bot.schedule_fetches()
+        while await self.sleep(self.tick_seconds):
+            try:
+                if self.bot.scheduled_time:
+                    self.bot.schedule_fetches()
+                await self.run_blocking('fetch', schedule.run_pending)
+                await self.run_blocking('fetch', self.bot.retry_deferred)
+                # 聚合窗口到期后在推送线程池发送，不阻塞抓取，退出时等待完成
+                if self.bot.aggregator:
+                    self.start_flush()
+            except Exception as e:
+                print(f"❌ 抓取任务错误: {type(e).__name__}: {e}")
+
+    async def reap_loop(self):
+        """删除任务：定期删除到期消息并写回状态"""
+        while True:
+            try:
+                await self.run_blocking('reap', self.bot.delete_expired_messages)
+                await self.run_blocking('reap', self.bot.state_store.flush)
+            except Exception as e:
+                print(f"❌ 删除任务错误: {type(e).__name__}: {e}")
+            if not await self.sleep(self.reap_seconds):
+                break
+
+    def request_stop(self, signum):
+        if not self.stop_event.is_set():
+            print(f"\n🛑 收到信号 {signal.Signals(signum).name}，正在退出...")
+            self.stop_event.set()
+
+    async def main(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(signum, self.request_stop, signum)
+
+        self.bot.delivery_queue = self
+        if Config.INGEST_MODE == 'telegram':
+            self.bot.start_telegram_listener()
+        elif Config.INGEST_MODE == 'push':
+            self.bot.start_push_receiver()
+        self.bot.start_config_watcher()
+
+        tasks = [asyncio.create_task(self.fetch_loop(), name='fetch'),
+                 asyncio.create_task(self.reap_loop(), name='reap')]
+        await asyncio.gather(*tasks)
+
+        # 之后的推送由调用线程直接发送；已入队和退出过程中入队的内容全部发完
+        self.bot.delivery_queue = None
+        await self.drain()
+        if self.flush_future is not None:
+            await asyncio.wait([self.flush_future])
+        await self.run_blocking('post', self.bot.flush_digests, True)
+        for executor in self.executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+        self.bot.state_store.flush()
+        if self.bot.coordinator:
+            self.bot.coordinator.leave()
+        self.bot.config_watcher.stop()
+        print("✅ 已退出")
+
+    def run(self):
+        print("🚀 RSS抓取机器人启动（异步守护进程）")
+        print(f"🏢 工作区: {', '.join(self.bot.workspaces.workspaces)}")
+        print(f"⏰ 执行时间: 每周一到周五 {self.bot.settings.schedule_time}，删除检查每 {self.reap_seconds} 秒")
+        print("=" * 50)
+        asyncio.run(self.main())
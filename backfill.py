@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+历史回填
+按日期范围把订阅源的历史条目重新推送到 Slack，条目来自订阅源（跟随 rel="next" 分页链接）或保存的订阅源文件。
+沿用主程序的关键词过滤、格式化和消息索引去重；各频道并行、按工作区限流满速发送，定期写入断点，结束时输出汇总
+"""
+
+import argparse
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+import feedparser
+from config import Config
+from formatting import expire_notice
+from log_utils import get_logger, log, ProgressReporter
+from mirror_fetch import download
+from push_receiver import entry_key
+from resilience import CircuitOpen, DeadlineExceeded
+from rss_to_slack import RSSSlackBot
+from workspaces import DEFAULT_FEED
+
+logger = get_logger('backfill')
+
+TITLE_DATE = re.compile(r'(\d{4})/(\d{1,2})/(\d{1,2})')
+
+
+def entry_date(entry):
+    """条目对应的日期：优先取标题中的榜单日期，其次取发布时间"""
+    match = TITLE_DATE.search(entry.get('title', ''))
+    if match:
+        return date(*map(int, match.groups()))
+    if entry.get('published_parsed'):
+        return date(*entry.published_parsed[:3])
+    return None
+
+
+def next_page_url(feed):
+    """订阅源声明的下一页（更早条目）地址"""
+    for link in feed.feed.get('links', []):
+        if link.get('rel') == 'next' and link.get('href'):
+            return link['href']
+    return None
+
+
+class Backfill:
+    """一次回填任务"""
+
+    def __init__(self, bot, since, until, feed_name=DEFAULT_FEED, expire=False, checkpoint_every=20):
+        self.bot = bot
+        self.since = since
+        self.until = until
+        self.feed_name = feed_name
+        self.expire = expire
+        self.checkpoint_every = checkpoint_every
+        self.lock = threading.Lock()
+        # 断点按订阅源和日期范围区分，记录已完成的 条目|频道
+        self.checkpoint_name = f"backfill_{feed_name}_{since:%Y%m%d}_{until:%Y%m%d}"
+        self.done = set(bot.state_store.load(self.checkpoint_name, {}).get('done', []))
+        self.pending_marks = 0
+        self.progress = None
+        self.skipped = 0
+
+    def fetch_page(self, target):
+        """抓取一页：镜像上的路径走对冲抓取，其他地址直接下载"""
+        for mirror in self.bot.mirror_pool.mirrors:
+            if target.startswith(mirror):
+                target = target[len(mirror):]
+                break
+        if not target.startswith('http'):
+            return self.bot.fetch_rss_with_headers(target)
+        return feedparser.parse(download(target, {}, self.bot.mirror_pool.max_bytes))
+
+    def iter_feed(self, path, max_pages=50):
+        """按页读取订阅源，直到没有下一页或整页都早于起始日期"""
+        target = path
+        seen = set()
+        for _ in range(max_pages):
+            if target in seen:
+                break
+            seen.add(target)
+            feed = self.fetch_page(target)
+            if not feed or not feed.entries:
+                break
+            log(logger, logging.INFO, "📄 读取订阅源分页", page=len(seen), entries=len(feed.entries))
+            yield from feed.entries
+            dates = [d for d in map(entry_date, feed.entries) if d]
+            if dates and max(dates) < self.since:
+                break
+            target = next_page_url(feed)
+            if not target:
+                break
+
+    def iter_files(self, paths):
+        """读取保存的订阅源文件"""
+        for path in paths:
+            feed = feedparser.parse(path)
+            log(logger, logging.INFO, "📄 读取订阅源文件", path=path, entries=len(feed.entries))
+            yield from feed.entries
+
+    def collect(self, entries):
+        """筛选日期范围内且符合关键词的条目，同一条目只保留最先读到的版本，按日期从旧到新排列"""
+        selected = {}
+        for entry in entries:
+            day = entry_date(entry)
+            if not day or not self.since <= day <= self.until:
+                continue
+            if not self.bot.should_include_message(entry.get('title', ''), entry.get('summary', '')):
+                continue
+            selected.setdefault(entry_key(entry), (day, entry))
+        return sorted(selected.values(), key=lambda item: item[0])
+
+    def save_checkpoint(self):
+        self.bot.state_store.save(self.checkpoint_name, {'done': sorted(self.done), 'updated': time.time()})
+        self.bot.state_store.flush()
+        self.pending_marks = 0
+
+    def post_channel(self, workspace, channel, items):
+        """按时间顺序向一个频道推送，频道之间并行，速度由工作区限流器决定"""
+        for day, entry, content in items:
+            mark = f"{entry_key(entry)}|{channel}"
+            if mark in self.done:
+                with self.lock:
+                    self.skipped += 1
+                continue
+            title = f"每日加密热点新闻榜单｜{day.year}/{day.month}/{day.day}"
+            try:
+                ts = self.bot.deliver(entry, content, channel, workspace, title, self.expire, feed=self.feed_name)
+                error = None if ts else 'deliver_failed'
+            except (CircuitOpen, DeadlineExceeded, OSError) as e:
+                # 与主程序推迟推送的情况相同：记为失败、不写断点，重新运行回填时再推送
+                ts, error = None, type(e).__name__
+            with self.lock:
+                self.progress.item(bool(ts), error=error, channel=channel, date=str(day))
+                if ts:
+                    self.done.add(mark)
+                    self.pending_marks += 1
+                    if self.pending_marks >= self.checkpoint_every:
+                        self.save_checkpoint()
+
+    def run(self, entries):
+        """执行回填，返回汇总"""
+        start = time.monotonic()
+        routes = self.bot.workspaces.routes_for(self.feed_name)
+        if not routes:
+            print(f"⚠️  订阅源 {self.feed_name} 没有配置推送频道")
+            return None
+
+        # 回填条目较多时由渲染进程池并行格式化，结果按日期顺序排列
+        selected = self.collect(entries)
+        contents = self.bot.format_messages_for_channel_a([entry for _, entry in selected])
+        items = [(day, entry, content) for (day, entry), content in zip(selected, contents)]
+        log(logger, logging.INFO, "📤 开始回填", feed=self.feed_name, since=str(self.since), until=str(self.until),
+            entries=len(items), channels=len(routes), already_done=len(self.done))
+
+        self.progress = ProgressReporter(logger, "⏪ 回填推送", len(items) * len(routes) - len(self.done))
+        aborted = []
+        with ThreadPoolExecutor(max_workers=len(routes)) as executor:
+            futures = {executor.submit(self.post_channel, workspace, channel, items): channel
+                       for workspace, channel in routes}
+            for future, channel in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    # 一个频道意外出错不影响其他频道，已完成的部分照常写入断点
+                    logger.exception("❌ 频道回填中断", extra={'fields': {'channel': channel, 'error': type(e).__name__}})
+                    aborted.append(channel)
+        self.progress.finish()
+
+        with self.lock:
+            self.save_checkpoint()
+        summary = {
+            'feed': self.feed_name,
+            'entries': len(items),
+            'channels': len(routes),
+            'delivered': self.progress.succeeded,
+            'failed': self.progress.failed,
+            'skipped': self.skipped,
+            'aborted_channels': len(aborted),
+            'seconds': round(time.monotonic() - start, 1),
+        }
+        log(logger, logging.INFO, "📊 回填完成", **summary)
+        return summary
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main():
+    """主函数"""
+    Config.load()
+    parser = argparse.ArgumentParser(description="按日期范围回填历史消息到 Slack")
+    parser.add_argument('--since', type=parse_date, required=True, help="起始日期，如 2025-06-01")
+    parser.add_argument('--until', type=parse_date, default=date.today(), help="结束日期（含），默认今天")
+    parser.add_argument('--feed', default=DEFAULT_FEED, help="订阅源名称（见 WORKSPACES_FILE）")
+    parser.add_argument('--file', nargs='+', help="从保存的订阅源文件读取，不访问网络")
+    parser.add_argument('--max-pages', type=int, default=50, help="最多跟随的分页数")
+    parser.add_argument('--expire', action='store_true', help=f"回填的消息同样在 {expire_notice(Config.DELETE_AFTER_SECONDS)}后自动删除")
+    args = parser.parse_args()
+
+    bot = RSSSlackBot()
+    backfill = Backfill(bot, args.since, args.until, args.feed, expire=args.expire)
+    if args.file:
+        entries = backfill.iter_files(args.file)
+    else:
+        path = bot.workspaces.feeds.get(args.feed)
+        if not path:
+            print(f"❌ 未知的订阅源: {args.feed}")
+            return
+        entries = backfill.iter_feed(path, args.max_pages)
+    backfill.run(entries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+HTML 转 mrkdwn 基准测试
+对比原有的正则去标签和 html_mrkdwn 流式转换在大段摘要上的耗时
+用法: python bench_html_mrkdwn.py [条目数 ...]
+"""
+
+import re
+import sys
+import timeit
+from html_mrkdwn import html_to_mrkdwn
+
+
+def make_summary(items):
+    """生成类似 rsshub 输出的摘要：编号条目、链接、实体和 <br>"""
+    parts = ['<b>SoSoValue</b> 2025/6/25<br>']
+    for i in range(1, items + 1):
+        parts.append(f'{i}/ 比特币 &amp; 以太坊 ETF 资金流入 &quot;创新高&quot; {i} – '
+                     f'<a href="https://example.com/news/{i}?a=1&amp;b=2" target="_blank">source</a><br>')
+    return ''.join(parts)
+
+
+def regex_path(content, limit):
+    """原有的后备格式化：正则去掉所有标签后按字符截断"""
+    content = re.sub(r'<[^>]+>', '', content)
+    return f"{content[:limit]}{'...' if len(content) > limit else ''}"
+
+
+def bench(func, number):
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    return best / number * 1000
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 10000]
+    print(f"{'条目数':>8} {'大小(KB)':>10} {'正则(ms)':>10} {'转换全文(ms)':>14} {'转换500字(ms)':>15}")
+    for items in sizes:
+        content = make_summary(items)
+        number = max(1, 2000 // items)
+        regex_ms = bench(lambda: regex_path(content, 500), number)
+        full_ms = bench(lambda: html_to_mrkdwn(content), number)
+        budget_ms = bench(lambda: html_to_mrkdwn(content, 500), number)
+        print(f"{items:>8} {len(content.encode('utf-8')) / 1024:>10.1f} "
+              f"{regex_ms:>10.3f} {full_ms:>14.3f} {budget_ms:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+渲染进程池基准测试
+生成大量每日榜单摘要，分别用不同的工作进程数提取编号内容并渲染频道A消息，测量吞吐量并确认结果与逐条渲染一致
+用法: python bench_render_pool.py [条目数] [工作进程数 ...]
+"""
+
+import os
+import random
+import sys
+import time
+from formatting import format_channel_a
+from render_pool import RenderPool
+
+CHARS = [chr(code) for code in range(0x4e00, 0x4e00 + 3000)]
+
+
+def make_summary(rng, day):
+    """模拟 SoSoValue 每日榜单摘要：日期前缀、十条带来源链接的编号新闻"""
+    lines = [f"2025.{day % 12 + 1}.{day % 28 + 1}<br>"]
+    for number in range(1, 11):
+        text = ''.join(rng.choice(CHARS) for _ in range(rng.randint(40, 120)))
+        lines.append(f'{number}/ {text} – <a href="https://example.com/{day}/{number}" target="_blank">source</a><br>')
+    return ''.join(lines)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    worker_counts = [int(arg) for arg in sys.argv[2:]] or sorted({1, 2, 4, os.cpu_count() or 1})
+    rng = random.Random(count)
+    summaries = [make_summary(rng, day) for day in range(count)]
+
+    start = time.perf_counter()
+    expected = [format_channel_a(summary) for summary in summaries]
+    baseline = time.perf_counter() - start
+    print(f"{'工作进程':>8} {'耗时(s)':>9} {'条/秒':>10} {'加速比':>8}")
+    print(f"{'逐条':>8} {baseline:>9.2f} {count / baseline:>10.0f} {1:>8.2f}")
+
+    for workers in worker_counts:
+        pool = RenderPool(workers, min_batch=32, chunk_size=64)
+        if pool.enabled:
+            # 先启动工作进程，不计入渲染耗时
+            pool.map(format_channel_a, summaries[:workers * 64])
+        start = time.perf_counter()
+        results = pool.map(format_channel_a, summaries)
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+        assert results == expected, "渲染结果与逐条渲染不一致"
+        print(f"{workers:>8} {elapsed:>9.2f} {count / elapsed:>10.0f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+频道历史本地镜像
+每个频道的消息保存在本地 SQLite 中，按 oldest=<上次同步到的ts> 增量同步；全量同步时更新编辑过的消息，
+本地有而 Slack 已没有的消息标记为已删除。
+统计、按用户或Bot筛选、规划删除都在本地索引上完成，只有增量部分需要请求 Slack
+"""
+
+import sqlite3
+import threading
+import time
+from config import Config
+
+
+class ChannelHistory:
+    """频道历史镜像"""
+
+    def __init__(self, client, path=None):
+        self.client = client
+        self.path = path or Config.HISTORY_DB
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS messages (
+                channel TEXT NOT NULL, ts TEXT NOT NULL, user TEXT, bot_id TEXT, subtype TEXT, text TEXT,
+                deleted_at REAL, PRIMARY KEY (channel, ts))""")
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_user ON messages (channel, user)")
+            conn.execute("CREATE TABLE IF NOT EXISTS sync_state (channel TEXT PRIMARY KEY, latest_ts TEXT, synced_at REAL)")
+
+    def connect(self):
+        # sqlite3 连接不能跨线程共用，每个线程一个连接
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def latest_ts(self, channel):
+        row = self.connect().execute("SELECT latest_ts FROM sync_state WHERE channel = ?", (channel,)).fetchone()
+        return row['latest_ts'] if row else None
+
+    def fetch(self, channel, oldest=None):
+        """分页读取 oldest 之后的全部消息"""
+        cursor = None
+        while True:
+            kwargs = {'channel': channel, 'limit': 200}
+            if oldest:
+                kwargs['oldest'] = oldest
+            if cursor:
+                kwargs['cursor'] = cursor
+            response = self.client.conversations_history(**kwargs)
+            yield from response['messages']
+            cursor = (response.get('response_metadata') or {}).get('next_cursor')
+            if not response.get('has_more') or not cursor:
+                break
+
+    def sync(self, channel, full=False):
+        """同步频道历史，返回新增的消息数；已有的消息按读到的内容更新（编辑过的消息）。
+        full=True 时全量同步，本地有而 Slack 已没有的消息标记为已删除"""
+        oldest = None if full else self.latest_ts(channel)
+        rows = [(channel, message['ts'], message.get('user'), message.get('bot_id'),
+                 message.get('subtype'), message.get('text'))
+                for message in self.fetch(channel, oldest)]
+
+        conn = self.connect()
+        with conn:
+            count = lambda: conn.execute("SELECT COUNT(*) FROM messages WHERE channel = ?", (channel,)).fetchone()[0]
+            before = count()
+            conn.executemany("INSERT INTO messages (channel, ts, user, bot_id, subtype, text) VALUES (?, ?, ?, ?, ?, ?) "
+                             "ON CONFLICT (channel, ts) DO UPDATE SET user = excluded.user, bot_id = excluded.bot_id, "
+                             "subtype = excluded.subtype, text = excluded.text", rows)
+            added = count() - before
+            if full:
+                seen = {row[1] for row in rows}
+                local = conn.execute("SELECT ts FROM messages WHERE channel = ? AND deleted_at IS NULL",
+                                     (channel,)).fetchall()
+                gone = [(time.time(), channel, row['ts']) for row in local if row['ts'] not in seen]
+                conn.executemany("UPDATE messages SET deleted_at = ? WHERE channel = ? AND ts = ?", gone)
+            latest = max((row[1] for row in rows), key=float, default=oldest)
+            conn.execute("INSERT OR REPLACE INTO sync_state (channel, latest_ts, synced_at) VALUES (?, ?, ?)",
+                         (channel, latest, time.time()))
+        return added
+
+    def _where(self, channel, user=None, bot_id=None, bots_only=False, since=None, include_deleted=False):
+        clauses, args = ["channel = ?"], [channel]
+        if not include_deleted:
+            clauses.append("deleted_at IS NULL")
+        # 同一个Bot发出的消息可能只带 user 或只带 bot_id，两者都给出时任一匹配即可
+        if user and bot_id:
+            clauses.append("(user = ? OR bot_id = ?)")
+            args += [user, bot_id]
+        elif user:
+            clauses.append("user = ?")
+            args.append(user)
+        elif bot_id:
+            clauses.append("bot_id = ?")
+            args.append(bot_id)
+        if bots_only:
+            clauses.append("bot_id IS NOT NULL")
+        if since:
+            clauses.append("CAST(ts AS REAL) > ?")
+            args.append(since)
+        return " AND ".join(clauses), args
+
+    def messages(self, channel, limit=None, **filters):
+        """按条件从本地索引查询消息（新的在前），filters 支持 user、bot_id、bots_only、since、include_deleted"""
+        where, args = self._where(channel, **filters)
+        sql = f"SELECT ts, user, bot_id, subtype, text, deleted_at FROM messages WHERE {where} ORDER BY CAST(ts AS REAL) DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.connect().execute(sql, args)]
+
+    def count(self, channel, **filters):
+        """按条件统计本地索引中的消息数"""
+        where, args = self._where(channel, **filters)
+        return self.connect().execute(f"SELECT COUNT(*) FROM messages WHERE {where}", args).fetchone()[0]
+
+    def mark_deleted(self, channel, ts):
+        """记录消息已被删除"""
+        with self.connect() as conn:
+            conn.execute("UPDATE messages SET deleted_at = ? WHERE channel = ? AND ts = ?", (time.time(), channel, ts))
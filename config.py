@@ -1,24 +1,148 @@
+import importlib.util
 import os
-from dotenv import load_dotenv
+from dotenv import load_dotenv, dotenv_values
 
-# 加载环境变量
-load_dotenv()
+# 进程启动时已有的环境变量优先于配置文件，热加载时也不覆盖
+_PROCESS_ENV = set(os.environ)
 
 class Config:
-    """配置管理类"""
+    """配置管理类：导入时只读取进程的环境变量，.env 由入口脚本在 main() 中调用 Config.load() 加载，
+    渲染进程池的工作进程重新导入主脚本时不读取配置文件"""
     
     # Telegram配置
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     TELEGRAM_GROUP_ID = os.getenv('TELEGRAM_GROUP_ID')
+    TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+    TELEGRAM_POLL_TIMEOUT = int(os.getenv('TELEGRAM_POLL_TIMEOUT', 30))
     
     # Slack配置
     SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
     SLACK_CHANNEL_A = os.getenv('SLACK_CHANNEL_A')  # 画板频道
     SLACK_CHANNEL_B = os.getenv('SLACK_CHANNEL_B')  # 消息频道
+    SLACK_TARGET_CHANNEL = os.getenv('SLACK_TARGET_CHANNEL', 'C06AUSCKYKF')  # 实际推送的频道
+    SLACK_RATE_PER_SECOND = float(os.getenv('SLACK_RATE_PER_SECOND', 1))  # 每个工作区的发送速率
+    WORKSPACES_FILE = os.getenv('WORKSPACES_FILE')  # 多工作区路由配置（JSON），不设置时只使用上面的单个工作区
+    SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL')  # 额外投递到一个 incoming webhook（默认订阅源），不删除
+    SLACK_TIMEOUT = int(os.getenv('SLACK_TIMEOUT', 15))  # 单次 Slack API 请求的超时（秒）
+    
+    # RSS配置：RSS_MIRRORS 为逗号分隔的 rsshub 镜像地址，按健康度对冲抓取
+    RSS_FEED_PATH = os.getenv('RSS_FEED_PATH', '/telegram/channel/SoSoValue_CN')
+    RSS_MIRRORS = os.getenv('RSS_MIRRORS', 'https://rsshub.app').split(',')
+    FEED_MAX_BYTES = int(os.getenv('FEED_MAX_BYTES', 10 * 1024 * 1024))  # 订阅源下载上限（压缩前后分别计算）
     
     # 应用配置
+    INGEST_MODE = os.getenv('INGEST_MODE', 'rss')  # rss、telegram（Bot API 直连）或 push（WebSub/Webhook 推送）
+    
+    # 推送接收配置
+    PUSH_HOST = os.getenv('PUSH_HOST', '0.0.0.0')
+    PUSH_PORT = int(os.getenv('PUSH_PORT', 8080))
+    PUSH_CALLBACK_URL = os.getenv('PUSH_CALLBACK_URL')  # 对外可访问的回调地址，如 https://example.com/websub
+    PUSH_SECRET = os.getenv('PUSH_SECRET')  # WebSub hub.secret，用于校验推送签名
+    PUSH_WORKERS = int(os.getenv('PUSH_WORKERS', 4))
     CONTENT_FILTER_KEYWORDS = os.getenv('CONTENT_FILTER_KEYWORDS', '').split(',')
     SCHEDULE_INTERVAL_MINUTES = int(os.getenv('SCHEDULE_INTERVAL_MINUTES', 30))
+    SCHEDULE_TIME = os.getenv('SCHEDULE_TIME', '10:00')  # 工作日定时抓取的时间
+    
+    # 热加载：修改配置文件或发送 SIGHUP 后，关键词、频道、路由和定时时间无需重启即可生效
+    ENV_FILE = os.getenv('ENV_FILE', '.env')
+    CONFIG_WATCH_INTERVAL = float(os.getenv('CONFIG_WATCH_INTERVAL', 5))  # 检查配置文件变化的间隔（秒），0 为不检查
+    
+    # 运行方式：scheduler 为单线程调度循环；async 为异步守护进程，抓取、推送和删除是相互独立的任务
+    DAEMON_MODE = os.getenv('DAEMON_MODE', 'scheduler')
+    DELETE_AFTER_SECONDS = int(os.getenv('DELETE_AFTER_SECONDS', 172800))  # 发送后多久删除（默认 48 小时）
+    REAP_INTERVAL_SECONDS = float(os.getenv('REAP_INTERVAL_SECONDS', 60))  # 异步模式下检查到期消息的间隔
+    ASYNC_POST_WORKERS = int(os.getenv('ASYNC_POST_WORKERS', 4))  # 异步模式下推送线程数，各工作区并行、工作区内按顺序
+    
+    # 周期时限与熔断：每轮抓取/删除最多执行 CYCLE_DEADLINE_SECONDS 秒（0 为不限），未完成的部分推迟到下一轮；
+    # 同一订阅源主机或 Slack 工作区连续失败 BREAKER_FAILURES 次后熔断，BREAKER_RESET_SECONDS 秒后放行试探请求
+    CYCLE_DEADLINE_SECONDS = float(os.getenv('CYCLE_DEADLINE_SECONDS', 120))
+    BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', 3))
+    BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', 60))
+    
+    # 处理流水线：抓取、解析、过滤、去重、渲染、推送各阶段之间的队列长度，下游慢时上游在此等待
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 16))
+    
+    # 状态存储：file（每项一个JSON文件）、sqlite 或 snapshot（单个压缩快照文件，适合在CI运行之间缓存）
+    STATE_BACKEND = os.getenv('STATE_BACKEND', 'file')
+    STATE_PATH = os.getenv('STATE_PATH')  # file 为目录，sqlite/snapshot 为文件路径
+    
+    # 渲染缓存：内存中最多保留的条目数；设置目录后淘汰和退出时写入磁盘，重新运行也能命中
+    RENDER_CACHE_SIZE = int(os.getenv('RENDER_CACHE_SIZE', 256))
+    RENDER_CACHE_DIR = os.getenv('RENDER_CACHE_DIR')
+    
+    # 渲染进程池：RENDER_WORKERS 大于1时，正则提取和消息渲染分批交给这么多个工作进程（-1 为CPU核数，0/1 为不启用）；
+    # 一次需要渲染的条目少于 RENDER_POOL_MIN_BATCH 时仍在当前进程执行，每批发送 RENDER_POOL_CHUNK_SIZE 条
+    RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', 0))
+    RENDER_POOL_MIN_BATCH = int(os.getenv('RENDER_POOL_MIN_BATCH', 32))
+    RENDER_POOL_CHUNK_SIZE = int(os.getenv('RENDER_POOL_CHUNK_SIZE', 8))
+    
+    # 窗口聚合：AGGREGATE_WINDOW_SECONDS 大于0时，窗口内的条目合并成一条汇总消息
+    AGGREGATE_WINDOW_SECONDS = int(os.getenv('AGGREGATE_WINDOW_SECONDS', 0))
+    AGGREGATE_GROUP_BY = os.getenv('AGGREGATE_GROUP_BY', 'feed')  # feed、channel 或 topic
+    AGGREGATE_MAX_ITEMS = int(os.getenv('AGGREGATE_MAX_ITEMS', 10))  # 汇总消息中最多显示的条数
+    AGGREGATE_THREAD = os.getenv('AGGREGATE_THREAD', 'false').lower() == 'true'  # 其余内容和来源放进线程回复
+    
+    # 近似重复检测：NEAR_DUP_WINDOW_SECONDS 大于0时，这段时间内其他条目推送过的相似新闻（MinHash 估计的相似度
+    # 不低于 NEAR_DUP_THRESHOLD）在渲染前去掉，用于同时订阅多个新闻频道的情况
+    NEAR_DUP_WINDOW_SECONDS = int(os.getenv('NEAR_DUP_WINDOW_SECONDS', 0))
+    NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', 0.6))
+    
+    # 多副本协调：设置 COORDINATION_DB 后，多个副本按一致性哈希分担订阅源，每个订阅源同一时刻只有一个副本推送
+    COORDINATION_DB = os.getenv('COORDINATION_DB')  # 所有副本共享的SQLite文件
+    WORKER_ID = os.getenv('WORKER_ID')  # 副本标识，默认 主机名-进程号
+    LEASE_SECONDS = int(os.getenv('LEASE_SECONDS', 180))  # 心跳和租约有效期，超过后由其他副本接管
+    
+    # 发送与删除历史（CSV，只追加），供 stats_report.py 统计；设为空则不记录
+    DELIVERY_LOG = os.getenv('DELIVERY_LOG', 'delivery_log.csv')
+    
+    # 频道历史本地镜像（删除工具使用），增量同步
+    HISTORY_DB = os.getenv('HISTORY_DB', 'channel_history.db')
+    
+    # 已发送消息台账（SQLite）：删除工具直接按台账删除本Bot的消息，不读取频道历史；设为空则不记录
+    SENT_LEDGER_DB = os.getenv('SENT_LEDGER_DB', 'sent_ledger.db')
+    
+    # 流量录制/回放：record 把订阅源响应和 Slack API 请求写入档案，replay 从档案回放、不访问网络
+    TRAFFIC_MODE = os.getenv('TRAFFIC_MODE') or None
+    TRAFFIC_ARCHIVE = os.getenv('TRAFFIC_ARCHIVE', 'traffic.jsonl.gz')
+    REPLAY_SPEED = float(os.getenv('REPLAY_SPEED', 1))  # 回放速度倍数，1 为原始耗时，0 为不等待
+    
+    # 性能分析配置（PROFILE_MODE 为 fetch 或 purge 时执行一次分析后退出）
+    PROFILE_MODE = os.getenv('PROFILE_MODE') or None
+    PROFILE_OUTPUT = os.getenv('PROFILE_OUTPUT', 'profile_report.txt')
+    
+    # 日志配置
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json 或 text
+    LOG_BUFFER_SIZE = int(os.getenv('LOG_BUFFER_SIZE', 200))
+    LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 2))
+    LOG_PROGRESS_EVERY = int(os.getenv('LOG_PROGRESS_EVERY', 50))  # 每处理N条输出一次进度
+    LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 20))  # 逐条明细的采样间隔
+    
+    @classmethod
+    def load(cls):
+        """加载 .env 后按新的环境变量重新计算所有配置项"""
+        load_dotenv()
+        spec = importlib.util.find_spec(__name__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        for key, value in vars(module.Config).items():
+            if key.isupper():
+                setattr(cls, key, value)
+    
+    @classmethod
+    def reload(cls):
+        """重新读取配置文件，更新可热加载的配置项"""
+        for key, value in dotenv_values(cls.ENV_FILE).items():
+            if key not in _PROCESS_ENV and value is not None:
+                os.environ[key] = value
+        cls.SLACK_CHANNEL_A = os.getenv('SLACK_CHANNEL_A')
+        cls.SLACK_CHANNEL_B = os.getenv('SLACK_CHANNEL_B')
+        cls.SLACK_TARGET_CHANNEL = os.getenv('SLACK_TARGET_CHANNEL', 'C06AUSCKYKF')
+        cls.WORKSPACES_FILE = os.getenv('WORKSPACES_FILE')
+        cls.SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL')
+        cls.RSS_FEED_PATH = os.getenv('RSS_FEED_PATH', '/telegram/channel/SoSoValue_CN')
+        cls.CONTENT_FILTER_KEYWORDS = os.getenv('CONTENT_FILTER_KEYWORDS', '').split(',')
+        cls.SCHEDULE_TIME = os.getenv('SCHEDULE_TIME', '10:00')
     
     @classmethod
     def validate(cls):
@@ -0,0 +1,93 @@
+"""
+测试公共设置
+在导入项目模块之前切换到临时目录，默认写在工作目录下的状态、台账、历史等文件都落在这里；
+只设置测试 Bot 本身需要的凭据和频道，各功能的配置由对应的测试自己设置
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix='sosovalue-test-')
+os.chdir(_TMP)
+for _key, _value in {
+    'SLACK_BOT_TOKEN': 'xoxb-test',
+    'SLACK_CHANNEL_A': 'CA',
+    'SLACK_CHANNEL_B': 'CB',
+    'CONTENT_FILTER_KEYWORDS': '每日加密热点新闻榜单',
+    'LOG_FORMAT': 'text',
+}.items():
+    os.environ.setdefault(_key, _value)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeSlack:
+    """记录调用的 Slack 客户端替身；fail 为 {方法名: 异常，或按参数返回异常/None 的函数}，调用时抛出"""
+
+    def __init__(self):
+        self.calls = []  # 成功的调用
+        self.attempts = []  # 所有调用，包括抛出异常的
+        self.fail = {}
+        self.count = 0
+
+    def _call(self, method, kwargs):
+        self.attempts.append((method, kwargs))
+        error = self.fail.get(method)
+        if callable(error) and not isinstance(error, BaseException):
+            error = error(kwargs)
+        if error is not None:
+            raise error
+        self.calls.append((method, kwargs))
+        self.count += 1
+        return {'ok': True, 'ts': f"{time.time():.6f}{self.count}", 'channel': kwargs.get('channel')}
+
+    def chat_postMessage(self, **kwargs):
+        return self._call('chat_postMessage', kwargs)
+
+    def chat_update(self, **kwargs):
+        return self._call('chat_update', kwargs)
+
+    def chat_delete(self, **kwargs):
+        return self._call('chat_delete', kwargs)
+
+    def posts(self):
+        return [kwargs for method, kwargs in self.calls if method == 'chat_postMessage']
+
+
+@pytest.fixture
+def fake_slack():
+    return FakeSlack()
+
+
+@pytest.fixture
+def make_bot(tmp_path, monkeypatch):
+    """创建 RSSSlackBot：状态写在临时目录，所有工作区共用一个 FakeSlack，不限流、熔断器重新计数。
+    workspaces 为 WORKSPACES_FILE 的内容，None 时使用 .env 中的单个工作区"""
+    import resilience
+    import state_store
+    from config import Config
+
+    def make(workspaces=None, **config):
+        if workspaces is not None:
+            path = tmp_path / 'workspaces.json'
+            path.write_text(json.dumps(workspaces), encoding='utf-8')
+            monkeypatch.setattr(Config, 'WORKSPACES_FILE', str(path))
+        monkeypatch.setattr(Config, 'SLACK_RATE_PER_SECOND', 1000)
+        for key, value in config.items():
+            monkeypatch.setattr(Config, key, value)
+        monkeypatch.setattr(state_store, '_store', state_store.FileStateStore(str(tmp_path)))
+        with resilience._breakers_lock:
+            resilience._breakers.clear()
+
+        from rss_to_slack import RSSSlackBot
+        bot = RSSSlackBot()
+        bot.fake_slack = FakeSlack()
+        for workspace in bot.workspaces.workspaces.values():
+            workspace.client = bot.fake_slack
+        return bot
+
+    return make
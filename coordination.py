@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+多副本协调
+多个 rss_to_slack.py 副本通过同一个 SQLite 文件协调：心跳登记存活副本，按一致性哈希把订阅源分给各副本，
+每个订阅源再用租约保证同一时刻只有一个副本推送；副本失联、租约过期后由其他副本自动接管
+"""
+
+import bisect
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """一致性哈希环，每个节点放置多个虚拟节点使分布更均匀"""
+
+    def __init__(self, nodes, replicas=64):
+        self.ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self.keys = [key for key, _ in self.ring]
+
+    def node_for(self, key):
+        if not self.ring:
+            return None
+        index = bisect.bisect(self.keys, _hash(key)) % len(self.ring)
+        return self.ring[index][1]
+
+
+class Coordinator:
+    """基于 SQLite 的心跳、租约和订阅源分片"""
+
+    def __init__(self, db_path, worker_id=None, lease_seconds=180):
+        self.db_path = db_path
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS members (worker_id TEXT PRIMARY KEY, heartbeat REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)")
+        self.heartbeat()
+
+    def connect(self):
+        # sqlite3 连接不能跨线程共用，每个线程一个连接；事务由调用方显式控制
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """写事务：BEGIN IMMEDIATE 保证多个进程之间串行"""
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except:
+            conn.execute("ROLLBACK")
+            raise
+
+    def heartbeat(self):
+        """登记本副本存活"""
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO members (worker_id, heartbeat) VALUES (?, ?)",
+                         (self.worker_id, time.time()))
+
+    def leave(self):
+        """退出时注销本副本并释放所有租约，其他副本无需等待过期即可接管"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM members WHERE worker_id = ?", (self.worker_id,))
+            conn.execute("DELETE FROM leases WHERE owner = ?", (self.worker_id,))
+
+    def alive_members(self):
+        """心跳未过期的副本"""
+        cutoff = time.time() - self.lease_seconds
+        rows = self.connect().execute("SELECT worker_id FROM members WHERE heartbeat >= ?", (cutoff,)).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def try_acquire(self, name, ttl=None):
+        """获取或续期租约，租约被其他副本持有且未过期时返回False"""
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != self.worker_id and row[1] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)",
+                         (name, self.worker_id, now + (ttl or self.lease_seconds)))
+            return True
+
+    def release(self, name):
+        """释放自己持有的租约"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.worker_id))
+
+    def owner_of(self, feed):
+        """一致性哈希决定订阅源归属的副本"""
+        return HashRing(self.alive_members()).node_for(feed)
+
+    def should_handle(self, feed):
+        """本副本是否负责这个订阅源：哈希归属于本副本，并且拿到了该订阅源的租约"""
+        self.heartbeat()
+        if self.owner_of(feed) != self.worker_id:
+            return False
+        return self.try_acquire(f"feed:{feed}")
+
+    def lock(self, name):
+        """跨进程互斥锁，用于保护状态文件的读-改-写"""
+        return CrossProcessLock(self, name)
+
+
+class CrossProcessLock:
+    """进程内用线程锁、进程间用短租约实现的互斥锁"""
+
+    def __init__(self, coordinator, name, ttl=30):
+        self.coordinator = coordinator
+        self.name = f"lock:{name}"
+        self.ttl = ttl
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        self.depth += 1
+        if self.depth == 1:
+            while not self.coordinator.try_acquire(self.name, ttl=self.ttl):
+                time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            self.coordinator.release(self.name)
+        self.thread_lock.release()
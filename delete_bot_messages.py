@@ -1,154 +1,164 @@
 #!/usr/bin/env python3
 """
 删除Bot自己发送的消息
-避免权限问题，只删除Bot发送的消息
+避免权限问题，只删除Bot发送的消息：直接按已发送消息台账删除，不读取频道历史；
+--reconcile 时先扫描频道历史核对台账，补上台账中没有记录的Bot消息
 """
 
 import time
-import json
-from slack_sdk import WebClient
+import argparse
+import logging
+from workspaces import WorkspaceRegistry
 from slack_sdk.errors import SlackApiError
 from config import Config
+from log_utils import get_logger, log, ProgressReporter
+from state_store import get_state_store
+from channel_history import ChannelHistory
+from sent_ledger import get_sent_ledger, record_deleted
 
-def delete_bot_messages():
-    """删除Bot自己发送的消息"""
-    client = WebClient(token=Config.SLACK_BOT_TOKEN)
+logger = get_logger('delete_bot_messages')
+
+def delete_ledger_messages(channel=None, expired_only=False):
+    """按台账删除Bot发送的消息，返回已删除的 (频道, ts) 集合"""
+    ledger = get_sent_ledger()
+    if ledger is None:
+        log(logger, logging.WARNING, "⚠️  未配置 SENT_LEDGER_DB，无法按台账删除")
+        return set()
+    
+    records = ledger.messages(channel=channel, expired_before=time.time() if expired_only else None)
+    if not records:
+        log(logger, logging.INFO, "📭 台账中没有待删除的消息", channel=channel)
+        return set()
+    
+    # 按记录中的工作区选择客户端
+    workspaces = WorkspaceRegistry.load()
+    deleted = set()
+    progress = ProgressReporter(logger, "🗑️  按台账删除Bot消息", len(records))
+    
+    for record in records:
+        channel_id, ts = record['channel'], record['ts']
+        client = workspaces.get(record['workspace']).client
+        
+        try:
+            client.chat_delete(channel=channel_id, ts=ts)
+            progress.item(True, channel=channel_id, ts=ts)
+        except SlackApiError as e:
+            if e.response['error'] != 'message_not_found':
+                progress.item(False, error=e.response['error'], channel=channel_id, ts=ts)
+                time.sleep(0.1)
+                continue
+            # 消息已不存在，视为删除成功
+            progress.item(True, channel=channel_id, ts=ts, note='message_not_found')
+        ledger.mark_deleted(record['workspace'], channel_id, ts)
+        deleted.add((channel_id, ts))
+        
+        # 添加延迟避免API限制
+        time.sleep(0.1)
     
-    print("🗑️  删除Bot自己发送的消息")
-    print("=" * 50)
+    progress.finish()
+    
+    # 已删除的消息不再留在 pending_deletes 中，避免定时删除重复处理
+    store = get_state_store()
+    data = store.load('pending_deletes', [])
+    remaining = [record for record in data if (record['channel'], record['ts']) not in deleted]
+    if len(remaining) != len(data):
+        store.save('pending_deletes', remaining)
+        store.flush()
+    return deleted
+
+def reconcile_channels(channels=(), only=None):
+    """逐个工作区全量同步频道历史，核对台账：补记台账中没有的Bot消息（按 user 或 bot_id 识别），
+    频道中已不存在的消息标记为已删除。每个工作区核对其路由到的和台账中有记录的频道，
+    channels 为 [(频道, 名称)]，由默认工作区额外核对；only 不为空时只核对该频道"""
+    ledger = get_sent_ledger()
+    if ledger is None:
+        log(logger, logging.WARNING, "⚠️  未配置 SENT_LEDGER_DB，无法核对台账")
+        return
+    registry = WorkspaceRegistry.load()
+    for workspace in registry.workspaces.values():
+        known = {channel for routed in workspace.routes.values() for channel in routed}
+        known.update(ledger.channels(workspace.name))
+        given = dict(channels) if workspace is registry.default else {}
+        targets = list(given.items()) + [(channel, channel) for channel in sorted(known) if channel not in given]
+        if only:
+            targets = [(channel, name) for channel, name in targets if channel == only]
+        if targets:
+            reconcile_workspace(ledger, workspace, targets)
+
+def reconcile_workspace(ledger, workspace, channels):
+    """核对一个工作区中的频道"""
+    client = workspace.client
     
-    # 获取Bot信息
+    # 获取Bot信息：Bot发出的消息可能只带 bot_id 而没有 user
     try:
         auth_response = client.auth_test()
         bot_user_id = auth_response['user_id']
-        print(f"🤖 Bot用户ID: {bot_user_id}")
+        bot_id = auth_response.get('bot_id')
+        log(logger, logging.INFO, "🤖 Bot用户ID", workspace=workspace.name, bot_user_id=bot_user_id, bot_id=bot_id)
     except SlackApiError as e:
-        print(f"❌ 获取Bot信息失败: {e.response['error']}")
+        log(logger, logging.ERROR, "❌ 获取Bot信息失败", workspace=workspace.name, error=e.response['error'])
         return
     
-    # 包含所有相关频道
-    channels = [
-        (Config.SLACK_CHANNEL_A, "频道A"),
-        (Config.SLACK_CHANNEL_B, "频道B"),
-        ("C06AUSCKYKF", "C06AUSCKYKF")  # 添加实际使用的频道
-    ]
-    
-    total_deleted = 0
+    history = ChannelHistory(client)
     
     for channel_id, channel_name in channels:
-        print(f"\n📺 处理 {channel_name} ({channel_id})...")
-        
+        log(logger, logging.INFO, "📺 核对频道", channel=channel_id, name=channel_name)
         try:
-            # 获取频道历史消息
-            response = client.conversations_history(
-                channel=channel_id,
-                limit=1000
-            )
-            messages = response['messages']
-            
-            if not messages:
-                print(f"   📭 没有消息")
-                continue
-            
-            print(f"   📝 找到 {len(messages)} 条消息")
-            
-            # 过滤出Bot发送的消息
-            bot_messages = [msg for msg in messages if msg.get('user') == bot_user_id]
-            
-            if not bot_messages:
-                print(f"   📭 没有Bot发送的消息")
-                continue
-            
-            print(f"   🤖 找到 {len(bot_messages)} 条Bot消息")
-            
-            deleted_count = 0
-            failed_count = 0
-            
-            for i, message in enumerate(bot_messages, 1):
-                ts = message['ts']
-                text = message.get('text', '')[:30] + '...' if len(message.get('text', '')) > 30 else message.get('text', '')
-                
-                print(f"   [{i}/{len(bot_messages)}] 删除: {text}")
-                
-                try:
-                    client.chat_delete(channel=channel_id, ts=ts)
-                    deleted_count += 1
-                    total_deleted += 1
-                except SlackApiError as e:
-                    if e.response['error'] == 'message_not_found':
-                        print(f"     ⚠️  消息已不存在")
-                        deleted_count += 1
-                        total_deleted += 1
-                    elif e.response['error'] == 'cant_delete_message':
-                        print(f"     ❌ 无法删除: 权限不足或消息太旧")
-                        failed_count += 1
-                    else:
-                        print(f"     ❌ 删除失败: {e.response['error']}")
-                        failed_count += 1
-                
-                # 添加延迟避免API限制
-                time.sleep(0.1)
-            
-            print(f"   ✅ {channel_name} 删除完成: 成功 {deleted_count} 条，失败 {failed_count} 条")
-            
+            history.sync(channel_id, full=True)
         except SlackApiError as e:
-            print(f"   ❌ 获取 {channel_name} 历史消息失败: {e.response['error']}")
-    
-    print(f"\n🎉 总删除完成: {total_deleted} 条Bot消息")
+            log(logger, logging.ERROR, "❌ 获取历史消息失败", channel=channel_id, error=e.response['error'])
+            continue
+        added, gone = ledger.reconcile(workspace.name, channel_id, history, bot_user_id, bot_id)
+        log(logger, logging.INFO, "📒 台账核对完成", channel=channel_id, messages=history.count(channel_id),
+            added=added, gone=gone)
 
 def delete_pending_deletes():
-    """删除pending_deletes.json中记录的消息"""
-    file = 'pending_deletes.json'
-    
-    try:
-        with open(file, 'r') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print("📭 pending_deletes.json 文件不存在")
-        return
-    except json.JSONDecodeError:
-        print("❌ pending_deletes.json 文件格式错误")
-        return
+    """删除pending_deletes中记录的消息"""
+    store = get_state_store()
+    data = store.load('pending_deletes', [])
     
     if not data:
-        print("📭 没有待删除的消息记录")
+        log(logger, logging.INFO, "📭 没有待删除的消息记录")
         return
     
-    client = WebClient(token=Config.SLACK_BOT_TOKEN)
-    
-    print(f"🗑️  删除 {len(data)} 条待删除消息...")
+    # 按记录中的工作区选择客户端
+    workspaces = WorkspaceRegistry.load()
+    progress = ProgressReporter(logger, "🗑️  删除待删除消息", len(data))
     
-    deleted_count = 0
-    failed_count = 0
-    
-    for i, record in enumerate(data, 1):
+    for record in data:
         channel = record['channel']
         ts = record['ts']
-        
-        print(f"   [{i}/{len(data)}] 删除消息 {ts}")
+        workspace = workspaces.get(record.get('workspace'))
         
         try:
-            client.chat_delete(channel=channel, ts=ts)
-            deleted_count += 1
+            workspace.client.chat_delete(channel=channel, ts=ts)
+            progress.item(True, channel=channel, ts=ts)
+            record_deleted(workspace.name, channel, ts)
         except SlackApiError as e:
             if e.response['error'] == 'message_not_found':
-                print(f"     ⚠️  消息已不存在")
-                deleted_count += 1
+                progress.item(True, channel=channel, ts=ts, note='message_not_found')
+                record_deleted(workspace.name, channel, ts)
             else:
-                print(f"     ❌ 删除失败: {e.response['error']}")
-                failed_count += 1
+                progress.item(False, error=e.response['error'], channel=channel, ts=ts)
         
         time.sleep(0.1)
     
-    # 清空pending_deletes.json文件
-    with open(file, 'w') as f:
-        json.dump([], f)
+    # 清空pending_deletes记录
+    store.save('pending_deletes', [])
+    store.flush()
     
-    print(f"✅ 删除完成: 成功 {deleted_count} 条，失败 {failed_count} 条")
-    print("📝 已清空 pending_deletes.json 文件")
+    progress.finish()
+    log(logger, logging.INFO, "📝 已清空 pending_deletes 记录")
 
 def main():
     """主函数"""
+    Config.load()
+    parser = argparse.ArgumentParser(description="删除Bot自己发送的消息")
+    parser.add_argument('--reconcile', action='store_true', help="先扫描频道历史核对台账，再按台账删除")
+    parser.add_argument('--channel', help="只删除该频道的消息")
+    parser.add_argument('--expired', action='store_true', help="只删除已到删除时间的消息")
+    args = parser.parse_args()
+    
     print("🗑️  Bot消息删除工具")
     print("=" * 50)
     
@@ -157,19 +167,29 @@ def main():
         print("❌ 错误: 未设置SLACK_BOT_TOKEN")
         return
     
-    if not Config.SLACK_CHANNEL_A or not Config.SLACK_CHANNEL_B:
-        print("❌ 错误: 未设置Slack频道ID")
-        return
-    
-    # 删除Bot消息
-    delete_bot_messages()
-    
-    print("\n" + "=" * 50)
-    
-    # 删除pending_deletes.json中的消息
-    delete_pending_deletes()
-    
-    print("\n🎉 所有删除任务完成！")
+    if args.reconcile:
+        if not Config.SLACK_CHANNEL_A or not Config.SLACK_CHANNEL_B:
+            print("❌ 错误: 未设置Slack频道ID")
+            return
+        # 包含所有相关频道
+        channels = [
+            (Config.SLACK_CHANNEL_A, "频道A"),
+            (Config.SLACK_CHANNEL_B, "频道B"),
+            ("C06AUSCKYKF", "C06AUSCKYKF")  # 添加实际使用的频道
+        ]
+        if args.channel:
+            channels = [(args.channel, args.channel)]
+        reconcile_channels(channels, only=args.channel)
+    
+    # 按台账删除Bot消息
+    deleted = delete_ledger_messages(args.channel, args.expired)
+    log(logger, logging.INFO, "🎉 台账删除完成", deleted=len(deleted))
+    
+    # 删除pending_deletes中记录的消息（台账启用前发送的消息）
+    if not args.channel and not args.expired:
+        delete_pending_deletes()
+    
+    log(logger, logging.INFO, "🎉 所有删除任务完成！")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -5,13 +5,18 @@
 """
 
 import time
-from slack_sdk import WebClient
+import logging
+from workspaces import get_slack_client
 from slack_sdk.errors import SlackApiError
 from config import Config
+from log_utils import get_logger, log, ProgressReporter
+from sent_ledger import record_deleted
+
+logger = get_logger('delete_bot_only')
 
 def delete_bot_messages_direct():
     """直接尝试删除Bot消息"""
-    client = WebClient(token=Config.SLACK_BOT_TOKEN)
+    client = get_slack_client(Config.SLACK_BOT_TOKEN)
     channel_id = "C06AUSCKYKF"
     
     print("🗑️  删除Bot发送的消息")
@@ -21,9 +26,9 @@ def delete_bot_messages_direct():
     try:
         auth_response = client.auth_test()
         bot_user_id = auth_response['user_id']
-        print(f"🤖 Bot用户ID: {bot_user_id}")
+        log(logger, logging.INFO, "🤖 Bot用户ID", bot_user_id=bot_user_id)
     except SlackApiError as e:
-        print(f"❌ 获取Bot信息失败: {e.response['error']}")
+        log(logger, logging.ERROR, "❌ 获取Bot信息失败", error=e.response['error'])
         return
     
     # 尝试一些可能的时间戳格式
@@ -37,45 +42,38 @@ def delete_bot_messages_direct():
             timestamp = current_time - (days_ago * 24 * 3600) - (hour * 3600)
             test_timestamps.append(f"{timestamp:.6f}")
     
-    print(f"🔍 尝试删除 {len(test_timestamps)} 个可能的时间戳...")
+    log(logger, logging.INFO, "🔍 尝试删除可能的时间戳", candidates=len(test_timestamps))
     
     deleted_count = 0
     not_found_count = 0
-    failed_count = 0
+    progress = ProgressReporter(logger, "🗑️  按时间戳删除", len(test_timestamps), every=100)
     
-    for i, ts in enumerate(test_timestamps, 1):
-        if i % 100 == 0:
-            print(f"   进度: {i}/{len(test_timestamps)}")
-        
+    for ts in test_timestamps:
         try:
             client.chat_delete(channel=channel_id, ts=ts)
+            record_deleted(None, channel_id, ts)
             deleted_count += 1
-            print(f"   ✅ 成功删除消息: {ts}")
+            progress.item(True, ts=ts)
         except SlackApiError as e:
-            if e.response['error'] == 'message_not_found':
-                not_found_count += 1
-            elif e.response['error'] == 'cant_delete_message':
-                # 可能是权限问题或消息太旧
+            if e.response['error'] in ('message_not_found', 'cant_delete_message'):
+                # 消息不存在，或可能是权限问题或消息太旧
                 not_found_count += 1
+                progress.item(True, ts=ts, note=e.response['error'])
             else:
-                failed_count += 1
-                if failed_count <= 5:  # 只显示前5个错误
-                    print(f"   ❌ 删除失败 {ts}: {e.response['error']}")
+                progress.item(False, error=e.response['error'], ts=ts)
         
         # 添加延迟避免API限制
         time.sleep(0.05)
     
-    print(f"\n📊 删除结果:")
-    print(f"   ✅ 成功删除: {deleted_count} 条")
-    print(f"   📭 消息不存在: {not_found_count} 条")
-    print(f"   ❌ 删除失败: {failed_count} 条")
+    progress.finish()
+    log(logger, logging.INFO, "📊 删除结果", deleted=deleted_count, not_found=not_found_count, failed=progress.failed)
 
 def try_delete_recent_messages():
     """尝试删除最近的消息"""
-    client = WebClient(token=Config.SLACK_BOT_TOKEN)
+    client = get_slack_client(Config.SLACK_BOT_TOKEN)
     channel_id = "C06AUSCKYKF"
     
-    print("\n🕐 尝试删除最近的消息...")
+    log(logger, logging.INFO, "🕐 尝试删除最近的消息...")
     
     # 获取当前时间
     current_time = time.time()
@@ -87,15 +85,17 @@ def try_delete_recent_messages():
         
         try:
             client.chat_delete(channel=channel_id, ts=ts)
-            print(f"   ✅ 删除成功: {hours_ago} 小时前")
+            record_deleted(None, channel_id, ts)
+            log(logger, logging.INFO, "✅ 删除成功", hours_ago=hours_ago, ts=ts)
         except SlackApiError as e:
             if e.response['error'] != 'message_not_found':
-                print(f"   ❌ {hours_ago} 小时前: {e.response['error']}")
+                log(logger, logging.WARNING, "❌ 删除失败", hours_ago=hours_ago, error=e.response['error'])
         
         time.sleep(0.1)
 
 def main():
     """主函数"""
+    Config.load()
     print("🗑️  Bot消息删除工具")
     print("=" * 50)
     
@@ -110,7 +110,7 @@ def main():
     # 方法2: 尝试删除最近消息
     try_delete_recent_messages()
     
-    print("\n🎉 删除尝试完成！")
+    log(logger, logging.INFO, "🎉 删除尝试完成！")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
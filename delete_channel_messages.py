@@ -7,190 +7,129 @@ Slack频道消息删除工具
 import os
 import time
 import json
+import logging
 from datetime import datetime, timedelta
-from slack_sdk import WebClient
+from workspaces import get_slack_client, WorkspaceRegistry
 from slack_sdk.errors import SlackApiError
 from config import Config
+from log_utils import get_logger, log, flush_logs, ProgressReporter
+from state_store import get_state_store
+from channel_history import ChannelHistory
+from sent_ledger import record_deleted
+
+logger = get_logger('delete_channel_messages')
 
 class SlackMessageDeleter:
     def __init__(self):
-        self.slack_client = WebClient(token=Config.SLACK_BOT_TOKEN)
+        self.slack_client = get_slack_client(Config.SLACK_BOT_TOKEN)
         self.channel_a = Config.SLACK_CHANNEL_A
         self.channel_b = Config.SLACK_CHANNEL_B
+        # 频道历史本地镜像，每次只向 Slack 请求新增的消息
+        self.history = ChannelHistory(self.slack_client)
+    
+    def sync_history(self, channel_id):
+        """增量同步频道历史，失败时继续使用本地已有的记录"""
+        try:
+            added = self.history.sync(channel_id)
+            log(logger, logging.DEBUG, "🔄 已同步频道历史", channel=channel_id, added=added)
+        except SlackApiError as e:
+            log(logger, logging.ERROR, "❌ 获取频道历史失败", channel=channel_id, error=e.response['error'])
         
-    def get_channel_history(self, channel_id, limit=1000):
-        """获取频道历史消息"""
+    def get_channel_history(self, channel_id, limit=1000, **filters):
+        """获取频道历史消息（从本地镜像读取，filters 见 ChannelHistory.messages）"""
+        self.sync_history(channel_id)
+        return self.history.messages(channel_id, limit=limit, **filters)
+    
+    def _try_delete(self, channel_id, ts, client=None, workspace=None):
+        """删除单条消息，返回错误码，成功或消息已不存在时返回None；同时在频道历史和已发送消息台账中标记删除，
+        workspace 为 None 时台账按频道和 ts 匹配"""
         try:
-            response = self.slack_client.conversations_history(
-                channel=channel_id,
-                limit=limit
-            )
-            return response['messages']
+            (client or self.slack_client).chat_delete(channel=channel_id, ts=ts)
         except SlackApiError as e:
-            print(f"❌ 获取频道历史失败: {e.response['error']}")
-            return []
+            if e.response['error'] != 'message_not_found':
+                return e.response['error']
+        self.history.mark_deleted(channel_id, ts)
+        record_deleted(workspace, channel_id, ts)
+        return None
     
     def delete_message(self, channel_id, ts):
         """删除单条消息"""
-        try:
-            self.slack_client.chat_delete(channel=channel_id, ts=ts)
-            return True
-        except SlackApiError as e:
-            if e.response['error'] == 'message_not_found':
-                print(f"⚠️  消息 {ts} 不存在或已被删除")
-                return True
-            elif e.response['error'] == 'cant_delete_message':
-                print(f"❌ 无法删除消息 {ts}: 权限不足或消息太旧")
-                return False
-            else:
-                print(f"❌ 删除消息 {ts} 失败: {e.response['error']}")
-                return False
+        error = self._try_delete(channel_id, ts)
+        if error:
+            log(logger, logging.WARNING, "❌ 删除消息失败", channel=channel_id, ts=ts, error=error)
+        return error is None
+    
+    def _delete_messages(self, channel_id, messages, label):
+        """批量删除消息，进度按批汇总输出"""
+        progress = ProgressReporter(logger, label, len(messages))
+        for message in messages:
+            ts = message['ts']
+            error = self._try_delete(channel_id, ts)
+            progress.item(error is None, error=error, channel=channel_id, ts=ts, user=message.get('user') or 'unknown')
+            
+            # 添加延迟避免API限制
+            time.sleep(0.1)
+        progress.finish()
     
     def delete_all_messages(self, channel_id, channel_name="频道"):
         """删除频道中的所有消息"""
-        print(f"🗑️  开始删除 {channel_name} 中的所有消息...")
-        
         messages = self.get_channel_history(channel_id)
         if not messages:
-            print(f"📭 {channel_name} 中没有消息")
+            log(logger, logging.INFO, "📭 频道中没有消息", channel=channel_id, name=channel_name)
             return
         
-        print(f"📝 找到 {len(messages)} 条消息")
-        
-        deleted_count = 0
-        failed_count = 0
-        
-        for i, message in enumerate(messages, 1):
-            ts = message['ts']
-            user = message.get('user', 'unknown')
-            text = message.get('text', '')[:50] + '...' if len(message.get('text', '')) > 50 else message.get('text', '')
-            
-            print(f"   [{i}/{len(messages)}] 删除消息 {ts} (用户: {user}): {text}")
-            
-            if self.delete_message(channel_id, ts):
-                deleted_count += 1
-            else:
-                failed_count += 1
-            
-            # 添加延迟避免API限制
-            time.sleep(0.1)
-        
-        print(f"✅ 删除完成: 成功 {deleted_count} 条，失败 {failed_count} 条")
+        self._delete_messages(channel_id, messages, f"🗑️  删除 {channel_name} 中的所有消息")
     
     def delete_messages_by_time(self, channel_id, hours_ago, channel_name="频道"):
         """删除指定时间范围内的消息"""
         cutoff_time = time.time() - (hours_ago * 3600)
-        print(f"🗑️  删除 {channel_name} 中 {hours_ago} 小时内的消息...")
-        
-        messages = self.get_channel_history(channel_id)
-        if not messages:
-            print(f"📭 {channel_name} 中没有消息")
-            return
-        
-        filtered_messages = [msg for msg in messages if float(msg['ts']) > cutoff_time]
+        filtered_messages = self.get_channel_history(channel_id, since=cutoff_time)
         
         if not filtered_messages:
-            print(f"📭 没有找到 {hours_ago} 小时内的消息")
+            log(logger, logging.INFO, "📭 没有找到时间范围内的消息", channel=channel_id, hours_ago=hours_ago)
             return
         
-        print(f"📝 找到 {len(filtered_messages)} 条符合条件的消息")
-        
-        deleted_count = 0
-        failed_count = 0
-        
-        for i, message in enumerate(filtered_messages, 1):
-            ts = message['ts']
-            user = message.get('user', 'unknown')
-            text = message.get('text', '')[:50] + '...' if len(message.get('text', '')) > 50 else message.get('text', '')
-            
-            print(f"   [{i}/{len(filtered_messages)}] 删除消息 {ts} (用户: {user}): {text}")
-            
-            if self.delete_message(channel_id, ts):
-                deleted_count += 1
-            else:
-                failed_count += 1
-            
-            time.sleep(0.1)
-        
-        print(f"✅ 删除完成: 成功 {deleted_count} 条，失败 {failed_count} 条")
+        self._delete_messages(channel_id, filtered_messages, f"🗑️  删除 {channel_name} 中 {hours_ago} 小时内的消息")
     
     def delete_messages_by_user(self, channel_id, user_id, channel_name="频道"):
         """删除指定用户的消息"""
-        print(f"🗑️  删除 {channel_name} 中用户 {user_id} 的消息...")
-        
-        messages = self.get_channel_history(channel_id)
-        if not messages:
-            print(f"📭 {channel_name} 中没有消息")
-            return
-        
-        user_messages = [msg for msg in messages if msg.get('user') == user_id]
+        user_messages = self.get_channel_history(channel_id, user=user_id)
         
         if not user_messages:
-            print(f"📭 没有找到用户 {user_id} 的消息")
+            log(logger, logging.INFO, "📭 没有找到用户的消息", channel=channel_id, user=user_id)
             return
         
-        print(f"📝 找到 {len(user_messages)} 条用户消息")
-        
-        deleted_count = 0
-        failed_count = 0
-        
-        for i, message in enumerate(user_messages, 1):
-            ts = message['ts']
-            text = message.get('text', '')[:50] + '...' if len(message.get('text', '')) > 50 else message.get('text', '')
-            
-            print(f"   [{i}/{len(user_messages)}] 删除消息 {ts}: {text}")
-            
-            if self.delete_message(channel_id, ts):
-                deleted_count += 1
-            else:
-                failed_count += 1
-            
-            time.sleep(0.1)
-        
-        print(f"✅ 删除完成: 成功 {deleted_count} 条，失败 {failed_count} 条")
+        self._delete_messages(channel_id, user_messages, f"🗑️  删除 {channel_name} 中用户 {user_id} 的消息")
     
     def delete_pending_deletes(self):
-        """删除pending_deletes.json中记录的所有消息"""
-        file = 'pending_deletes.json'
-        try:
-            with open(file, 'r') as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            print("📭 pending_deletes.json 文件不存在")
-            return
-        except json.JSONDecodeError:
-            print("❌ pending_deletes.json 文件格式错误")
-            return
+        """删除pending_deletes中记录的所有消息"""
+        store = get_state_store()
+        data = store.load('pending_deletes', [])
         
         if not data:
-            print("📭 没有待删除的消息记录")
+            log(logger, logging.INFO, "📭 没有待删除的消息记录")
             return
         
-        print(f"🗑️  删除 {len(data)} 条待删除消息...")
-        
-        deleted_count = 0
-        failed_count = 0
+        # 按记录中的工作区选择客户端
+        workspaces = WorkspaceRegistry.load()
+        progress = ProgressReporter(logger, "🗑️  删除待删除消息", len(data))
         
-        for i, record in enumerate(data, 1):
+        for record in data:
             channel = record['channel']
             ts = record['ts']
             send_time = datetime.fromtimestamp(record['send_time']).strftime('%Y-%m-%d %H:%M:%S')
-            
-            print(f"   [{i}/{len(data)}] 删除消息 {ts} (发送时间: {send_time})")
-            
-            if self.delete_message(channel, ts):
-                deleted_count += 1
-            else:
-                failed_count += 1
+            workspace = workspaces.get(record.get('workspace'))
+            error = self._try_delete(channel, ts, workspace.client, workspace.name)
+            progress.item(error is None, error=error, channel=channel, ts=ts, send_time=send_time)
             
             time.sleep(0.1)
         
-        # 清空pending_deletes.json文件
-        with open(file, 'w') as f:
-            json.dump([], f)
+        # 清空pending_deletes记录
+        store.save('pending_deletes', [])
+        store.flush()
         
-        print(f"✅ 删除完成: 成功 {deleted_count} 条，失败 {failed_count} 条")
-        print("📝 已清空 pending_deletes.json 文件")
+        progress.finish()
+        log(logger, logging.INFO, "📝 已清空 pending_deletes 记录")
     
     def show_channel_info(self):
         """显示频道信息"""
@@ -198,24 +137,20 @@ class SlackMessageDeleter:
         print(f"   频道A (画板): {self.channel_a}")
         print(f"   频道B (消息): {self.channel_b}")
         
-        # 获取频道A的消息数量
-        messages_a = self.get_channel_history(self.channel_a, limit=1000)
-        print(f"   频道A消息数量: {len(messages_a)}")
+        # 增量同步后从本地镜像统计消息数量
+        self.sync_history(self.channel_a)
+        print(f"   频道A消息数量: {self.history.count(self.channel_a)}")
         
-        # 获取频道B的消息数量
-        messages_b = self.get_channel_history(self.channel_b, limit=1000)
-        print(f"   频道B消息数量: {len(messages_b)}")
+        self.sync_history(self.channel_b)
+        print(f"   频道B消息数量: {self.history.count(self.channel_b)}")
         
-        # 显示pending_deletes.json中的记录
-        try:
-            with open('pending_deletes.json', 'r') as f:
-                pending_data = json.load(f)
-            print(f"   待删除消息记录: {len(pending_data)} 条")
-        except:
-            print("   待删除消息记录: 0 条")
+        # 显示pending_deletes中的记录
+        pending_data = get_state_store().load('pending_deletes', [])
+        print(f"   待删除消息记录: {len(pending_data)} 条")
 
 def main():
     """主函数"""
+    Config.load()
     print("🗑️  Slack频道消息删除工具")
     print("=" * 50)
     
@@ -232,6 +167,8 @@ def main():
     
     # 显示频道信息
     deleter.show_channel_info()
+    # 交互提示前先写出后台缓冲的日志
+    flush_logs()
     print()
     
     while True:
@@ -241,7 +178,7 @@ def main():
         print("3. 删除两个频道中的所有消息")
         print("4. 删除频道A中最近24小时的消息")
         print("5. 删除频道B中最近24小时的消息")
-        print("6. 删除pending_deletes.json中记录的消息")
+        print("6. 删除pending_deletes中记录的消息")
         print("7. 显示频道信息")
         print("0. 退出")
         
@@ -272,7 +209,7 @@ def main():
             if confirm == 'y':
                 deleter.delete_messages_by_time(Config.SLACK_CHANNEL_B, 24, "频道B")
         elif choice == '6':
-            confirm = input("⚠️  确定要删除pending_deletes.json中记录的消息吗？(y/N): ").strip().lower()
+            confirm = input("⚠️  确定要删除pending_deletes中记录的消息吗？(y/N): ").strip().lower()
             if confirm == 'y':
                 deleter.delete_pending_deletes()
         elif choice == '7':
@@ -280,6 +217,7 @@ def main():
         else:
             print("❌ 无效选项，请重新选择")
         
+        flush_logs()
         print("\n" + "=" * 50)
 
 if __name__ == "__main__":
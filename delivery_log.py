@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+发送与删除历史
+每次发送、删除及其失败追加一行到 CSV 文件（pending_deletes 只保存尚未删除的记录，没有历史），
+供 stats_report.py 统计每日发送量、删除耗时、逾期删除、失败率和积压变化。固定列、只追加，百万行也能很快载入
+"""
+
+import csv
+import os
+import threading
+import time
+from config import Config
+
+COLUMNS = ['event', 'time', 'workspace', 'channel', 'ts', 'sent', 'expire', 'error']
+
+
+class DeliveryLog:
+    """追加写入的事件日志，线程安全"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def record(self, event, workspace, channel, ts=None, sent=None, expire=True, error=None):
+        """记录一个事件：post、post_failed、delete 或 delete_failed；sent 为删除事件对应消息的发送时间"""
+        row = [event, round(time.time(), 3), workspace, channel, ts or '',
+               '' if sent is None else round(sent, 3), int(bool(expire)), error or '']
+        with self.lock:
+            new_file = not os.path.exists(self.path)
+            with open(self.path, 'a', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(COLUMNS)
+                writer.writerow(row)
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_delivery_log():
+    """按 DELIVERY_LOG 返回进程内共用的日志，未配置时返回 None"""
+    global _log
+    if not Config.DELIVERY_LOG:
+        return None
+    with _log_lock:
+        if _log is None:
+            _log = DeliveryLog(Config.DELIVERY_LOG)
+        return _log
+
+
+def record_event(event, workspace, channel, ts=None, sent=None, expire=True, error=None):
+    """记录事件，未配置日志时忽略；写入失败不影响发送和删除"""
+    delivery_log = get_delivery_log()
+    if delivery_log is None:
+        return
+    try:
+        delivery_log.record(event, workspace, channel, ts, sent, expire, error)
+    except OSError as e:
+        print(f"⚠️  写入发送历史失败: {e}")
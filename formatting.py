@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+消息格式化
+从摘要中提取编号内容并渲染成频道A、频道B的消息。这里只有纯函数，只依赖正则和 html_mrkdwn，
+渲染进程池的工作进程导入本模块时不会加载 Slack、订阅源、配置和日志等其余依赖
+（run_chunk 也放在这里，工作进程反序列化任务时不需要导入 render_pool）
+"""
+
+import re
+from html_mrkdwn import html_to_mrkdwn
+
+BR_TAG = re.compile(r'<br\s*/?>')
+DATE = re.compile(r'(\d{2,4}[.\-/]\s*\d{1,2}[.\-/]\d{1,2})')
+PARTIAL_DATE = re.compile(r'(\d{1,2}[.\-/]\s*\d{1,2}/)\d{1,2}/')
+# 匹配 1/ 内容 – <a href="网址" ...>source</a>
+LINKED_ITEM = re.compile(r'([1-9][0-9]?)/\s*([^–]+)–\s*<a href="([^"]+)"[^>]*>source</a>')
+PLAIN_ITEM = re.compile(r'([1-9][0-9]?)/\s*([^–\n]+)')
+TITLE_DATE = re.compile(r'(\d{4}/\d{1,2}/\d{1,2})')
+
+
+def extract_numbered_content(content):
+    """提取按数字排序的内容，去掉前缀日期和正文中的日期"""
+    # 保留换行
+    content = BR_TAG.sub('\n', content)
+    # 去除所有日期
+    content = DATE.sub('', content)
+    content = PARTIAL_DATE.sub('', content)
+    formatted_items = [f"{number}. {text.strip()} <{link}|【详情】>"
+                       for number, text, link in LINKED_ITEM.findall(content)]
+    if formatted_items:
+        return formatted_items
+    # 如果没有，尝试更简单的格式
+    return [f"{number}. {text.strip()}" for number, text in PLAIN_ITEM.findall(content)]
+
+
+def join_numbered_items(numbered_items):
+    """频道A格式：最多10条编号内容，在每条内容之间添加换行"""
+    return f"\n\n".join(numbered_items[:10]).strip()
+
+
+def format_channel_a(summary, numbered_items=None):
+    """频道A（画板）消息，只输出内容列表，不重复标题；numbered_items 为已提取的编号内容"""
+    if numbered_items is None:
+        numbered_items = extract_numbered_content(summary)
+    if numbered_items:
+        return join_numbered_items(numbered_items)
+    # 如果没有找到数字格式，使用原始内容
+    return html_to_mrkdwn(summary, 500)
+
+
+def format_channel_b(title, summary, link, numbered_items=None):
+    """频道B（消息列表）消息"""
+    # 提取标题（去掉前缀）
+    if "SoSoValue" in title:
+        # 提取日期部分
+        date_match = TITLE_DATE.search(title)
+        if date_match:
+            title = f"每日加密热点新闻榜单｜{date_match.group(1)}"
+
+    if numbered_items is None:
+        numbered_items = extract_numbered_content(summary)
+
+    if numbered_items:
+        # 格式化消息
+        formatted_msg = f"""
+*{title}*
+
+{chr(10).join(numbered_items[:5])}  # 最多显示5条
+
+*完整内容:* {link}
+        """.strip()
+    else:
+        # 如果没有找到数字格式，使用原始内容
+        content = html_to_mrkdwn(summary, 300)
+        formatted_msg = f"""
+*{title}*
+
+{content}
+
+*完整内容:* {link}
+        """.strip()
+
+    return formatted_msg
+
+
+def expire_notice(seconds):
+    """自动删除提示中的时长，按小时显示"""
+    return f"{seconds / 3600:g} 小时"
+
+
+def run_chunk(func, payloads):
+    """渲染进程池的工作进程执行一批任务"""
+    return [func(payload) for payload in payloads]
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+配置热加载
+订阅源、路由、投递目标、自定义处理阶段、关键词和定时时间组成一个不可变的设置快照；配置文件变化或收到 SIGHUP 时，
+在后台线程重新读取配置、编译过滤规则，成功后整体替换快照，正在运行的任务继续使用旧快照。
+配置未变的工作区和投递目标沿用原对象，限流配额不会因为重新加载而重置
+"""
+
+import os
+import re
+import signal
+import threading
+from config import Config
+from pipeline import load_feed_stages
+from sinks import load_sinks
+from workspaces import WorkspaceRegistry, get_slack_client
+
+
+class RuntimeSettings:
+    """一次加载得到的设置快照，加载后不再修改"""
+
+    def __init__(self, workspaces, filter_keywords, schedule_time, channel_a=None, channel_b=None, sinks=(),
+                 feed_stages=None):
+        self.workspaces = workspaces
+        self.sinks = list(sinks)
+        self.feed_stages = feed_stages or {}
+        self.filter_keywords = filter_keywords
+        self.schedule_time = schedule_time
+        self.channel_a = channel_a
+        self.channel_b = channel_b
+        # 预先编译关键词，过滤时只做一次正则匹配
+        keywords = [keyword.strip().lower() for keyword in filter_keywords if keyword.strip()]
+        self.keyword_pattern = re.compile('|'.join(map(re.escape, keywords))) if keywords else None
+
+    @classmethod
+    def load(cls, previous=None):
+        """按当前 Config 构建快照；previous 为当前快照时，配置未变的工作区和投递目标沿用原对象"""
+        return cls(
+            WorkspaceRegistry.load(previous=previous.workspaces if previous else None),
+            Config.CONTENT_FILTER_KEYWORDS,
+            Config.SCHEDULE_TIME,
+            Config.SLACK_CHANNEL_A,
+            Config.SLACK_CHANNEL_B,
+            load_sinks(get_slack_client, previous=previous.sinks if previous else ()),
+            load_feed_stages(),
+        )
+
+    def sinks_for(self, feed):
+        """订阅了该订阅源的投递目标"""
+        return [sink for sink in self.sinks if feed in sink.feeds]
+
+    def should_include(self, title, content):
+        """关键词过滤：未配置关键词时全部保留"""
+        if not self.filter_keywords:
+            return True
+        if self.keyword_pattern is None:
+            return False
+        return self.keyword_pattern.search((title + " " + content).lower()) is not None
+
+
+class ConfigWatcher:
+    """轮询配置文件的修改时间，并响应 SIGHUP；检测到变化后调用 on_change"""
+
+    def __init__(self, paths, on_change, interval=5):
+        self.paths = paths  # 返回待监视文件列表的函数，路径本身也可能随配置变化
+        self.on_change = on_change
+        self.interval = interval
+        self.trigger = threading.Event()
+        self.stop_event = threading.Event()
+        self.mtimes = self.snapshot()
+
+    def snapshot(self):
+        mtimes = {}
+        for path in self.paths():
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def install_sighup(self):
+        """SIGHUP 只设置事件，实际加载在监视线程中完成（只能在主线程注册）"""
+        if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.trigger.set())
+
+    def run(self):
+        while not self.stop_event.is_set():
+            signalled = self.trigger.wait(self.interval if self.interval > 0 else None)
+            self.trigger.clear()
+            if self.stop_event.is_set():
+                break
+            mtimes = self.snapshot()
+            if signalled or mtimes != self.mtimes:
+                self.mtimes = mtimes
+                try:
+                    self.on_change()
+                except Exception as e:
+                    print(f"❌ 配置热加载失败，继续使用原配置: {e}")
+
+    def start(self):
+        self.install_sighup()
+        thread = threading.Thread(target=self.run, name='config-watcher', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stop_event.set()
+        self.trigger.set()
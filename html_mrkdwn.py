@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+HTML 转 Slack mrkdwn
+基于 html.parser 的流式转换，一遍完成：链接转成 <url|文本>，实体解码，<br> 转换行，保留列表和粗体等格式。
+设置长度预算时按行（条目）边界截断，预算用完后不再解析剩余内容；第一行就超出预算时按标记边界在行内截断，
+只缩短链接文字和普通文字，不切断 <url|、转义字符，并补上未闭合的粗体等标记
+"""
+
+import re
+from html.parser import HTMLParser
+
+# 标签对应的 mrkdwn 标记
+INLINE_MARKS = {
+    'b': '*', 'strong': '*',
+    'i': '_', 'em': '_',
+    's': '~', 'strike': '~', 'del': '~',
+    'code': '`',
+}
+BLOCK_TAGS = {'p', 'div', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'tr'}
+SKIP_TAGS = {'script', 'style', 'head'}
+WHITESPACE = re.compile(r'\s+')
+PARTIAL_ENTITY = re.compile(r'&[a-z]{0,3}$')
+
+
+def escape_mrkdwn(text):
+    """Slack 文本中只需转义 & < >"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def escape_url(url):
+    """链接地址同样转义 & < >，| 会被当作链接文字的分隔符，改用百分号编码"""
+    return escape_mrkdwn(url).replace('|', '%7C')
+
+
+def cut_text(text, size):
+    """截取已转义文本的前 size 个字符，不切断 &amp; 等转义"""
+    return PARTIAL_ENTITY.sub('', text[:max(size, 0)])
+
+
+def render_link(href, text):
+    return f"<{href}|{text}>" if text and text != href else f"<{href}>"
+
+
+def render(tokens):
+    """行由标记组成：('text', 已转义文本)、('mark', 粗体等成对标记)、('link', 地址, 链接文字)"""
+    return ''.join(render_link(*token[1:]) if token[0] == 'link' else token[1] for token in tokens)
+
+
+def truncate(tokens, limit):
+    """按标记边界把一行截到 limit 个字符以内：普通文字和链接文字可以缩短，标记和链接地址不拆开，
+    截断处仍未闭合的成对标记在末尾补上"""
+    parts = []
+    size = 0
+    open_marks = []
+    for token in tokens:
+        closers = sum(len(mark) for mark in open_marks)
+        kind = token[0]
+        if kind == 'mark':
+            mark = token[1]
+            closing = bool(open_marks) and open_marks[-1] == mark
+            after = closers - len(mark) if closing else closers + len(mark)
+            if size + len(mark) + after > limit:
+                break
+            if closing:
+                open_marks.pop()
+            else:
+                open_marks.append(mark)
+            parts.append(mark)
+            size += len(mark)
+            continue
+        rendered = render([token])
+        if size + len(rendered) + closers <= limit:
+            parts.append(rendered)
+            size += len(rendered)
+            continue
+        room = limit - size - closers
+        if kind == 'text':
+            parts.append(cut_text(rendered, room))
+        else:
+            href = token[1]
+            text = cut_text(token[2], room - len(href) - 3).rstrip()
+            if text:
+                parts.append(render_link(href, text))
+        break
+    parts.extend(reversed(open_marks))
+    return ''.join(parts).strip()
+
+
+class MrkdwnConverter(HTMLParser):
+    """把 HTML 分块喂入，逐行输出 mrkdwn；limit 为输出字符数上限"""
+
+    def __init__(self, limit=None):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.lines = []
+        self.size = 0
+        self.line = []
+        self.truncated = False
+        self.done = False
+        self.link = None  # 当前 <a> 的 (href, 文本片段)
+        self.lists = []  # 嵌套列表，ol 记录当前序号，ul 为 None
+        self.skip = 0
+        self.pre = 0
+
+    # 行缓冲：遇到换行时整行提交，长度预算在这里按行检查
+    def write(self, text, kind='text'):
+        token = (kind, text)
+        if self.link is not None:
+            self.link[1].append(token)
+        else:
+            self.line.append(token)
+
+    def write_mark(self, mark):
+        self.write(mark, 'mark')
+
+    def newline(self, force=False):
+        """结束当前行；块级标签只在行内有内容时换行，<br> 总是换行，预格式化文本保留空行"""
+        if self.link is not None:
+            return
+        tokens = self.line
+        line = render(tokens)
+        line = line.rstrip() if self.pre else line.strip()
+        self.line = []
+        if not line and not self.pre and (not force or not self.lines or not self.lines[-1]):
+            # 连续空行只保留一个
+            return
+        self.commit(line, tokens)
+
+    def commit(self, line, tokens):
+        cost = len(line) + (1 if self.lines else 0)
+        if self.limit is not None and self.size + cost > self.limit:
+            if not any(self.lines):
+                # 第一行就超出预算时只能在行内截断
+                self.lines = [truncate(tokens, self.limit)]
+            self.truncated = True
+            self.done = True
+            return
+        self.lines.append(line)
+        self.size += cost
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag in SKIP_TAGS:
+            self.skip += 1
+        elif tag == 'br':
+            self.newline(force=True)
+        elif tag == 'a':
+            href = dict(attrs).get('href')
+            if href and self.link is None:
+                self.link = (href, [])
+        elif tag in INLINE_MARKS:
+            self.write_mark(INLINE_MARKS[tag])
+        elif tag == 'pre':
+            self.newline()
+            self.pre += 1
+            self.write_mark('```')
+        elif tag in ('ul', 'ol'):
+            self.newline()
+            self.lists.append(0 if tag == 'ol' else None)
+        elif tag == 'li':
+            self.newline()
+            indent = '  ' * max(0, len(self.lists) - 1)
+            if self.lists and self.lists[-1] is not None:
+                self.lists[-1] += 1
+                self.write(f"{indent}{self.lists[-1]}. ")
+            else:
+                self.write(f"{indent}• ")
+        elif tag in BLOCK_TAGS:
+            self.newline()
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/> 等自闭合标签只需按开始标签处理
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag in SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif tag == 'a' and self.link is not None:
+            href, tokens = self.link
+            self.link = None
+            self.line.append(('link', escape_url(href), render(tokens).strip()))
+        elif tag in INLINE_MARKS:
+            self.write_mark(INLINE_MARKS[tag])
+        elif tag == 'pre':
+            self.write_mark('```')
+            self.newline()
+            self.pre = max(0, self.pre - 1)
+        elif tag in ('ul', 'ol'):
+            if self.lists:
+                self.lists.pop()
+            self.newline()
+        elif tag == 'li' or tag in BLOCK_TAGS:
+            self.newline()
+
+    def handle_data(self, data):
+        if self.done or self.skip:
+            return
+        if self.pre:
+            # 预格式化文本保留原有换行
+            first, *rest = escape_mrkdwn(data).split('\n')
+            self.write(first)
+            for part in rest:
+                self.newline()
+                self.write(part)
+            return
+        self.write(escape_mrkdwn(WHITESPACE.sub(' ', data)))
+
+    def result(self):
+        """结束解析并返回 mrkdwn 文本，截断时末尾加省略号"""
+        if not self.done:
+            self.close()
+            if self.link is not None:
+                # 未闭合的链接按结束处理
+                self.handle_endtag('a')
+            self.newline()
+        while self.lines and not self.lines[-1]:
+            self.lines.pop()
+        text = '\n'.join(self.lines)
+        return f"{text}..." if self.truncated else text
+
+
+def html_to_mrkdwn(content, limit=None, chunk_size=4096):
+    """把 HTML 转换成 Slack mrkdwn，limit 为最大字符数（按行截断）"""
+    converter = MrkdwnConverter(limit)
+    for start in range(0, len(content), chunk_size):
+        converter.feed(content[start:start + chunk_size])
+        if converter.done:
+            break
+    return converter.result()
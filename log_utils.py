@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+结构化日志工具
+日志经队列交给后台线程批量写出，热循环中不再同步写控制台；没有新日志时后台线程也按刷新间隔写出缓冲区。
+后台线程在第一条日志时才启动，导入模块本身没有副作用
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from config import Config
+
+_listener = None
+_handler = None
+_queue_handler = None
+_setup_lock = threading.Lock()
+
+
+class JSONFormatter(logging.Formatter):
+    """把日志记录格式化为单行JSON"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        data.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """本地调试用的可读格式，附带字段以 key=value 形式输出"""
+
+    def format(self, record):
+        line = record.getMessage()
+        fields = getattr(record, 'fields', {})
+        if fields:
+            line += "  " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class BufferedStreamHandler(logging.Handler):
+    """攒够一批或超过刷新间隔再写出，WARNING 及以上立即写出"""
+
+    def __init__(self, stream=None, capacity=200, flush_interval=2.0):
+        super().__init__()
+        # 未指定时每次写出都取当前的 sys.stdout，标准输出被替换（如测试捕获输出）后仍能写出
+        self.stream = stream
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if (len(self.buffer) >= self.capacity
+                or record.levelno >= logging.WARNING
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                stream = self.stream or sys.stdout
+                stream.write("\n".join(self.buffer) + "\n")
+                stream.flush()
+                self.buffer = []
+            self.last_flush = time.monotonic()
+        finally:
+            self.release()
+
+    def flush_timeout(self):
+        """距离下次按间隔写出的秒数，缓冲区为空时为 None"""
+        if not self.buffer:
+            return None
+        return max(0.0, self.last_flush + self.flush_interval - time.monotonic())
+
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """等待新日志时以缓冲区的刷新间隔为超时，到期后写出，安静的守护进程也不会把日志一直留在缓冲区"""
+
+    def __init__(self, log_queue, handler):
+        super().__init__(log_queue, handler)
+        self.handler = handler
+
+    def _monitor(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=self.handler.flush_timeout())
+            except queue.Empty:
+                self.handler.flush()
+                continue
+            if record is self._sentinel:
+                break
+            self.handle(record)
+
+
+class _SetupOnFirstRecord(logging.Handler):
+    """第一条日志到来时才初始化后台写出线程，只导入模块（如渲染进程池的工作进程重新导入主脚本）不启动线程"""
+
+    def emit(self, record):
+        queue_handler = _setup()
+        if record.levelno >= logging.getLogger('sosovalue').level:
+            queue_handler.handle(record)
+
+
+def _setup():
+    """初始化根日志器：QueueHandler 入队，后台 QueueListener 写出；返回 QueueHandler"""
+    global _listener, _handler, _queue_handler
+    with _setup_lock:
+        if _queue_handler is not None:
+            return _queue_handler
+        root = logging.getLogger('sosovalue')
+        root.setLevel(getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO))
+
+        _handler = BufferedStreamHandler(capacity=Config.LOG_BUFFER_SIZE,
+                                         flush_interval=Config.LOG_FLUSH_INTERVAL)
+        _handler.setFormatter(JSONFormatter() if Config.LOG_FORMAT == 'json' else TextFormatter())
+
+        log_queue = queue.SimpleQueue()
+        _queue_handler = logging.handlers.QueueHandler(log_queue)
+        # 换成新的列表，正在遍历旧列表分发当前这条日志的调用不受影响
+        root.handlers = [_queue_handler]
+        _listener = FlushingQueueListener(log_queue, _handler)
+        _listener.start()
+        atexit.register(_shutdown)
+        return _queue_handler
+
+
+def _shutdown():
+    """退出时写出队列和缓冲区中剩余的日志"""
+    _listener.stop()
+    _handler.flush()
+
+
+def get_logger(name):
+    """获取结构化日志器；后台写出线程在第一条日志时才启动，配置也在那时读取"""
+    root = logging.getLogger('sosovalue')
+    with _setup_lock:
+        if not root.handlers:
+            # 初始化之前不按级别过滤，由 _SetupOnFirstRecord 按配置的级别处理
+            root.setLevel(logging.DEBUG)
+            root.propagate = False
+            root.addHandler(_SetupOnFirstRecord())
+    return logging.getLogger(f'sosovalue.{name}')
+
+
+def log(logger, level, msg, **fields):
+    """带结构化字段写一条日志"""
+    logger.log(level, msg, extra={'fields': fields})
+
+
+def flush_logs():
+    """等待队列中的日志全部写出，用于交互式提示之前"""
+    if _listener is None:
+        return
+    _shutdown()
+    _listener.start()
+
+
+class ProgressReporter:
+    """批量任务进度汇总：每 N 条输出一次进度，逐条明细按采样输出"""
+
+    def __init__(self, logger, label, total, every=None, sample_every=None):
+        self.logger = logger
+        self.label = label
+        self.total = total
+        self.every = every or Config.LOG_PROGRESS_EVERY
+        self.sample_every = sample_every or Config.LOG_SAMPLE_EVERY
+        self.done = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.errors = {}
+        self.start = time.monotonic()
+
+    def item(self, ok, error=None, **fields):
+        """记录一条处理结果"""
+        self.done += 1
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+        if not ok and self.errors.get(error, 0) <= 3:
+            # 每种错误只输出前几次，其余计入汇总
+            log(self.logger, logging.WARNING, f"{self.label}: 失败", index=self.done, error=error, **fields)
+        elif self.done % self.sample_every == 1 or self.sample_every == 1:
+            log(self.logger, logging.DEBUG, f"{self.label}: 明细", index=self.done, ok=ok, **fields)
+
+        if self.done % self.every == 0 and self.done < self.total:
+            self._log_progress(logging.INFO, f"{self.label}: 进度")
+
+    def finish(self):
+        """输出最终汇总"""
+        self._log_progress(logging.INFO, f"{self.label}: 完成", errors=self.errors)
+
+    def _log_progress(self, level, msg, **extra):
+        elapsed = time.monotonic() - self.start
+        log(self.logger, level, msg, done=self.done, total=self.total,
+            succeeded=self.succeeded, failed=self.failed,
+            rate=round(self.done / elapsed, 1) if elapsed > 0 else None, **extra)
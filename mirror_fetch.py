@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+多镜像对冲抓取
+按历史延迟挑选最快的 rsshub 镜像，超过 p90 延迟仍未返回时向下一个镜像发起备份请求，取最先成功的结果。
+下载以流的方式进行，边接收边解压，压缩前后都有字节上限，超大或恶意的响应不会占满内存。
+每个主机经过熔断器，请求超时不超过本轮剩余时间
+"""
+
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import feedparser
+import requests
+from profiler import profile_stage, profiled_call
+from resilience import CircuitOpen, DeadlineExceeded, current_deadline, host_breaker
+from traffic import get_traffic
+
+# brotli 为可选依赖，只有能限制单次解压输出（brotli >= 1.2 的 output_buffer_limit）时才在 Accept-Encoding 中声明 br，
+# 无法限制输出的版本一次 process 就可能展开整个压缩炸弹
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# 所有下载共用一个连接池，同一主机的请求复用连接
+_session = None
+_session_lock = threading.Lock()
+
+# 没有历史数据时的默认对冲延迟和延迟估计（秒）
+DEFAULT_HEDGE_DELAY = 2.0
+MIN_HEDGE_DELAY = 0.3
+MAX_HEDGE_DELAY = 10.0
+
+
+class FetchCancelled(Exception):
+    """请求被对冲中的其他镜像抢先完成而取消"""
+
+
+class ResponseTooLarge(ValueError):
+    """响应超过字节上限"""
+
+
+def get_session():
+    """进程内共用的 requests.Session"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def brotli_supported():
+    """已安装的 brotli 是否支持限制单次解压的输出"""
+    return brotli is not None and hasattr(brotli.Decompressor, 'can_accept_more_data')
+
+
+def accept_encoding():
+    """本机能在字节上限内解码的压缩格式"""
+    return 'gzip, deflate, br' if brotli_supported() else 'gzip, deflate'
+
+
+class StreamDecoder:
+    """按 Content-Encoding 增量解压，解压后的总字节数超过上限时抛出 ResponseTooLarge"""
+
+    def __init__(self, encoding, max_bytes):
+        self.encoding = (encoding or 'identity').strip().lower()
+        self.max_bytes = max_bytes
+        self.size = 0
+        if self.encoding in ('gzip', 'x-gzip', 'deflate'):
+            # 32 + MAX_WBITS 自动识别 gzip 和 zlib 头
+            self.zlib = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        elif self.encoding == 'br':
+            if not brotli_supported():
+                raise ValueError("响应使用 brotli 压缩，但未安装支持输出上限的 brotli（>= 1.2）")
+            self.brotli = brotli.Decompressor()
+        elif self.encoding != 'identity':
+            raise ValueError(f"不支持的压缩格式: {self.encoding}")
+
+    def _count(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise ResponseTooLarge(f"解压后超过 {self.max_bytes} 字节")
+        return data
+
+    def decode(self, chunk):
+        if self.encoding == 'identity':
+            return self._count(chunk)
+        # 每次最多解压到剩余额度加一字节，防止压缩炸弹一次性展开
+        if self.encoding == 'br':
+            parts = [self._count(self.brotli.process(chunk, output_buffer_limit=self.max_bytes - self.size + 1))]
+            # 输出达到上限时解压器暂不接收新数据，继续取出已缓冲的输出
+            while not self.brotli.can_accept_more_data():
+                parts.append(self._count(self.brotli.process(b'', output_buffer_limit=self.max_bytes - self.size + 1)))
+            return b''.join(parts)
+        parts = []
+        data = chunk
+        while data:
+            part = self._count(self.zlib.decompress(data, self.max_bytes - self.size + 1))
+            parts.append(part)
+            data = self.zlib.unconsumed_tail
+        return b''.join(parts)
+
+    def flush(self):
+        if self.encoding in ('gzip', 'x-gzip', 'deflate'):
+            return self._count(self.zlib.flush())
+        return b''
+
+
+def is_outage(e):
+    """下载异常是否说明主机故障：连接失败、超时、5xx 和 429 计入，取消和时限到期不计入"""
+    if isinstance(e, (FetchCancelled, DeadlineExceeded)):
+        return None
+    if isinstance(e, requests.exceptions.HTTPError):
+        status = e.response.status_code if e.response is not None else 0
+        return status >= 500 or status == 429
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def download(url, headers, max_bytes, timeout=30, cancel=None, deadline=None):
+    """流式下载并解压，返回解压后的内容；cancel 事件被设置时抛出 FetchCancelled，
+    主机熔断时抛出 CircuitOpen，超过周期时限时抛出 DeadlineExceeded"""
+    deadline = deadline or current_deadline()
+    if deadline is not None:
+        timeout = deadline.timeout(timeout)
+
+    def fetch():
+        return _download(url, headers, max_bytes, timeout, cancel, deadline)
+
+    traffic = get_traffic()
+    call = (lambda: traffic.feed(url, fetch)) if traffic is not None else fetch
+    return host_breaker(url).call(call, is_outage)
+
+
+def _download(url, headers, max_bytes, timeout, cancel, deadline):
+    headers = dict(headers or {}, **{'Accept-Encoding': accept_encoding()})
+    with get_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > max_bytes:
+            raise ResponseTooLarge(f"Content-Length {length} 超过 {max_bytes} 字节")
+        decoder = StreamDecoder(response.headers.get('Content-Encoding'), max_bytes)
+        body = bytearray()
+        received = 0
+        # 读取原始字节自行解压，这样压缩前后的大小都能控制
+        for chunk in response.raw.stream(16384, decode_content=False):
+            if cancel is not None and cancel.is_set():
+                raise FetchCancelled()
+            if deadline is not None:
+                deadline.check()
+            received += len(chunk)
+            if received > max_bytes:
+                raise ResponseTooLarge(f"响应超过 {max_bytes} 字节")
+            body += decoder.decode(chunk)
+        body += decoder.flush()
+    return bytes(body)
+
+
+def percentile(values, pct):
+    """简单百分位数"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class MirrorPool:
+    """镜像健康度记录与对冲请求"""
+
+    def __init__(self, mirrors, store, window=20, timeout=30, max_bytes=10 * 1024 * 1024):
+        self.mirrors = [mirror.rstrip('/') for mirror in mirrors if mirror.strip()]
+        self.store = store
+        self.window = window
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.health = self.load_health()
+
+    def load_health(self):
+        """加载历史健康度"""
+        return self.store.load('mirror_health', {})
+
+    def save_health(self):
+        """保存健康度，供下次运行使用"""
+        with self.lock:
+            self.store.save('mirror_health', self.health)
+
+    def stats(self, mirror):
+        return self.health.setdefault(mirror, {'latencies': [], 'results': [], 'successes': 0, 'failures': 0})
+
+    def record(self, mirror, latency, ok):
+        """记录一次请求的耗时和结果，ok 为 None 时只记录耗时"""
+        with self.lock:
+            stats = self.stats(mirror)
+            stats['latencies'] = (stats['latencies'] + [round(latency, 3)])[-self.window:]
+            if ok is not None:
+                stats['results'] = (stats['results'] + [1 if ok else 0])[-self.window:]
+                stats['successes' if ok else 'failures'] += 1
+
+    def score(self, mirror):
+        """健康分：中位延迟加上近期失败率惩罚，越小越好；没有数据的镜像按默认延迟估计"""
+        stats = self.stats(mirror)
+        if not stats['latencies']:
+            return DEFAULT_HEDGE_DELAY
+        results = stats['results']
+        failure_rate = 1 - sum(results) / len(results) if results else 0
+        return percentile(stats['latencies'], 50) + failure_rate * MAX_HEDGE_DELAY
+
+    def ranked(self):
+        """按健康分排序的镜像列表"""
+        with self.lock:
+            return sorted(self.mirrors, key=self.score)
+
+    def hedge_delay(self, mirror):
+        """发起备份请求前的等待时间：该镜像近期延迟的 p90"""
+        with self.lock:
+            latencies = self.stats(mirror)['latencies']
+            if len(latencies) < 3:
+                return DEFAULT_HEDGE_DELAY
+            return min(MAX_HEDGE_DELAY, max(MIN_HEDGE_DELAY, percentile(latencies, 90)))
+
+    def fetch_one(self, mirror, path, headers, cancel, deadline=None):
+        """从单个镜像抓取并解析，取消事件被设置时尽快放弃"""
+        start = time.monotonic()
+        try:
+            content = download(mirror + path, headers, self.max_bytes, self.timeout, cancel, deadline)
+            # feedparser 没有增量解析接口，在有上限的完整内容上解析
+            with profile_stage('fetch: feedparser'):
+                feed = feedparser.parse(content)
+            if not feed.entries:
+                raise ValueError("订阅源没有条目")
+        except CircuitOpen:
+            # 熔断中的镜像没有发出请求，不影响健康度
+            raise
+        except (FetchCancelled, DeadlineExceeded):
+            # 被取消或超过时限的慢请求只记录已耗费的时间，避免慢镜像一直排在前面
+            self.record(mirror, time.monotonic() - start, None)
+            raise
+        except Exception:
+            self.record(mirror, time.monotonic() - start, False)
+            raise
+        self.record(mirror, time.monotonic() - start, True)
+        return feed
+
+    def fetch(self, path, headers):
+        """对冲抓取：返回 (feed, 镜像)，所有镜像都失败时返回 (None, None)；
+        超过本轮时限时抛出 DeadlineExceeded，所有镜像都已熔断时抛出 CircuitOpen"""
+        order = self.ranked()
+        if not order:
+            return None, None
+        # 工作线程中取不到调用方的周期时限，显式传入
+        deadline = current_deadline()
+        errors = []
+
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(order))
+        pending = {}
+        launched = 0
+
+        def launch():
+            nonlocal launched
+            mirror = order[launched]
+            launched += 1
+            pending[executor.submit(profiled_call, self.fetch_one, mirror, path, headers, cancel, deadline)] = mirror
+            return self.hedge_delay(mirror)
+
+        try:
+            delay = launch()
+            while pending:
+                # 最后一个镜像也已发出时不再对冲，等到有结果或本轮时限到期为止
+                can_hedge = launched < len(order)
+                timeout = delay if can_hedge else None
+                if deadline is not None:
+                    timeout = max(0, min(timeout or deadline.remaining(), deadline.remaining()))
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if deadline is not None and deadline.expired() and not done:
+                    raise DeadlineExceeded(f"抓取 {path} 超过本轮时限")
+                for future in done:
+                    mirror = pending.pop(future)
+                    if future.exception() is None:
+                        if launched > 1:
+                            print(f"⚡ 对冲抓取命中镜像: {mirror}")
+                        return future.result(), mirror
+                    errors.append(future.exception())
+                    print(f"⚠️  镜像抓取失败 {mirror}: {type(errors[-1]).__name__}: {errors[-1]}")
+                # 超过对冲延迟仍未返回，或有镜像失败：向下一个镜像发起请求
+                if can_hedge:
+                    delay = launch()
+            for error in errors:
+                if isinstance(error, DeadlineExceeded):
+                    raise error
+            if errors and all(isinstance(error, CircuitOpen) for error in errors):
+                raise CircuitOpen(f"所有镜像均已熔断: {path}")
+            return None, None
+        finally:
+            cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.save_health()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+近似重复新闻检测
+多个新闻频道会用略有不同的措辞报道同一条新闻，按链接或 guid 去重发现不了。这里对每条编号内容的文本
+取字符 n-gram（默认二元，适合中文），计算 MinHash 签名，放进分段 LSH 索引：查询只比较落在同一分段桶里的候选，
+再用签名估计 Jaccard 相似度确认。索引只保留最近 window_seconds 内的内容，按加入顺序淘汰。
+DestinationIndex 按推送目标（工作区、频道）各用一个索引：新闻只在已推送过它的目标中视为重复
+"""
+
+import re
+import threading
+import time
+import zlib
+from collections import deque
+import numpy as np
+
+MERSENNE = (1 << 31) - 1
+NORMALIZE = re.compile(r'[\W_]+')
+
+
+def shingles(text, size=2):
+    """规范化（去掉标点空白、转小写）后的字符 n-gram 集合；中文按字切分比按词更稳定"""
+    text = NORMALIZE.sub('', text).lower()
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """num_perm 个 (a * x + b) mod p 置换的 MinHash；n-gram 用 crc32 哈希，签名在不同进程间一致"""
+
+    def __init__(self, num_perm=32, shingle_size=2, seed=1):
+        rng = np.random.default_rng(seed)
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, MERSENNE, num_perm, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, MERSENNE, num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, text):
+        """文本的签名（uint32 数组），没有可用字符时返回 None"""
+        grams = shingles(text, self.shingle_size)
+        if not grams:
+            return None
+        hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+        # a < 2^31、x < 2^32，乘积加 b 不会超出 uint64
+        return ((self.a * hashes + self.b) % MERSENNE).min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """带时间窗口的 MinHash LSH 索引，线程安全。
+    bands 段、每段 num_perm / bands 行：相似度约为 (1 / bands) ** (bands / num_perm) 以上的内容才会成为候选"""
+
+    def __init__(self, window_seconds, threshold=0.6, num_perm=32, bands=8, shingle_size=2, capacity=1024,
+                 hasher=None):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须是 bands 的整数倍")
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = hasher or MinHasher(num_perm, shingle_size)
+        # 每段：段哈希 -> 内容编号；大多数桶只有一条内容，直接存编号，有多条时才用列表，减少需要垃圾回收跟踪的对象
+        self.buckets = [{} for _ in range(bands)]
+        # 签名按编号存放在环形数组中：内容按时间顺序加入和淘汰，存活的编号总是连续的一段
+        self.signatures = np.zeros((capacity, num_perm), dtype=np.uint32)
+        self.owners = {}  # 内容编号 -> 所属条目，被 discard 去掉的内容为 None，淘汰时一并清理
+        self.owner_ids = {}  # 所属条目 -> 内容编号列表
+        self.times = deque()  # 加入时间，与存活编号一一对应
+        self.first_id = 0
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.next_id - self.first_id
+
+    def band_keys(self, signature):
+        return [hash(band.tobytes()) for band in signature.reshape(self.bands, self.rows)]
+
+    def _unlink(self, item_id):
+        """把内容从各段的桶中移除"""
+        signature = self.signatures[item_id % len(self.signatures)]
+        for bucket, key in zip(self.buckets, self.band_keys(signature)):
+            ids = bucket.get(key)
+            if ids == item_id:
+                del bucket[key]
+            elif ids is not None:
+                ids.remove(item_id)
+                if len(ids) == 1:
+                    bucket[key] = ids[0]
+
+    def _evict(self, now):
+        cutoff = now - self.window_seconds
+        while self.times and self.times[0] < cutoff:
+            self.times.popleft()
+            item_id = self.first_id
+            owner = self.owners.pop(item_id)
+            if owner is not None:
+                self._unlink(item_id)
+                owner_ids = self.owner_ids[owner]
+                owner_ids.remove(item_id)
+                if not owner_ids:
+                    del self.owner_ids[owner]
+            self.first_id += 1
+
+    def _grow(self):
+        old = self.signatures
+        self.signatures = np.zeros((len(old) * 2, old.shape[1]), dtype=np.uint32)
+        ids = np.arange(self.first_id, self.next_id)
+        self.signatures[ids % len(self.signatures)] = old[ids % len(old)]
+
+    def _add(self, signature, keys, owner, now):
+        if len(self) == len(self.signatures):
+            self._grow()
+        item_id = self.next_id
+        self.signatures[item_id % len(self.signatures)] = signature
+        for bucket, key in zip(self.buckets, keys):
+            ids = bucket.get(key)
+            if ids is None:
+                bucket[key] = item_id
+            elif isinstance(ids, list):
+                ids.append(item_id)
+            else:
+                bucket[key] = [ids, item_id]
+        self.owners[item_id] = owner
+        self.owner_ids.setdefault(owner, []).append(item_id)
+        self.times.append(now)
+        self.next_id += 1
+
+    def _best(self, signature, keys):
+        """候选中的 [(相似度, 所属条目)]，按相似度从高到低"""
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            ids = bucket.get(key)
+            if isinstance(ids, list):
+                candidates.update(ids)
+            elif ids is not None:
+                candidates.add(ids)
+        if not candidates:
+            return []
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self.signatures[ids % len(self.signatures)] == signature).mean(axis=1)
+        order = np.argsort(-similarity)
+        return [(float(similarity[i]), self.owners[int(ids[i])]) for i in order if similarity[i] >= self.threshold]
+
+    def check(self, text, owner, now=None):
+        """检查一条内容：近期其他条目有相似内容时返回 (那个条目, 相似度)，不加入索引；
+        否则加入索引（同一条目再次出现的相同内容不重复加入）并返回 None"""
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return None
+        keys = self.band_keys(signature)
+        now = now or time.time()
+        with self.lock:
+            self._evict(now)
+            matches = self._best(signature, keys)
+            for similarity, match_owner in matches:
+                if match_owner != owner:
+                    return match_owner, similarity
+            if not matches:
+                self._add(signature, keys, owner, now)
+        return None
+
+    def discard(self, owner):
+        """去掉某个条目加入的全部内容（推送失败时调用），之后其他条目中的相似内容不再被判为重复，返回去掉的条数"""
+        with self.lock:
+            ids = self.owner_ids.pop(owner, [])
+            for item_id in ids:
+                self._unlink(item_id)
+                self.owners[item_id] = None
+        return len(ids)
+
+    def stats(self):
+        with self.lock:
+            return {'items': len(self), 'buckets': sum(len(bucket) for bucket in self.buckets),
+                    'capacity': len(self.signatures)}
+
+
+class DestinationIndex:
+    """按推送目标分开的近似重复索引，目标为 (工作区, 频道) 或 ('sink', 投递目标名称)，首次用到时创建。
+    一条新闻推送到某个频道后，只在这个频道中视为已推送，订阅了其他频道的读者仍会收到"""
+
+    def __init__(self, window_seconds, threshold=0.6, num_perm=32, shingle_size=2, **kwargs):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.kwargs = dict(kwargs, num_perm=num_perm, shingle_size=shingle_size)
+        # 各目标共用一组置换，同一文本的签名相同
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def index(self, destination):
+        with self.lock:
+            index = self.indexes.get(destination)
+            if index is None:
+                index = self.indexes[destination] = NearDuplicateIndex(
+                    self.window_seconds, self.threshold, hasher=self.hasher, **self.kwargs)
+            return index
+
+    def check(self, destination, text, owner, now=None):
+        """在一个目标中检查内容，见 NearDuplicateIndex.check"""
+        return self.index(destination).check(text, owner, now)
+
+    def discard(self, destination, owner):
+        """推送到该目标失败时，去掉条目在这个目标中加入的内容"""
+        with self.lock:
+            index = self.indexes.get(destination)
+        return index.discard(owner) if index is not None else 0
+
+    def stats(self):
+        with self.lock:
+            indexes = list(self.indexes.values())
+        stats = [index.stats() for index in indexes]
+        return {'destinations': len(stats), 'items': sum(item['items'] for item in stats)}
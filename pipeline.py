@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+分阶段流水线
+每个阶段是一个生成器函数（接收上游的可迭代对象，产出交给下游的条目），各阶段在自己的线程中运行，
+阶段之间用有界队列连接：下游处理第一条时上游继续处理后面的条目，下游慢时上游在队列满处等待（背压）。
+每个阶段分别统计处理耗时、CPU 时间、等待上游和等待下游的时间
+"""
+
+import contextvars
+import importlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from config import Config
+from log_utils import get_logger, log
+from profiler import profile_thread, record_stage
+
+logger = get_logger('pipeline')
+
+_END = object()
+
+# 产出 Item 的内置阶段，自定义阶段可以插在它们之后
+ITEM_STAGES = ('parse', 'filter', 'dedup', 'render')
+
+
+class Item:
+    """流水线中的一条内容"""
+
+    __slots__ = ('feed', 'entry', 'content', 'meta')
+
+    def __init__(self, feed, entry, content=None):
+        self.feed = feed
+        self.entry = entry
+        self.content = content
+        self.meta = {}
+
+
+class StageStats:
+    """一个阶段的计数和耗时（秒）"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+        self.drained = False  # 是否已取到上游的结束标记
+
+    @property
+    def busy(self):
+        """扣除等待上下游之后，阶段本身的耗时"""
+        return max(0.0, self.wall - self.wait_in - self.wait_out)
+
+    def as_dict(self):
+        return {'stage': self.name, 'items_in': self.items_in, 'items_out': self.items_out,
+                'busy_ms': round(self.busy * 1000, 1), 'cpu_ms': round(self.cpu * 1000, 1),
+                'wait_in_ms': round(self.wait_in * 1000, 1), 'wait_out_ms': round(self.wait_out * 1000, 1)}
+
+
+class PipelineStopped(Exception):
+    """其他阶段出错，流水线提前结束"""
+
+
+class Pipeline:
+    """按顺序连接的阶段：[(名称, 生成器函数), ...]"""
+
+    def __init__(self, stages, queue_size=None, name='pipeline'):
+        self.stages = list(stages)
+        self.queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE
+        self.name = name
+        self.stats = [StageStats(stage_name) for stage_name, _ in self.stages]
+        self.stop = threading.Event()
+        self.errors = []
+
+    def _get(self, source, stats):
+        """从上游队列取条目直到结束标记，记录等待时间"""
+        while True:
+            start = time.perf_counter()
+            item = source.get()
+            stats.wait_in += time.perf_counter() - start
+            if item is _END:
+                stats.drained = True
+                return
+            stats.items_in += 1
+            yield item
+
+    def _put(self, target, item, stats):
+        """放入下游队列；队列满时等待，流水线已停止时放弃"""
+        start = time.perf_counter()
+        while True:
+            try:
+                target.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if self.stop.is_set():
+                    raise PipelineStopped()
+        stats.wait_out += time.perf_counter() - start
+
+    def _run_stage(self, index, func, source, target):
+        stats = self.stats[index]
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            with profile_thread():
+                for item in func(self._get(source, stats)):
+                    if target is not None:
+                        self._put(target, item, stats)
+                    stats.items_out += 1
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            self.errors.append(e)
+            self.stop.set()
+            logger.exception("❌ 流水线阶段出错", extra={'fields': {'pipeline': self.name, 'stage': stats.name}})
+        finally:
+            stats.wall = time.perf_counter() - start
+            stats.cpu = time.thread_time() - cpu_start
+            if target is not None:
+                target.put(_END)
+            # 阶段提前结束时把上游剩余的条目取完，让上游线程能够结束
+            if not stats.drained:
+                for _ in self._get(source, StageStats(stats.name)):
+                    pass
+
+    def _feed(self, items, target):
+        stats = StageStats('source')
+        try:
+            for item in items:
+                self._put(target, item, stats)
+        except PipelineStopped:
+            pass
+        finally:
+            target.put(_END)
+
+    def run(self, items):
+        """运行流水线直到所有条目处理完，返回最后一个阶段产出的条目数；有阶段出错时抛出第一个异常"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(self._feed, items, queues[0]),
+                                    name=f"{self.name}-source", daemon=True)]
+        for index, (stage_name, func) in enumerate(self.stages):
+            target = queues[index + 1] if index + 1 < len(self.stages) else None
+            # 复制当前上下文，阶段线程中也能取到本轮的时限
+            threads.append(threading.Thread(
+                target=contextvars.copy_context().run, args=(self._run_stage, index, func, queues[index], target),
+                name=f"{self.name}-{stage_name}", daemon=True))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for stats in self.stats:
+            record_stage(f"{self.name}: {stats.name}", stats.busy, stats.cpu)
+            log(logger, logging.INFO, "⏱️  流水线阶段", pipeline=self.name, **stats.as_dict())
+        if self.errors:
+            raise self.errors[0]
+        return self.stats[-1].items_out
+
+
+def map_stage(func):
+    """把逐条处理的函数变成阶段：返回 None 时丢弃该条目"""
+    def stage(items):
+        for item in items:
+            result = func(item)
+            if result is not None:
+                yield result
+    return stage
+
+
+def for_feed(feed, func):
+    """只对指定订阅源的条目调用 func，其他条目原样传递"""
+    def stage(items):
+        for item in items:
+            if item.feed != feed:
+                yield item
+                continue
+            result = func(item)
+            if result is not None:
+                yield result
+    return stage
+
+
+def resolve(spec):
+    """把 "模块:函数" 解析为函数"""
+    module_name, _, attr = spec.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def load_feed_stages(path=None):
+    """从 WORKSPACES_FILE 的 stages 读取各订阅源的自定义阶段：
+    {"订阅源": ["模块:函数", {"stage": "模块:函数", "after": "render"}]}，after 为 parse、filter（默认）、dedup 或 render；
+    函数逐条接收 Item，返回 None 时丢弃"""
+    path = path or Config.WORKSPACES_FILE
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f).get('stages', {})
+    stages = {}
+    for feed, specs in config.items():
+        for spec in specs:
+            if isinstance(spec, str):
+                spec = {'stage': spec}
+            after = spec.get('after', 'filter')
+            if after not in ITEM_STAGES:
+                raise ValueError(f"自定义阶段 {spec['stage']} 的 after 必须是 {', '.join(ITEM_STAGES)} 之一")
+            stages.setdefault(feed, []).append((after, spec['stage'], resolve(spec['stage'])))
+    return stages
+
+
+def insert_stages(stages, feed_stages):
+    """把自定义阶段插到指定阶段之后，每个自定义阶段只处理自己订阅源的条目；
+    指定的阶段不在这条流水线中时（如从过滤阶段开始的流水线没有解析阶段），插到最前面"""
+    stages = list(stages)
+    for feed, custom in feed_stages.items():
+        for after, name, func in custom:
+            names = [stage_name for stage_name, _ in stages]
+            position = names.index(after) + 1 if after in names else 0
+            stages.insert(position, (f"{feed}:{name}", for_feed(feed, func)))
+    return stages
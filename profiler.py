@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+周期性能分析工具
+用 cProfile 和 tracemalloc 包裹一次抓取或删除任务，输出各阶段耗时和内存分配热点。
+cProfile 只记录调用它的线程：流水线阶段、投递目标和镜像抓取的工作线程在 profile_thread 中各用一个 cProfile，
+结束后并入报告；渲染进程池的工作进程不在分析范围内
+"""
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# 当前正在运行的分析器，未开启分析时为None
+_active_profiler = None
+
+
+@contextmanager
+def profile_stage(name):
+    """记录一个阶段的墙钟时间和CPU时间，未开启分析时几乎没有开销"""
+    profiler = _active_profiler
+    if profiler is None:
+        yield
+        return
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        profiler.add_stage(name, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+
+def record_stage(name, wall, cpu):
+    """记录在别处测得的阶段耗时（如流水线各阶段线程），未开启分析时忽略"""
+    profiler = _active_profiler
+    if profiler is not None:
+        profiler.add_stage(name, wall, cpu)
+
+
+@contextmanager
+def profile_thread():
+    """在工作线程中用单独的 cProfile 记录调用，结束后并入当前任务的报告；未开启分析时不做任何事"""
+    profiler = _active_profiler
+    if profiler is None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12 起 cProfile 基于 sys.monitoring，同一时刻只能启用一个，主线程的分析已包含所有线程
+        yield
+        return
+    try:
+        yield
+    finally:
+        profile.disable()
+        profiler.add_profile(profile)
+
+
+def profiled_call(func, *args, **kwargs):
+    """提交给线程池的任务：在 profile_thread 中执行 func"""
+    with profile_thread():
+        return func(*args, **kwargs)
+
+
+class CycleProfiler:
+    """单次任务的性能分析器"""
+
+    def __init__(self, output_file, top_n=20):
+        self.output_file = output_file
+        self.top_n = top_n
+        self.stages = {}
+        self.thread_profiles = []
+        self.lock = threading.Lock()
+
+    def add_stage(self, name, wall, cpu):
+        """累加阶段耗时，各工作线程都会调用"""
+        with self.lock:
+            stats = self.stages.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+            stats['calls'] += 1
+            stats['wall'] += wall
+            stats['cpu'] += cpu
+
+    def add_profile(self, profile):
+        """并入一个工作线程的 cProfile 记录"""
+        with self.lock:
+            self.thread_profiles.append(profile)
+
+    def run(self, label, func, *args, **kwargs):
+        """在分析模式下执行一次任务，并把报告写入文件"""
+        global _active_profiler
+        _active_profiler = self
+        self.stages = {}
+        self.thread_profiles = []
+
+        profile = cProfile.Profile()
+        tracemalloc.start(25)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            self.add_stage(label, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            _active_profiler = None
+            self.write_report(label, profile, snapshot, peak)
+
+    def write_report(self, label, profile, snapshot, peak):
+        """写出分析报告"""
+        lines = [
+            f"# 性能分析报告: {label}",
+            f"# 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            "",
+            "## 阶段耗时",
+            f"{'阶段':<32}{'次数':>8}{'墙钟(s)':>12}{'CPU(s)':>12}",
+        ]
+        for name, stats in sorted(self.stages.items(), key=lambda item: item[1]['wall'], reverse=True):
+            lines.append(f"{name:<32}{stats['calls']:>8}{stats['wall']:>12.4f}{stats['cpu']:>12.4f}")
+
+        lines += ["", f"## 内存分配热点 (峰值 {peak / 1024:.1f} KiB)"]
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        for stat in snapshot.statistics('lineno')[:self.top_n]:
+            frame = stat.traceback[0]
+            lines.append(f"{frame.filename}:{frame.lineno}  {stat.size / 1024:.1f} KiB  ({stat.count} 次)")
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        with self.lock:
+            thread_profiles = list(self.thread_profiles)
+        for thread_profile in thread_profiles:
+            stats.add(thread_profile)
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+        lines += ["", f"## cProfile (主线程和 {len(thread_profiles)} 个工作线程，按累计时间排序)", stream.getvalue()]
+
+        with open(self.output_file, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+        print(f"📈 性能分析报告已写入: {self.output_file}")
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+推送接收服务
+内嵌HTTP服务接收 WebSub（PubSubHubbub）或其他来源推送的订阅源更新，立即走过滤/格式化/推送流程。
+推送按 topic 对应到订阅源；没有设置 PUSH_SECRET 时无法校验签名，只监听本机地址
+"""
+
+import hashlib
+import hmac
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import feedparser
+import requests
+from log_utils import get_logger, log
+
+logger = get_logger('push_receiver')
+
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+
+def entry_key(entry):
+    """条目去重键：优先用 guid，其次用链接"""
+    return entry.get('id') or entry.get('link')
+
+
+def entry_fingerprint(entry):
+    """条目去重键加内容摘要，被编辑过的条目会被当作新推送处理"""
+    digest = hashlib.sha1(entry.get('summary', '').encode('utf-8')).hexdigest()[:12]
+    return f"{entry_key(entry)}#{digest}"
+
+
+def discover_hub(feed):
+    """从订阅源的 <link rel="hub"> 和 <link rel="self"> 中找到 hub 地址和 topic"""
+    hub = topic = None
+    for link in feed.feed.get('links', []):
+        if link.get('rel') == 'hub':
+            hub = link.get('href')
+        elif link.get('rel') == 'self':
+            topic = link.get('href')
+    return hub, topic
+
+
+def link_topic(header):
+    """从 hub 推送的 Link 头中取出 rel="self" 的 topic"""
+    for link in requests.utils.parse_header_links(header or ''):
+        if link.get('rel') == 'self':
+            return link.get('url')
+    return None
+
+
+def verify_signature(secret, body, header):
+    """校验 X-Hub-Signature（sha1=... 或 sha256=...）"""
+    if not header or '=' not in header:
+        return False
+    method, signature = header.split('=', 1)
+    if method not in ('sha1', 'sha256'):
+        return False
+    expected = hmac.new(secret.encode(), body, getattr(hashlib, method)).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class PushReceiver:
+    """接收推送并用有限的工作线程处理，重复条目只处理一次。
+    handler(entries, feed) 处理一条推送的条目，feed 为 topic 对应的订阅源（没有 topic 的主动推送为 None），
+    返回推送失败的条目，这些条目的去重记录会被去掉；save_seen 为每条推送处理完后保存去重记录的回调"""
+
+    def __init__(self, handler, host='0.0.0.0', port=8080, path='/websub', secret=None,
+                 workers=4, queue_size=100, max_body_bytes=5 * 1024 * 1024, seen=None,
+                 renew_retry_seconds=60, renew_retry_max_seconds=3600, retention_seconds=None,
+                 save_seen=None):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret = secret
+        self.workers = workers
+        self.max_body_bytes = max_body_bytes
+        self.queue = queue.Queue(maxsize=queue_size)
+        # 已订阅的 topic -> 订阅源名称
+        self.topics = {}
+        # 条目指纹 -> 首次处理的时间，按时间顺序排列，超过 retention_seconds 的从最早的开始去掉
+        self.seen = seen if seen is not None else {}
+        self.seen_lock = threading.Lock()
+        self.retention_seconds = retention_seconds
+        self.save_seen = save_seen
+        self.server = None
+        # topic -> 续订定时器；续订失败时从 renew_retry_seconds 开始按指数退避重试
+        self.timers = {}
+        self.timers_lock = threading.Lock()
+        self.renew_retry_seconds = renew_retry_seconds
+        self.renew_retry_max_seconds = renew_retry_max_seconds
+
+    def mark_new(self, entry):
+        """首次见到的条目（或内容有变化的条目）返回True"""
+        key = entry_fingerprint(entry)
+        now = time.time()
+        with self.seen_lock:
+            self.prune_seen(now)
+            if key in self.seen:
+                return False
+            self.seen[key] = now
+            return True
+
+    def forget(self, entries):
+        """去掉条目的去重记录，之后再次推送时重新处理"""
+        with self.seen_lock:
+            for entry in entries:
+                self.seen.pop(entry_fingerprint(entry), None)
+
+    def prune_seen(self, now=None):
+        """去掉超过保留时间的去重记录，调用方持有 seen_lock"""
+        if self.retention_seconds is None:
+            return
+        cutoff = (now or time.time()) - self.retention_seconds
+        while self.seen:
+            key, seen_at = next(iter(self.seen.items()))
+            if seen_at >= cutoff:
+                break
+            del self.seen[key]
+
+    def feed_for(self, topic):
+        """推送对应的订阅源：(是否接收, 订阅源)，没有 topic 时为默认订阅源（None），未订阅的 topic 不接收"""
+        if topic is None:
+            return True, None
+        return topic in self.topics, self.topics.get(topic)
+
+    def submit(self, body, topic=None):
+        """解析推送内容，新条目连同对应的订阅源放入队列；队列已满时返回False让 hub 稍后重试。
+        topic 取自 Link 头，没有时使用内容中已订阅的 rel="self" 链接"""
+        feed = feedparser.parse(body)
+        if topic is None:
+            _, self_link = discover_hub(feed)
+            topic = self_link if self_link in self.topics else None
+        accepted, feed_name = self.feed_for(topic)
+        if not accepted:
+            log(logger, logging.WARNING, "⚠️  丢弃未订阅 topic 的推送", topic=topic)
+            return True
+        for entry in feed.entries:
+            if not self.mark_new(entry):
+                continue
+            try:
+                self.queue.put_nowait((entry, feed_name))
+            except queue.Full:
+                self.forget([entry])
+                return False
+        return True
+
+    def worker(self):
+        """工作线程：逐条处理队列中的条目，处理出错或推送失败的条目去掉去重记录"""
+        while True:
+            entry, feed_name = self.queue.get()
+            try:
+                failed = self.handler([entry], feed_name)
+            except Exception as e:
+                print(f"❌ 处理推送条目失败: {e}")
+                failed = [entry]
+            finally:
+                self.queue.task_done()
+            if failed:
+                self.forget(failed)
+            if self.save_seen:
+                with self.seen_lock:
+                    self.prune_seen()
+                    self.save_seen()
+
+    def subscribe(self, hub, topic, callback_url, lease_seconds=864000, feed=None):
+        """向 hub 发起订阅，hub 随后会 GET 回调地址完成验证；成功后在租约到期前自动续订。
+        feed 为 topic 对应的订阅源，续订时沿用"""
+        if feed is not None or topic not in self.topics:
+            self.topics[topic] = feed
+        data = {
+            'hub.mode': 'subscribe',
+            'hub.topic': topic,
+            'hub.callback': callback_url,
+            'hub.lease_seconds': lease_seconds,
+        }
+        if self.secret:
+            data['hub.secret'] = self.secret
+        response = requests.post(hub, data=data, timeout=30)
+        if response.status_code not in (202, 204):
+            raise RuntimeError(f"订阅失败: {response.status_code} {response.text[:200]}")
+        # 租约到期前续订
+        self.schedule_renewal(lease_seconds * 0.8, hub, topic, callback_url, lease_seconds)
+        print(f"📬 已向 {hub} 订阅 {topic}")
+
+    def schedule_renewal(self, delay, hub, topic, callback_url, lease_seconds, attempt=0):
+        """delay 秒后续订；同一 topic 只保留最新的一个定时器"""
+        timer = threading.Timer(delay, self.renew, args=(hub, topic, callback_url, lease_seconds, attempt))
+        timer.daemon = True
+        with self.timers_lock:
+            old = self.timers.get(topic)
+            self.timers[topic] = timer
+        if old is not None:
+            old.cancel()
+        timer.start()
+
+    def renew(self, hub, topic, callback_url, lease_seconds, attempt=0):
+        """续订；hub 拒绝或请求出错时记录日志并退避重试，避免订阅悄悄过期"""
+        try:
+            self.subscribe(hub, topic, callback_url, lease_seconds)
+        except Exception as e:
+            delay = min(self.renew_retry_seconds * 2 ** attempt, self.renew_retry_max_seconds)
+            log(logger, logging.WARNING, "⚠️  WebSub续订失败，稍后重试", hub=hub, topic=topic,
+                error=str(e), attempt=attempt + 1, retry_in=delay)
+            self.schedule_renewal(delay, hub, topic, callback_url, lease_seconds, attempt + 1)
+
+    def make_handler(self):
+        """生成绑定到本接收器的请求处理类"""
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, code, body=b''):
+                self.send_response(code)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                """WebSub 订阅验证：回显 hub.challenge"""
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path != receiver.path or params.get('hub.mode') not in ('subscribe', 'unsubscribe'):
+                    return self.reply(404)
+                # 只确认本接收器发起的订阅，其他人不能借回调地址伪造订阅
+                if params.get('hub.topic') not in receiver.topics:
+                    return self.reply(404)
+                self.reply(200, params.get('hub.challenge', '').encode())
+
+            def do_POST(self):
+                """接收推送的订阅源内容"""
+                if urlparse(self.path).path != receiver.path:
+                    return self.reply(404)
+                length = int(self.headers.get('Content-Length') or 0)
+                if length <= 0 or length > receiver.max_body_bytes:
+                    return self.reply(413)
+                body = self.rfile.read(length)
+                if receiver.secret:
+                    header = self.headers.get('X-Hub-Signature-256') or self.headers.get('X-Hub-Signature')
+                    if not verify_signature(receiver.secret, body, header):
+                        # 按 WebSub 规范，签名不符也返回2xx，但丢弃内容
+                        return self.reply(202)
+                topic = link_topic(self.headers.get('Link'))
+                self.reply(202 if receiver.submit(body, topic) else 503)
+
+        return Handler
+
+    def start(self):
+        """在后台线程启动HTTP服务和工作线程；没有设置 secret 时任何人都能伪造推送，只监听本机地址"""
+        if not self.secret and self.host not in LOOPBACK_HOSTS:
+            log(logger, logging.WARNING, "⚠️  未设置PUSH_SECRET，推送接收服务只监听本机地址", host=self.host)
+            self.host = '127.0.0.1'
+        for i in range(self.workers):
+            threading.Thread(target=self.worker, name=f'push-worker-{i}', daemon=True).start()
+        self.server = ThreadingHTTPServer((self.host, self.port), self.make_handler())
+        threading.Thread(target=self.server.serve_forever, name='push-receiver', daemon=True).start()
+        print(f"📥 推送接收服务已启动: http://{self.host}:{self.server.server_port}{self.path}")
+
+    def stop(self):
+        """停止HTTP服务和续订定时器"""
+        with self.timers_lock:
+            timers, self.timers = list(self.timers.values()), {}
+        for timer in timers:
+            timer.cancel()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
@@ -5,61 +5,62 @@
 """
 
 import time
-from slack_sdk import WebClient
+import logging
+from workspaces import get_slack_client
 from slack_sdk.errors import SlackApiError
 from config import Config
+from log_utils import get_logger, log, ProgressReporter
+from channel_history import ChannelHistory
+from sent_ledger import record_deleted
+
+logger = get_logger('quick_delete_all')
 
 def delete_all_messages_in_channel(channel_id, channel_name):
     """删除频道中的所有消息"""
-    client = WebClient(token=Config.SLACK_BOT_TOKEN)
+    client = get_slack_client(Config.SLACK_BOT_TOKEN)
     
-    print(f"🗑️  开始删除 {channel_name} 中的所有消息...")
+    log(logger, logging.INFO, "🗑️  开始删除频道中的所有消息", channel=channel_id, name=channel_name)
     
     try:
-        # 获取频道历史消息
-        response = client.conversations_history(channel=channel_id, limit=1000)
-        messages = response['messages']
+        # 增量同步频道历史，从本地镜像读取未删除的消息
+        history = ChannelHistory(client)
+        history.sync(channel_id)
+        messages = history.messages(channel_id)
         
         if not messages:
-            print(f"📭 {channel_name} 中没有消息")
+            log(logger, logging.INFO, "📭 频道中没有消息", channel=channel_id)
             return
         
-        print(f"📝 找到 {len(messages)} 条消息")
-        
-        deleted_count = 0
-        failed_count = 0
+        progress = ProgressReporter(logger, f"🗑️  删除 {channel_name} 消息", len(messages))
         
-        for i, message in enumerate(messages, 1):
+        for message in messages:
             ts = message['ts']
-            user = message.get('user', 'unknown')
-            text = message.get('text', '')[:30] + '...' if len(message.get('text', '')) > 30 else message.get('text', '')
-            
-            print(f"   [{i}/{len(messages)}] 删除: {text}")
+            user = message.get('user') or 'unknown'
             
             try:
                 client.chat_delete(channel=channel_id, ts=ts)
-                deleted_count += 1
+                progress.item(True, ts=ts, user=user)
+                history.mark_deleted(channel_id, ts)
+                record_deleted(None, channel_id, ts)
             except SlackApiError as e:
                 if e.response['error'] == 'message_not_found':
-                    print(f"     ⚠️  消息已不存在")
-                    deleted_count += 1
-                elif e.response['error'] == 'cant_delete_message':
-                    print(f"     ❌ 无法删除: 权限不足或消息太旧")
-                    failed_count += 1
+                    progress.item(True, ts=ts, user=user, note='message_not_found')
+                    history.mark_deleted(channel_id, ts)
+                    record_deleted(None, channel_id, ts)
                 else:
-                    print(f"     ❌ 删除失败: {e.response['error']}")
-                    failed_count += 1
+                    progress.item(False, error=e.response['error'], ts=ts, user=user)
             
             # 添加延迟避免API限制
             time.sleep(0.1)
         
-        print(f"✅ {channel_name} 删除完成: 成功 {deleted_count} 条，失败 {failed_count} 条")
+        progress.finish()
         
     except SlackApiError as e:
-        print(f"❌ 获取 {channel_name} 历史消息失败: {e.response['error']}")
+        log(logger, logging.ERROR, "❌ 获取历史消息失败", channel=channel_id, error=e.response['error'])
 
 def main():
     """主函数"""
+    Config.load()
     print("🗑️  快速删除Slack频道所有消息")
     print("=" * 50)
     
@@ -79,13 +80,11 @@ def main():
     
     # 删除频道A的消息
     delete_all_messages_in_channel(Config.SLACK_CHANNEL_A, "频道A")
-    print()
     
     # 删除频道B的消息
     delete_all_messages_in_channel(Config.SLACK_CHANNEL_B, "频道B")
-    print()
     
-    print("🎉 所有频道消息删除完成！")
+    log(logger, logging.INFO, "🎉 所有频道消息删除完成！")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+令牌桶限流
+每个 Slack 工作区（或其他发送目标）各自一个限流器，线程安全
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """令牌桶：平均每秒 rate 次，最多突发 burst 次"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """取一个令牌，不够时等待"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """不等待地尝试取一个令牌"""
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+渲染缓存
+按 (内容哈希, 模板, 模板版本) 缓存格式化后的消息和 Block Kit 内容，摘要没有变化的条目跳过正则提取和渲染。
+内存中为 LRU，配置目录后被淘汰的条目和退出时的全部条目写入磁盘，重新运行时也能命中
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(*parts):
+    """对参与渲染的字段计算哈希"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+class RenderCache:
+    """内存 LRU，可选磁盘溢出"""
+
+    def __init__(self, capacity=256, spill_dir=None, spill_max_age=7 * 86400):
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self.spill_max_age = spill_max_age
+        self.entries = OrderedDict()  # 键 -> (值, 字节数)
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            atexit.register(self.flush)
+
+    def key(self, template, version, digest):
+        return f"{template}:{version}:{digest}"
+
+    def spill_path(self, key):
+        return os.path.join(self.spill_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key):
+        """查找缓存，找不到返回 None"""
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return item[0]
+        if self.spill_dir:
+            try:
+                with open(self.spill_path(key), 'r', encoding='utf-8') as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                self.put(key, value)
+                return value
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        size = len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+        evicted = []
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while len(self.entries) > self.capacity:
+                old_key, (old_value, old_size) = self.entries.popitem(last=False)
+                self.bytes -= old_size
+                evicted.append((old_key, old_value))
+        for old_key, old_value in evicted:
+            self.spill(old_key, old_value)
+
+    def get_or_render(self, template, version, digest, render):
+        """命中时直接返回，未命中时调用 render 并写入缓存"""
+        key = self.key(template, version, digest)
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.put(key, value)
+        return value
+
+    def spill(self, key, value):
+        if not self.spill_dir:
+            return
+        path = self.spill_path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        """把内存中的条目写入磁盘，并清理过旧的磁盘条目"""
+        if not self.spill_dir:
+            return
+        with self.lock:
+            items = [(key, value) for key, (value, _) in self.entries.items()]
+        for key, value in items:
+            self.spill(key, value)
+        cutoff = time.time() - self.spill_max_age
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        """命中率和大小"""
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 3) if lookups else None,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+            }
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+渲染进程池
+正则提取和消息渲染是纯 CPU 计算，在线程中执行会被 GIL 限制在一个核上。开启后（RENDER_WORKERS 大于1）
+把这部分工作分批交给多个工作进程：只发送摘要等紧凑的字符串，结果按输入顺序返回；
+需要计算的条目少于 RENDER_POOL_MIN_BATCH 时直接在当前进程执行，避免进程间通信的开销。
+提交给工作进程的 run_chunk 和渲染函数都在 formatting 中，工作进程不导入本模块，也就不加载配置和日志线程
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+from formatting import run_chunk
+from log_utils import get_logger, log
+
+logger = get_logger('render_pool')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class RenderPool:
+    """按需创建的进程池；workers 不大于1时始终在当前进程执行"""
+
+    def __init__(self, workers=0, min_batch=32, chunk_size=8):
+        self.workers = workers if workers > 0 else 0
+        self.min_batch = max(min_batch, 1)
+        self.chunk_size = max(chunk_size, 1)
+        self.executor = None
+        self.lock = threading.Lock()
+        self.remote = 0
+        self.inline = 0
+
+    @property
+    def enabled(self):
+        return self.workers > 1
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                # 用 spawn 启动工作进程，不继承抓取线程持有的锁和 Slack 连接
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                log(logger, logging.INFO, "🧩 启动渲染进程池", workers=self.workers)
+            return self.executor
+
+    def reset(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def map(self, func, payloads):
+        """按顺序返回 [func(payload)]；func 必须是模块级函数，payload 和结果都要能 pickle"""
+        return [result for _, result in self.imap(func, payloads)]
+
+    def imap(self, func, items, payload=None):
+        """逐个产出 (item, func(payload(item)))，顺序与输入一致。
+        payload(item) 返回 None 表示该条目不需要计算（如缓存命中），对应结果为 None。
+        先读入 min_batch 个需要计算的条目，输入在此之前结束时在当前进程执行；否则分批提交到进程池，
+        进行中的批次不超过 workers * 2 个，边读入边产出"""
+        payload = payload or (lambda item: item)
+        items = iter(items)
+        if not self.enabled:
+            for item in items:
+                yield item, self.run_inline(func, payload(item))
+            return
+
+        buffered = []
+        needed = 0
+        for item in items:
+            data = payload(item)
+            buffered.append((item, data))
+            if data is not None:
+                needed += 1
+                if needed >= self.min_batch:
+                    break
+        if needed < self.min_batch:
+            for item, data in buffered:
+                yield item, self.run_inline(func, data)
+            return
+
+        # 每个批次为 ([(item, payload)], [需要发送的 payload], future)，payload 为 None 的条目不发送
+        window = deque()
+        chunk, data = [], []
+        pending = ((item, payload(item)) for item in items)
+        for source in (buffered, pending):
+            for item, value in source:
+                chunk.append((item, value))
+                if value is not None:
+                    data.append(value)
+                if len(data) < self.chunk_size:
+                    continue
+                window.append((chunk, data, self.get_executor().submit(run_chunk, func, data)))
+                chunk, data = [], []
+                while len(window) > self.workers * 2:
+                    yield from self.collect(func, *window.popleft())
+        if chunk:
+            window.append((chunk, data, self.get_executor().submit(run_chunk, func, data) if data else None))
+        while window:
+            yield from self.collect(func, *window.popleft())
+
+    def collect(self, func, chunk, data, future):
+        """等待一个批次完成，按顺序产出其中的条目；进程池损坏时重建，并在当前进程补算这一批"""
+        results = []
+        if future is not None:
+            try:
+                results = future.result()
+                self.remote += len(results)
+            except BrokenProcessPool as e:
+                log(logger, logging.WARNING, "⚠️  渲染进程池异常，本批改为在当前进程执行", error=str(e), items=len(data))
+                self.reset()
+                results = [self.run_inline(func, payload) for payload in data]
+        results = iter(results)
+        for item, payload in chunk:
+            yield item, None if payload is None else next(results)
+
+    def run_inline(self, func, payload):
+        if payload is None:
+            return None
+        self.inline += 1
+        return func(payload)
+
+    def stats(self):
+        return {'workers': self.workers, 'remote': self.remote, 'inline': self.inline}
+
+
+def get_render_pool():
+    """进程内共享的渲染进程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = Config.RENDER_WORKERS if Config.RENDER_WORKERS >= 0 else os.cpu_count() or 1
+            _pool = RenderPool(workers, Config.RENDER_POOL_MIN_BATCH, Config.RENDER_POOL_CHUNK_SIZE)
+        return _pool
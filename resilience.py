@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+周期时限与熔断
+每轮抓取/删除在一个总时限内执行，超时未完成的工作推迟到下一轮；每个订阅源主机和每个 Slack 工作区各有一个熔断器，
+连续失败达到阈值后熔断（open），冷却期内的请求立即失败，冷却结束后放行一个试探请求（half-open），成功后恢复（closed）
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from config import Config
+
+
+class DeadlineExceeded(TimeoutError):
+    """本轮时限已用完，剩余工作推迟到下一轮"""
+
+
+class CircuitOpen(RuntimeError):
+    """依赖已熔断，请求不发出直接失败"""
+
+
+class Deadline:
+    """从创建时刻起 seconds 秒后到期"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        """已到期时抛出 DeadlineExceeded"""
+        if self.expired():
+            raise DeadlineExceeded(f"超过本轮时限 {self.seconds} 秒")
+
+    def timeout(self, cap):
+        """单个请求可用的超时：不超过 cap，也不超过剩余时间"""
+        self.check()
+        return min(cap, self.remaining())
+
+
+_deadline = contextvars.ContextVar('cycle_deadline', default=None)
+
+
+def current_deadline():
+    """当前周期的时限，不在周期内时返回 None"""
+    return _deadline.get()
+
+
+def check_deadline():
+    """当前周期已到期时抛出 DeadlineExceeded"""
+    deadline = _deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+@contextmanager
+def cycle_deadline(seconds=None):
+    """在时限内执行一轮任务，seconds 为 0 时不限时"""
+    seconds = Config.CYCLE_DEADLINE_SECONDS if seconds is None else seconds
+    token = _deadline.set(Deadline(seconds) if seconds > 0 else None)
+    try:
+        yield _deadline.get()
+    finally:
+        _deadline.reset(token)
+
+
+class CircuitBreaker:
+    """三态熔断器，线程安全"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name, failure_threshold=3, reset_seconds=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial = False  # 半开状态下是否已有试探请求在进行
+        self.lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            print(f"🔌 熔断器 {self.name}: {self.state} -> {state}")
+            self.state = state
+
+    def allow(self):
+        """请求前调用：熔断中抛出 CircuitOpen，冷却结束后只放行一个试探请求"""
+        with self.lock:
+            if self.state == self.OPEN:
+                wait = self.opened_at + self.reset_seconds - time.monotonic()
+                if wait > 0:
+                    raise CircuitOpen(f"{self.name} 已熔断，{wait:.0f} 秒后重试")
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self.trial:
+                    raise CircuitOpen(f"{self.name} 正在试探恢复")
+                self.trial = True
+
+    def record(self, ok):
+        """请求结束后调用：ok 为 None 表示结果与依赖健康无关（例如被取消）"""
+        with self.lock:
+            self.trial = False
+            if ok is None:
+                return
+            if ok:
+                self.failures = 0
+                self._set_state(self.CLOSED)
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def call(self, func, is_failure=lambda e: True):
+        """经过熔断器执行 func；is_failure 判断异常是否说明依赖故障，返回 None 时不计入"""
+        self.allow()
+        try:
+            result = func()
+        except BaseException as e:
+            failure = is_failure(e) if isinstance(e, Exception) else None
+            self.record(None if failure is None else not failure)
+            raise
+        self.record(True)
+        return result
+
+    def snapshot(self):
+        with self.lock:
+            return {'state': self.state, 'failures': self.failures}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """按名称返回进程内共用的熔断器"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, Config.BREAKER_FAILURES, Config.BREAKER_RESET_SECONDS)
+            _breakers[name] = breaker
+        return breaker
+
+
+def host_breaker(url):
+    """订阅源按主机共用熔断器"""
+    return get_breaker('feed:' + (urlsplit(url).netloc or url))
+
+
+def breaker_states():
+    """所有熔断器的当前状态"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot()['state'] for breaker in breakers}
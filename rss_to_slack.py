@@ -4,356 +4,1045 @@ RSS抓取并推送到Slack
 专门用于抓取SoSoValue中文频道的RSS内容
 """
 
-import feedparser
 import schedule
 import time
 import json
 import os
-import requests
 import re
+import hashlib
+import argparse
+import logging
+import threading
+from concurrent.futures import wait
 from datetime import datetime
-from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from config import Config
+from profiler import CycleProfiler, profile_stage
+from log_utils import get_logger, log, ProgressReporter
+from telegram_source import TelegramChannelSource
+from push_receiver import PushReceiver, discover_hub, entry_key
+from mirror_fetch import MirrorPool, accept_encoding
+from state_store import get_state_store
+from workspaces import DEFAULT_FEED
+from coordination import Coordinator
+from formatting import expire_notice, extract_numbered_content, format_channel_a, format_channel_b, join_numbered_items
+from aggregator import DigestAggregator, parse_item, rank_items
+from render_cache import RenderCache, content_hash
+from render_pool import get_render_pool
+from near_dup import DestinationIndex
+from hot_reload import RuntimeSettings, ConfigWatcher
+from async_daemon import AsyncDaemon
+from sinks import SinkDispatcher
+from delivery_log import record_event
+from sent_ledger import record_deleted, record_sent
+from pipeline import Item, Pipeline, insert_stages
+from resilience import CircuitOpen, DeadlineExceeded, breaker_states, current_deadline, cycle_deadline
+
+logger = get_logger('rss_to_slack')
+
+# 汇总消息连续发送失败这么多次后放弃该窗口
+MAX_DIGEST_ATTEMPTS = 5
+
+# 模板版本：修改对应的格式化逻辑后加一，使渲染缓存中的旧结果失效
+TEMPLATE_VERSIONS = {'channel_a': 1, 'channel_b': 1, 'blocks': 1}
 
 class RSSSlackBot:
     def __init__(self):
-        # RSS配置
-        self.rss_url = "https://rsshub.app/telegram/channel/SoSoValue_CN"
+        # RSS配置：同一路径可由多个 rsshub 镜像提供，按健康度对冲抓取
+        self.state_store = get_state_store()
+        self.mirror_pool = MirrorPool(Config.RSS_MIRRORS, store=self.state_store, max_bytes=Config.FEED_MAX_BYTES)
         
-        # Slack配置
-        self.slack_client = WebClient(token=Config.SLACK_BOT_TOKEN)
-        self.channel_a = Config.SLACK_CHANNEL_A  # 画板频道
-        self.channel_b = Config.SLACK_CHANNEL_B  # 消息频道
+        # 可热加载的设置快照：订阅源、工作区路由（决定推送到哪些工作区的哪些频道）、关键词和定时时间
+        self.settings = RuntimeSettings.load()
+        self.scheduled_time = None
         
         # 记录已推送的消息
-        self.pushed_links_file = "pushed_links.json"
         self.pushed_links = self.load_pushed_links()
         
-        # 关键词过滤
-        self.filter_keywords = Config.CONTENT_FILTER_KEYWORDS
+        # 条目ID -> 频道 -> 已发送消息(ts, 内容哈希)，内容变化时原地更新消息
+        self.message_index = self.load_message_index()
+        
+        # 渲染缓存：摘要未变化的条目直接复用格式化结果和 Block Kit 内容
+        self.render_cache = RenderCache(Config.RENDER_CACHE_SIZE, Config.RENDER_CACHE_DIR)
+        
+        # 渲染进程池：回填或订阅源很多时，正则提取和渲染分批交给多个工作进程，未启用时在当前线程执行
+        self.render_pool = get_render_pool()
+        
+        # 窗口聚合：设置窗口时长后，同一窗口内的条目合并成一条汇总消息
+        self.aggregator = None
+        if Config.AGGREGATE_WINDOW_SECONDS > 0:
+            self.aggregator = DigestAggregator(Config.AGGREGATE_WINDOW_SECONDS, Config.AGGREGATE_GROUP_BY,
+                                               Config.AGGREGATE_MAX_ITEMS)
+        
+        # 近似重复检测：多个新闻频道措辞略有不同的同一条新闻，在每个推送目标中只推送一次
+        self.near_dups = None
+        if Config.NEAR_DUP_WINDOW_SECONDS > 0:
+            self.near_dups = DestinationIndex(Config.NEAR_DUP_WINDOW_SECONDS, Config.NEAR_DUP_THRESHOLD)
+        
+        # 多副本协调：未配置时单进程独占所有订阅源
+        self.coordinator = None
+        if Config.COORDINATION_DB:
+            self.coordinator = Coordinator(Config.COORDINATION_DB, Config.WORKER_ID, Config.LEASE_SECONDS)
+            if Config.STATE_BACKEND == 'snapshot':
+                print("⚠️  snapshot 状态存储只在内存中读写，多副本运行时请使用 file 或 sqlite")
+        
+        # 推送线程与删除检查共用 pending_deletes 等状态，读写时加锁；多副本时使用跨进程锁
+        self.state_lock = self.coordinator.lock('state') if self.coordinator else threading.Lock()
+        
+        # 超过本轮时限或依赖熔断而未完成的工作，下一轮调度时重试：订阅源名称，以及 (条目键, 频道) -> 待推送内容
+        self.deferred_lock = threading.Lock()
+        self.deferred_feeds = set()
+        self.deferred_deliveries = {}
+        
+        # 异步守护进程模式下由推送任务消费，None 时在抓取线程中直接推送
+        self.delivery_queue = None
+        
+        # 额外投递目标（incoming webhook、通用 webhook、文件等），目标之间并行
+        self.sink_dispatcher = SinkDispatcher()
+    
+    @property
+    def workspaces(self):
+        """当前设置中的工作区注册表"""
+        return self.settings.workspaces
+    
+    @property
+    def filter_keywords(self):
+        return self.settings.filter_keywords
+    
+    @property
+    def channel_a(self):
+        return self.settings.channel_a  # 画板频道
+    
+    @property
+    def channel_b(self):
+        return self.settings.channel_b  # 消息频道
+    
+    @property
+    def rss_path(self):
+        return self.workspaces.feeds.get(DEFAULT_FEED, Config.RSS_FEED_PATH)
+    
+    @property
+    def rss_url(self):
+        return self.mirror_pool.mirrors[0] + self.rss_path
+    
+    def reload_config(self):
+        """重新读取配置并整体替换设置快照，在监视线程中执行，不阻塞调度"""
+        Config.reload()
+        settings = RuntimeSettings.load(self.settings)
+        self.settings = settings
+        print(f"🔁 配置已重新加载: 工作区 {', '.join(settings.workspaces.workspaces)}, "
+              f"关键词 {settings.filter_keywords}, 定时 {settings.schedule_time}")
+    
+    def start_config_watcher(self):
+        """监视配置文件和 SIGHUP"""
+        paths = lambda: [path for path in (Config.ENV_FILE, Config.WORKSPACES_FILE) if path]
+        self.config_watcher = ConfigWatcher(paths, self.reload_config, Config.CONFIG_WATCH_INTERVAL)
+        return self.config_watcher.start()
+    
+    def schedule_fetches(self):
+        """按设置中的时间注册工作日定时抓取，时间变化时重新注册"""
+        schedule_time = self.settings.schedule_time
+        if schedule_time == self.scheduled_time:
+            return
+        schedule.clear('fetch')
+        for day in (schedule.every().monday, schedule.every().tuesday, schedule.every().wednesday,
+                    schedule.every().thursday, schedule.every().friday):
+            day.at(schedule_time).do(self.fetch_and_process).tag('fetch')
+        self.scheduled_time = schedule_time
+        print(f"⏰ 定时抓取: 每周一到周五 {schedule_time}")
+    
+    @property
+    def slack_client(self):
+        """默认工作区的客户端"""
+        return self.workspaces.default.client
+    
+    @slack_client.setter
+    def slack_client(self, client):
+        self.workspaces.default.client = client
         
     def load_pushed_links(self):
-        """加载已推送的链接"""
-        if os.path.exists(self.pushed_links_file):
-            try:
-                with open(self.pushed_links_file, 'r', encoding='utf-8') as f:
-                    return set(json.load(f))
-            except:
-                return set()
-        return set()
+        """加载已推送条目的指纹和处理时间，按时间排序（旧版本保存的列表按当前时间计）"""
+        data = self.state_store.load('pushed_links', {})
+        if isinstance(data, list):
+            now = time.time()
+            data = {key: now for key in data}
+        return dict(sorted(data.items(), key=lambda item: item[1]))
     
     def save_pushed_links(self):
-        """保存已推送的链接"""
-        with open(self.pushed_links_file, 'w', encoding='utf-8') as f:
-            json.dump(list(self.pushed_links), f, ensure_ascii=False, indent=2)
+        """保存已推送条目的指纹，由推送接收服务在去掉过期记录后调用"""
+        self.state_store.save('pushed_links', self.pushed_links)
+    
+    def load_message_index(self):
+        """加载已发送消息索引"""
+        return self.state_store.load('message_index', {})
+    
+    def save_message_index(self):
+        """保存已发送消息索引，超过两个删除周期的记录不再保留"""
+        cutoff = time.time() - 2 * Config.DELETE_AFTER_SECONDS
+        for key in list(self.message_index):
+            channels = {channel: record for channel, record in self.message_index[key].items()
+                        if record['send_time'] >= cutoff}
+            if channels:
+                self.message_index[key] = channels
+            else:
+                del self.message_index[key]
+        self.state_store.save('message_index', self.message_index)
     
     def should_include_message(self, title, content):
         """判断消息是否应该被包含"""
-        if not self.filter_keywords:
-            return True
-        
-        text = (title + " " + content).lower()
-        return any(keyword.lower() in text for keyword in self.filter_keywords if keyword.strip())
+        return self.settings.should_include(title, content)
     
     def extract_numbered_content(self, content):
         """提取按数字排序的内容，去掉前缀日期和正文中的日期"""
-        # 保留换行
-        content = re.sub(r'<br\s*/?>', '\n', content)
-        # 去除所有日期
-        content = re.sub(r'(\d{2,4}[.\-/]\s*\d{1,2}[.\-/]\d{1,2})', '', content)
-        content = re.sub(r'(\d{1,2}[.\-/]\s*\d{1,2}/)\d{1,2}/', '', content)
-        # 匹配 1/ 内容 – <a href="网址" ...>source</a>
-        pattern = r'([1-9][0-9]?)/\s*([^–]+)–\s*<a href="([^"]+)"[^>]*>source</a>'
-        matches = re.findall(pattern, content)
-        formatted_items = []
-        for match in matches:
-            number = match[0]
-            text = match[1].strip()
-            link = match[2]
-            formatted_items.append(f"{number}. {text} <{link}|【详情】>")
-        if formatted_items:
-            return formatted_items
-        # 如果没有，尝试更简单的格式
-        pattern2 = r'([1-9][0-9]?)/\s*([^–\n]+)'
-        matches = re.findall(pattern2, content)
-        for match in matches:
-            number = match[0]
-            text = match[1].strip()
-            formatted_items.append(f"{number}. {text}")
-        return formatted_items
+        with profile_stage('regex: extract_numbered_content'):
+            return self._extract_numbered_content(content)
+
+    def _extract_numbered_content(self, content):
+        return extract_numbered_content(content)
     
     def format_message_for_channel_a(self, entry):
         """格式化消息用于频道A（画板），只输出内容列表，不重复标题"""
-        # 提取主要内容
-        content = entry.summary
-        # 提取按数字排序的内容
-        numbered_items = self.extract_numbered_content(content)
-        if numbered_items:
-            # 在每条内容之间添加换行
-            formatted_msg = f"\n\n".join(numbered_items[:10]).strip()
-        else:
-            # 如果没有找到数字格式，使用原始内容
-            content = re.sub(r'<[^>]+>', '', content)
-            formatted_msg = f"{content[:500]}{'...' if len(content) > 500 else ''}"
-        return formatted_msg
+        return self.render_cache.get_or_render('channel_a', TEMPLATE_VERSIONS['channel_a'], content_hash(entry.summary),
+                                               lambda: self._format_message_for_channel_a(entry))
+    
+    def _format_message_for_channel_a(self, entry):
+        return format_channel_a(entry.summary, self.extract_numbered_content(entry.summary))
+    
+    def format_messages_for_channel_a(self, entries):
+        """批量格式化频道A消息（回填等），按输入顺序返回；只把未命中渲染缓存的摘要交给渲染进程池"""
+        keys = [self.channel_a_key(entry) for entry in entries]
+        contents = [self.render_cache.get(key) for key in keys]
+        misses = [index for index, content in enumerate(contents) if content is None]
+        rendered = self.render_pool.map(format_channel_a, [entries[index].summary for index in misses])
+        for index, content in zip(misses, rendered):
+            self.render_cache.put(keys[index], content)
+            contents[index] = content
+        return contents
+    
+    def channel_a_key(self, entry):
+        return self.render_cache.key('channel_a', TEMPLATE_VERSIONS['channel_a'], content_hash(entry.summary))
+    
+    def join_numbered_items(self, numbered_items):
+        """频道A格式：最多10条编号内容，在每条内容之间添加换行"""
+        return join_numbered_items(numbered_items)
     
     def format_message_for_channel_b(self, entry):
         """格式化消息用于频道B（消息列表）"""
-        # 提取标题（去掉前缀）
-        title = entry.title
-        if "SoSoValue" in title:
-            # 提取日期部分
-            date_match = re.search(r'(\d{4}/\d{1,2}/\d{1,2})', title)
-            if date_match:
-                title = f"每日加密热点新闻榜单｜{date_match.group(1)}"
-        
-        # 提取主要内容
-        content = entry.summary
-        
-        # 提取按数字排序的内容
-        numbered_items = self.extract_numbered_content(content)
-        
-        if numbered_items:
-            # 格式化消息
-            formatted_msg = f"""
-*{title}*
-
-{chr(10).join(numbered_items[:5])}  # 最多显示5条
-
-*完整内容:* {entry.link}
-            """.strip()
-        else:
-            # 如果没有找到数字格式，使用原始内容
-            content = re.sub(r'<[^>]+>', '', content)
-            formatted_msg = f"""
-*{title}*
-
-{content[:300]}{'...' if len(content) > 300 else ''}
-
-*完整内容:* {entry.link}
-            """.strip()
-        
-        return formatted_msg
+        return self.render_cache.get_or_render('channel_b', TEMPLATE_VERSIONS['channel_b'],
+                                               content_hash(entry.title, entry.summary, entry.link),
+                                               lambda: self._format_message_for_channel_b(entry))
     
-    def send_to_slack(self, message, channel, title=None):
-        """发送消息到Slack，主标题只用日期，并记录待删除消息"""
-        try:
-            # 如果title为None，则用 entry.title 提取日期标题
-            if title is None:
-                # 尝试从最近一次消息中提取标题
-                date_today = datetime.now().strftime('%Y/%-m/%-d')
-                title = f"每日加密热点新闻榜单｜{date_today}"
-            # 在消息底部加自动删除提示，添加更多换行
-            message = message.strip() + "\n\n\n本消息 48 小时后自动删除"
-            blocks = [
-                {
-                    "type": "header",
-                    "text": {
-                        "type": "plain_text",
-                        "text": title,
-                        "emoji": True
-                    }
-                },
-                {
-                    "type": "divider"
-                },
-                {
-                    "type": "section",
-                    "text": {
+    def _format_message_for_channel_b(self, entry):
+        return format_channel_b(entry.title, entry.summary, entry.link, self.extract_numbered_content(entry.summary))
+    
+    def build_blocks(self, message, title=None, expire=True):
+        """生成消息的 Block Kit 内容，返回 (标题, blocks)"""
+        # 如果title为None，则用 entry.title 提取日期标题
+        if title is None:
+            # 尝试从最近一次消息中提取标题
+            date_today = datetime.now().strftime('%Y/%-m/%-d')
+            title = f"每日加密热点新闻榜单｜{date_today}"
+        blocks = self.render_cache.get_or_render('blocks', TEMPLATE_VERSIONS['blocks'], content_hash(message, title, expire and Config.DELETE_AFTER_SECONDS),
+                                                 lambda: self._build_blocks(message, title, expire))
+        # 更新时间每次都不同，不放进缓存
+        return title, blocks + [
+            {
+                "type": "context",
+                "elements": [
+                    {
                         "type": "mrkdwn",
-                        "text": message
+                        "text": f"更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
                     }
-                },
-                {
-                    "type": "context",
-                    "elements": [
-                        {
-                            "type": "mrkdwn",
-                            "text": f"更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                        }
-                    ]
+                ]
+            }
+        ]
+    
+    def _build_blocks(self, message, title, expire):
+        # 在消息底部加自动删除提示，添加更多换行
+        message = message.strip()
+        if expire:
+            message += f"\n\n\n本消息 {expire_notice(Config.DELETE_AFTER_SECONDS)}后自动删除"
+        blocks = [
+            {
+                "type": "header",
+                "text": {
+                    "type": "plain_text",
+                    "text": title,
+                    "emoji": True
+                }
+            },
+            {
+                "type": "divider"
+            },
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": message
                 }
-            ]
-            response = self.slack_client.chat_postMessage(
-                channel=channel,
-                blocks=blocks,
-                text=title
-            )
+            }
+        ]
+        return blocks
+    
+    def send_to_slack(self, message, channel, title=None, workspace=None, expire=True, thread_ts=None, feed=None):
+        """发送消息到Slack，主标题只用日期，并记录待删除消息（expire=False 时永久保留）和消息台账，成功时返回消息ts；
+        工作区熔断或本轮时限已到时抛出 CircuitOpen / DeadlineExceeded，由调用方推迟到下一轮"""
+        workspace = workspace or self.workspaces.default
+        try:
+            title, blocks = self.build_blocks(message, title, expire)
+            with profile_stage('slack: chat_postMessage'):
+                response = workspace.call(
+                    'chat_postMessage',
+                    channel=channel,
+                    blocks=blocks,
+                    text=title,
+                    thread_ts=thread_ts
+                )
             # 记录待删除消息
             ts = response['ts']
-            self.save_pending_delete(channel, ts)
+            if expire:
+                self.save_pending_delete(channel, ts, workspace.name)
+            record_sent(workspace.name, channel, ts, feed, time.time() + Config.DELETE_AFTER_SECONDS if expire else None)
+            record_event('post', workspace.name, channel, ts, expire=expire)
             print(f"✅ 成功发送到Slack频道: {channel}")
-            return True
+            return ts
         except SlackApiError as e:
+            record_event('post_failed', workspace.name, channel, expire=expire, error=e.response['error'])
             print(f"❌ 发送到Slack失败: {e.response['error']}")
             return False
     
-    def fetch_rss_with_headers(self):
+    def update_slack_message(self, message, channel, ts, title=None, workspace=None, expire=True):
+        """原地更新已发送的消息，删除计划保持不变"""
+        workspace = workspace or self.workspaces.default
+        try:
+            title, blocks = self.build_blocks(message, title, expire)
+            with profile_stage('slack: chat_update'):
+                workspace.call('chat_update', channel=channel, ts=ts, blocks=blocks, text=title)
+            print(f"✏️  已更新Slack消息: {channel} {ts}")
+            return True
+        except SlackApiError as e:
+            print(f"❌ 更新Slack消息失败: {e.response['error']}")
+            return False
+    
+    def content_hash(self, message):
+        """消息内容哈希，用于判断条目是否有变化"""
+        return hashlib.sha256(message.encode('utf-8')).hexdigest()[:16]
+    
+    def is_delivered(self, key, channel, content_hash):
+        """相同内容是否已发送到该频道"""
+        with self.state_lock:
+            self.message_index = self.load_message_index()
+            record = self.message_index.get(key, {}).get(channel)
+        return bool(record) and record['hash'] == content_hash
+    
+    def deliver(self, entry, message, channel, workspace=None, title=None, expire=True, feed=None):
+        """推送一条内容：新条目发送新消息，已发送条目内容有变化时原地更新，未变化时跳过"""
+        key = entry_key(entry)
+        content_hash = self.content_hash(message)
+        with self.state_lock:
+            # 其他副本可能写过索引（例如故障接管后），每次从存储重新加载
+            self.message_index = self.load_message_index()
+            record = self.message_index.get(key, {}).get(channel)
+        
+        if record and record['hash'] == content_hash:
+            print(f"⏭️  内容未变化，跳过: {key}")
+            return record['ts']
+        
+        if record:
+            if not self.update_slack_message(message, channel, record['ts'], title, workspace, expire):
+                return False
+            ts = record['ts']
+            send_time = record['send_time']
+        else:
+            ts = self.send_to_slack(message, channel, title, workspace, expire, feed=feed)
+            if not ts:
+                return False
+            send_time = time.time()
+        
+        with self.state_lock:
+            self.message_index = self.load_message_index()
+            self.message_index.setdefault(key, {})[channel] = {'ts': ts, 'hash': content_hash, 'send_time': send_time}
+            self.save_message_index()
+        return ts
+    
+    def fetch_rss_with_headers(self, path=None):
         """使用请求头抓取RSS"""
+        path = path or self.rss_path
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'application/rss+xml, application/xml, text/xml, */*',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': accept_encoding(),
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         }
         
-        try:
-            # 先尝试用requests获取
-            response = requests.get(self.rss_url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            # 然后用feedparser解析
-            feed = feedparser.parse(response.content)
-            return feed
-            
-        except requests.exceptions.RequestException as e:
-            print(f"❌ 网络请求失败: {e}")
-            # 如果requests失败，尝试直接用feedparser
+        # 对冲请求各个镜像，下载后用feedparser解析；每个请求都有超时和字节上限，全部失败时由调用方推迟到下一轮
+        with profile_stage('fetch: hedged mirrors'):
+            feed, mirror = self.mirror_pool.fetch(path, headers)
+        if feed is None:
+            print(f"❌ 所有镜像均抓取失败: {path}")
+        return feed
+    
+    def fetch_and_process(self, feed_names=None):
+        """抓取RSS并处理，只推送当天内容，两个频道内容一致，均用频道A格式；整轮在 CYCLE_DEADLINE_SECONDS 内完成，
+        超时或熔断而未处理完的订阅源推迟到下一轮"""
+        feeds = self.workspaces.feeds
+        names = list(feeds) if feed_names is None else [name for name in feed_names if name in feeds]
+        with cycle_deadline():
+            # 每个订阅源每轮只抓取解析一次，再分发到所有订阅了它的工作区；
+            # 各阶段并行，前一个订阅源的条目在渲染推送时，后面的订阅源继续抓取
             try:
-                feed = feedparser.parse(self.rss_url)
-                return feed
-            except Exception as e2:
-                print(f"❌ feedparser也失败: {e2}")
-                return None
+                self.build_pipeline(name='feeds').run(names)
+            except Exception as e:
+                logger.exception("❌ 处理消息失败", extra={'fields': {'error': type(e).__name__}})
+        log(logger, logging.INFO, "🧮 渲染缓存", **self.render_cache.stats())
+        if self.render_pool.enabled:
+            log(logger, logging.INFO, "🧩 渲染进程池", **self.render_pool.stats())
+        log(logger, logging.INFO, "🔌 熔断器状态", **breaker_states())
+    
+    def build_pipeline(self, first='fetch', name='feeds'):
+        """从 first 阶段开始的处理流水线：抓取 → 解析 → 过滤 → 去重 →（近似重复检测）→ 渲染 → 推送，
+        按当前设置插入各订阅源的自定义阶段"""
+        stages = [('fetch', self.fetch_stage), ('parse', self.parse_stage), ('filter', self.filter_stage),
+                  ('dedup', self.dedup_stage), ('render', self.render_stage), ('deliver', self.deliver_stage)]
+        if self.near_dups is not None:
+            stages.insert(4, ('near_dup', self.near_dup_stage))
+        names = [stage_name for stage_name, _ in stages]
+        return Pipeline(insert_stages(stages[names.index(first):], self.settings.feed_stages), name=name)
+    
+    def defer_feeds(self, feed_names, reason):
+        """记录推迟到下一轮的订阅源"""
+        with self.deferred_lock:
+            self.deferred_feeds.update(feed_names)
+        log(logger, logging.WARNING, "⏸️  订阅源推迟到下一轮", feeds=list(feed_names), reason=reason)
+    
+    def defer_delivery(self, entry, content, channel, workspace, reason, feed=None):
+        """记录推迟到下一轮的推送，同一条目和频道只保留最新内容"""
+        with self.deferred_lock:
+            self.deferred_deliveries[(entry_key(entry), channel)] = (entry, content, channel, workspace.name, feed)
+        log(logger, logging.WARNING, "⏸️  推送推迟到下一轮", key=entry_key(entry), channel=channel, reason=reason)
+    
+    def retry_deferred(self):
+        """重试上一轮推迟的订阅源和推送，仍然失败的继续推迟"""
+        with self.deferred_lock:
+            feed_names, self.deferred_feeds = self.deferred_feeds, set()
+            deliveries, self.deferred_deliveries = self.deferred_deliveries, {}
+        if deliveries:
+            print(f"🔁 重试 {len(deliveries)} 条推迟的推送")
+            with cycle_deadline():
+                for entry, content, channel, workspace_name, feed in deliveries.values():
+                    self.submit_delivery(entry, content, channel, self.workspaces.get(workspace_name), feed)
+        if feed_names:
+            print(f"🔁 重试推迟的订阅源: {', '.join(sorted(feed_names))}")
+            self.fetch_and_process(feed_names)
+    
+    def submit_delivery(self, entry, content, channel, workspace, feed=None):
+        """交出一条待推送内容：有推送队列时放入队列，否则直接推送"""
+        if self.delivery_queue is not None:
+            self.delivery_queue.put(entry, content, channel, workspace, feed)
+            return None
+        return self.deliver_or_defer(entry, content, channel, workspace, feed)
+    
+    def current_workspace(self, workspace):
+        """队列和聚合窗口中的工作区可能是重新加载前的对象，按名称换成当前配置中的工作区（已删除时沿用原对象）"""
+        return self.workspaces.workspaces.get(workspace.name, workspace)
+    
+    def deliver_or_defer(self, entry, content, channel, workspace, feed=None):
+        """推送一条内容，工作区熔断、网络错误或本轮时限已到时推迟到下一轮；推迟时返回 None，推送失败时返回 False"""
+        workspace = self.current_workspace(workspace)
+        try:
+            result = self.deliver(entry, content, channel, workspace, feed=feed)
+        except (CircuitOpen, DeadlineExceeded, OSError) as e:
+            # 推迟的推送之后还会重试，近似重复索引中的内容保留
+            self.defer_delivery(entry, content, channel, workspace, f"{type(e).__name__}: {e}", feed)
+            return None
+        if not result:
+            self.forget_near_dups(entry_key(entry), (workspace.name, channel))
+        return result
+    
+    def forget_near_dups(self, key, destination):
+        """条目没能推送到该目标时，从近似重复索引中去掉它在这个目标加入的内容，其他条目中的相似新闻之后仍会推送过去；
+        之前已推送过的条目（只是更新失败）保留"""
+        if self.near_dups is None:
+            return
+        with self.state_lock:
+            self.message_index = self.load_message_index()
+            target = destination[1] if destination[0] != 'sink' else f"sink:{destination[1]}"
+            delivered = target in self.message_index.get(key, {})
+        if not delivered:
+            self.near_dups.discard(destination, key)
     
-    def fetch_and_process(self):
-        """抓取RSS并处理，只推送当天内容，两个频道内容一致，均用频道A格式"""
-        print(f"🔄 开始抓取RSS: {self.rss_url}")
+    def owns_feed(self, feed_name):
+        """多副本时只处理按一致性哈希分给本副本、并且持有租约的订阅源"""
+        if not self.coordinator:
+            return True
+        try:
+            if self.coordinator.should_handle(feed_name):
+                return True
+        except Exception as e:
+            print(f"❌ 协调数据库访问失败: {e}")
+            return False
+        print(f"⏭️  订阅源 {feed_name} 由其他副本负责: {self.coordinator.owner_of(feed_name)}")
+        return False
+    
+    def fetch_feed(self, feed_name, path):
+        """抓取一个订阅源，返回解析结果；失败或没有条目时返回 None"""
+        print(f"🔄 开始抓取RSS: {feed_name} {path}")
         
         try:
-            feed = self.fetch_rss_with_headers()
-            
-            if not feed or not feed.entries:
-                print("📭 没有获取到新消息")
-                if feed and hasattr(feed, 'status'):
-                    print(f"RSS状态码: {feed.status}")
-                return
-            
-            print(f"📝 获取到 {len(feed.entries)} 条消息")
-            
-            # 获取今天日期字符串
-            today = datetime.now().strftime('%Y/%-m/%-d')  # 2025/6/25
-            today_alt = datetime.now().strftime('%Y/%#m/%#d')  # 兼容Windows
-            today_title = f"每日加密热点新闻榜单｜{today}"
-            today_title_alt = f"每日加密热点新闻榜单｜{today_alt}"
-            
-            new_messages = []
-            
+            feed = self.fetch_rss_with_headers(path)
+        except (CircuitOpen, DeadlineExceeded) as e:
+            self.defer_feeds([feed_name], f"{type(e).__name__}: {e}")
+            return None
+        except Exception as e:
+            logger.exception("❌ 抓取RSS失败", extra={'fields': {'feed': feed_name, 'error': type(e).__name__}})
+            return None
+        
+        if feed is None:
+            # 所有镜像都失败：下一轮重试，主机持续故障时由熔断器拦截
+            self.defer_feeds([feed_name], "所有镜像均抓取失败")
+            return None
+        if not feed.entries:
+            print("📭 没有获取到新消息")
+            if hasattr(feed, 'status'):
+                print(f"RSS状态码: {feed.status}")
+            return None
+        
+        print(f"📝 获取到 {len(feed.entries)} 条消息")
+        return feed
+    
+    def process_entries(self, entries, feed_name=DEFAULT_FEED, undelivered=None):
+        """过滤、格式化并推送条目，Telegram 直连和推送接收使用，从流水线的过滤阶段开始；处理失败时返回 False。
+        undelivered 为列表时，推送失败（不包括推迟到下一轮）的条目加入其中"""
+        if not self.owns_feed(feed_name):
+            return True
+        items = [Item(feed_name, entry) for entry in entries]
+        try:
+            self.build_pipeline('filter', name='entries').run(items)
+        except Exception as e:
+            logger.exception("❌ 处理消息失败", extra={'fields': {'feed': feed_name, 'error': type(e).__name__}})
+            return False
+        if undelivered is not None:
+            undelivered.extend(item.entry for item in items if item.meta.get('undelivered'))
+        return True
+    
+    def fetch_stage(self, feed_names):
+        """抓取阶段：逐个抓取本副本负责的订阅源，产出 (订阅源, 解析结果)；超过本轮时限的订阅源推迟到下一轮"""
+        deadline = current_deadline()
+        feeds = self.workspaces.feeds
+        expired = []
+        for feed_name in feed_names:
+            if deadline is not None and deadline.expired():
+                expired.append(feed_name)
+                continue
+            if not self.owns_feed(feed_name):
+                continue
+            feed = self.fetch_feed(feed_name, feeds[feed_name])
+            if feed is not None:
+                yield feed_name, feed
+        if expired:
+            self.defer_feeds(expired, "超过本轮时限")
+    
+    def parse_stage(self, feeds):
+        """解析阶段：把订阅源拆成逐条的 Item 交给下游"""
+        for feed_name, feed in feeds:
             for entry in feed.entries:
-                # 只推送当天内容
-                if today_title not in entry.title and today_title_alt not in entry.title:
+                yield Item(feed_name, entry)
+    
+    def filter_stage(self, items):
+        """过滤阶段：只保留有推送目标的订阅源中当天且符合关键词的条目"""
+        # 获取今天日期字符串
+        today = datetime.now().strftime('%Y/%-m/%-d')  # 2025/6/25
+        today_alt = datetime.now().strftime('%Y/%#m/%#d')  # 兼容Windows
+        today_titles = (f"每日加密热点新闻榜单｜{today}", f"每日加密热点新闻榜单｜{today_alt}")
+        unrouted = set()
+        for item in items:
+            if not self.workspaces.routes_for(item.feed) and not self.settings.sinks_for(item.feed):
+                if item.feed not in unrouted:
+                    print(f"⚠️  订阅源 {item.feed} 没有配置推送频道")
+                    unrouted.add(item.feed)
+                continue
+            with profile_stage('filter'):
+                included = self.include_entry(item.entry, today_titles)
+            if included:
+                yield item
+    
+    def dedup_stage(self, items):
+        """去重阶段：同一轮中同一订阅源重复出现的条目只处理一次；
+        已发送过的条目在推送时按内容哈希跳过或原地更新"""
+        seen = set()
+        for item in items:
+            key = (item.feed, entry_key(item.entry))
+            if key in seen:
+                continue
+            seen.add(key)
+            yield item
+    
+    def destinations(self, feed_name):
+        """订阅源的推送目标：(工作区, 频道) 和 ('sink', 投递目标名称)，近似重复按目标分别判断"""
+        return ([(workspace.name, channel) for workspace, channel in self.workspaces.routes_for(feed_name)] +
+                [('sink', sink.name) for sink in self.settings.sinks_for(feed_name)])
+    
+    def near_dup_stage(self, items):
+        """近似重复检测阶段：逐条检查条目中的编号内容，按推送目标分别判断，近期已由其他条目推送到同一目标的相似新闻去掉，
+        剩下的重新编号后交给渲染阶段；在某个目标中全部重复时不再推送到该目标，所有目标都重复的条目丢弃"""
+        dropped = 0
+        for item, numbered in self.render_pool.imap(extract_numbered_content, items, lambda item: item.entry.summary):
+            if not numbered:
+                yield item
+                continue
+            owner = entry_key(item.entry)
+            texts = [(line, parsed[1] if parsed else line) for line, parsed in ((line, parse_item(line)) for line in numbered)]
+            kept_by_destination = {}
+            with profile_stage('near_dup: check'):
+                for destination in self.destinations(item.feed):
+                    kept = []
+                    for line, text in texts:
+                        match = self.near_dups.check(destination, text, owner)
+                        if match is None:
+                            kept.append(line)
+                        else:
+                            log(logger, logging.DEBUG, "🪞 近似重复", key=owner, destination=destination,
+                                duplicate_of=match[0], similarity=round(match[1], 2), text=line[:40])
+                    kept_by_destination[destination] = kept
+                    dropped += len(numbered) - len(kept)
+            if kept_by_destination and not any(kept_by_destination.values()):
+                print(f"⏭️  条目中的内容近期都已推送过，跳过: {owner}")
+                continue
+            if any(len(kept) < len(numbered) for kept in kept_by_destination.values()):
+                item.meta['numbered'] = {
+                    destination: [re.sub(r'^\d+\.', f'{index}.', line) for index, line in enumerate(kept, 1)]
+                    for destination, kept in kept_by_destination.items()}
+            yield item
+        if dropped:
+            log(logger, logging.INFO, "🪞 去掉近似重复的内容", dropped=dropped, **self.near_dups.stats())
+    
+    def render_stage(self, items):
+        """渲染阶段：每条内容只格式化一次，再推送到所有订阅了该订阅源的频道和投递目标；
+        未命中渲染缓存的条目按顺序交给渲染进程池（未启用时在当前线程执行）"""
+        for item, content in self.render_pool.imap(format_channel_a, items, self.render_payload):
+            if content is not None:
+                self.render_cache.put(self.channel_a_key(item.entry), content)
+                item.content = content
+            yield item
+    
+    def render_payload(self, item):
+        """渲染阶段交给渲染进程池的摘要；去掉近似重复后剩下的编号内容或命中渲染缓存时直接填好内容，返回 None。
+        各推送目标剩下的编号内容不同时，每种组合渲染一次，放在 item.meta['contents'] 中（全部重复的目标为 None）"""
+        with profile_stage('format: channel_a'):
+            numbered = item.meta.get('numbered')
+            if numbered is not None:
+                rendered = {}
+                contents = item.meta['contents'] = {}
+                for destination, lines in numbered.items():
+                    if lines and tuple(lines) not in rendered:
+                        rendered[tuple(lines)] = self.join_numbered_items(lines)
+                    contents[destination] = rendered[tuple(lines)] if lines else None
+                item.content = next(content for content in contents.values() if content)
+                return None
+            item.content = self.render_cache.get(self.channel_a_key(item.entry))
+            return item.entry.summary if item.content is None else None
+    
+    def deliver_stage(self, items):
+        """推送阶段：推送到订阅了该订阅源的频道（或加入聚合窗口、推送队列）和投递目标"""
+        counts = {}
+        aggregated = 0
+        sink_futures = []
+        for item in items:
+            routes = self.workspaces.routes_for(item.feed)
+            sinks = self.settings.sinks_for(item.feed)
+            # 去掉近似重复后各目标的内容可能不同，None 表示该目标中全部重复
+            contents = item.meta.get('contents', {})
+            numbered = item.meta.get('numbered', {})
+            payloads = {}
+            for sink in sinks:
+                content = contents.get(('sink', sink.name), item.content)
+                if content is None:
                     continue
-                # 不做去重，方便调试
-                # 检查关键词过滤
-                if not self.should_include_message(entry.title, entry.summary):
+                if content not in payloads:
+                    payloads[content] = self.build_payload(item.feed, item.entry, content)
+                sink_futures.append(self.sink_dispatcher.submit(sink, self.deliver_to_sink, sink, payloads[content]))
+            for workspace, channel in routes:
+                content = contents.get((workspace.name, channel), item.content)
+                if content is None:
                     continue
-                new_messages.append(entry)
-            
-            if not new_messages:
-                print("📭 没有找到当天的内容")
-                return
-            
-            print(f"📤 准备推送 {len(new_messages)} 条当天内容")
-            
-            # 只推送到C06AUSCKYKF频道
-            for entry in new_messages:
-                content = self.format_message_for_channel_a(entry)
-                self.send_to_slack(content, 'C06AUSCKYKF')
-            
-            print(f"✅ 成功推送 {len(new_messages)} 条当天内容到C06AUSCKYKF频道")
-            
+                if self.aggregator:
+                    aggregated += self.aggregate(item.feed, item.entry, content, channel, workspace,
+                                                 numbered.get((workspace.name, channel)))
+                elif self.submit_delivery(item.entry, content, channel, workspace, item.feed) is False:
+                    item.meta['undelivered'] = True
+            counts[item.feed] = counts.get(item.feed, 0) + 1
+            yield item
+        
+        if not counts:
+            print("📭 没有找到当天的内容")
+        elif self.aggregator:
+            print(f"🧺 {aggregated} 条新内容加入聚合窗口")
+        else:
+            for feed_name, count in counts.items():
+                channels = len(self.workspaces.routes_for(feed_name))
+                if self.delivery_queue is not None:
+                    print(f"📥 {feed_name}: {count} 条当天内容加入推送队列（{channels} 个频道）")
+                else:
+                    print(f"✅ {feed_name}: 成功推送 {count} 条当天内容到 {channels} 个频道")
+        
+        if sink_futures and self.delivery_queue is None:
+            # 单次运行和调度循环中等待投递完成；异步守护进程中由各目标的线程独立完成
+            with profile_stage('sinks: wait'):
+                wait(sink_futures)
+            delivered = sum(1 for future in sink_futures if future.result())
+            print(f"📮 投递目标: {delivered}/{len(sink_futures)} 条成功")
+    
+    def build_payload(self, feed_name, entry, content):
+        """投递目标共用的渲染结果，只渲染一次；webhook 发出的消息不会删除，不带删除提示"""
+        title, blocks = self.build_blocks(content, expire=False)
+        return {
+            'key': entry_key(entry),
+            'feed': feed_name,
+            'title': title,
+            'text': content,
+            'blocks': blocks,
+            'link': entry.get('link'),
+            'hash': self.content_hash(content),
+        }
+    
+    def deliver_to_sink(self, sink, payload):
+        """投递到一个目标，在该目标的线程中执行；已投递过的相同内容跳过，返回是否已投递"""
+        key, target = payload['key'], f"sink:{sink.name}"
+        with self.state_lock:
+            self.message_index = self.load_message_index()
+            record = self.message_index.get(key, {}).get(target)
+        if record and (record['hash'] == payload['hash'] or not sink.supports_update):
+            return True
+        try:
+            ref = sink.deliver(payload, update=bool(record))
         except Exception as e:
-            print(f"❌ 抓取RSS失败: {e}")
+            log(logger, logging.WARNING, "❌ 投递失败", sink=sink.name, key=key, error=f"{type(e).__name__}: {e}")
+            self.forget_near_dups(key, ('sink', sink.name))
+            return False
+        with self.state_lock:
+            self.message_index = self.load_message_index()
+            self.message_index.setdefault(key, {})[target] = {'ts': ref, 'hash': payload['hash'], 'send_time': time.time()}
+            self.save_message_index()
+        return True
+    
+    def aggregate(self, feed_name, entry, content, channel, workspace, items=None):
+        """把条目加入聚合窗口，已发送或已在窗口中的相同内容跳过，返回是否加入；items 为去掉近似重复后的编号内容"""
+        key = entry_key(entry)
+        content_hash = self.content_hash(content)
+        if self.is_delivered(key, channel, content_hash) or self.aggregator.is_pending(key, channel, content_hash):
+            return False
+        if items is None:
+            items = self.extract_numbered_content(entry.summary)
+        self.aggregator.add(feed_name, key, entry, items, content, content_hash, workspace, channel)
+        return True
+    
+    def flush_digests(self, force=False):
+        """发送已到期的聚合窗口，force=True 时发送全部"""
+        if not self.aggregator:
+            return
+        for window in self.aggregator.pop_due(force):
+            try:
+                if self.deliver_digest(window):
+                    continue
+                error = 'send_failed'
+            except (CircuitOpen, DeadlineExceeded, OSError, SlackApiError) as e:
+                error = f"{type(e).__name__}: {e}"
+            # 发送失败的窗口放回聚合器，下次到期检查时重试；多次失败后放弃，条目未记入索引，再次抓取到时重新聚合
+            window.attempts += 1
+            if window.attempts >= MAX_DIGEST_ATTEMPTS:
+                log(logger, logging.ERROR, "❌ 汇总消息多次发送失败，放弃", channel=window.channel,
+                    entries=len(window.entries), attempts=window.attempts, error=error)
+                for key in window.entries:
+                    self.forget_near_dups(key, (window.workspace.name, window.channel))
+                continue
+            self.aggregator.restore(window)
+            log(logger, logging.WARNING, "⏸️  汇总消息未发送，稍后重试", channel=window.channel,
+                entries=len(window.entries), attempts=window.attempts, error=error)
     
-    def save_pending_delete(self, channel, ts):
+    def deliver_digest(self, window):
+        """一个窗口发送一条汇总消息：合并去重后的编号内容按热度排序，其余内容可放进线程回复"""
+        entries = list(window.entries.values())
+        ranked = rank_items(items for _, items, _, _ in entries)
+        if ranked:
+            lines = [f"{index}. {item['text']}" + (f" <{item['link']}|【详情】>" if item['link'] else '')
+                     for index, item in enumerate(ranked, 1)]
+        else:
+            # 条目中没有编号内容时，直接拼接各条目的格式化消息
+            lines = [message for _, _, message, _ in entries]
+        
+        max_items = self.aggregator.max_items
+        top, rest = lines[:max_items], lines[max_items:]
+        sources = " ".join(f"<{entry.link}|{entry.title}>" for entry, _, _, _ in entries)
+        message = "\n\n".join(top)
+        if not Config.AGGREGATE_THREAD:
+            message += f"\n\n来源（{len(entries)} 条）: {sources}"
+        
+        feed = ','.join(sorted(window.feeds))
+        window.workspace = self.current_workspace(window.workspace)
+        ts = self.send_to_slack(message, window.channel, workspace=window.workspace, feed=feed)
+        if not ts:
+            # 发送失败的条目不记入索引，下次抓取时重新聚合
+            return False
+        
+        if Config.AGGREGATE_THREAD:
+            # 线程回复：其余内容和来源，按 Slack 单段文本长度上限分段
+            replies = []
+            for line in rest + [f"来源（{len(entries)} 条）: {sources}"]:
+                if replies and len(replies[-1]) + len(line) + 2 <= 2900:
+                    replies[-1] += "\n\n" + line
+                else:
+                    replies.append(line)
+            for reply in replies:
+                try:
+                    self.send_to_slack(reply, window.channel, title="更多内容", workspace=window.workspace,
+                                       thread_ts=ts, feed=feed)
+                except (CircuitOpen, DeadlineExceeded, OSError) as e:
+                    # 汇总消息已经发出，线程回复失败不再重发整个窗口
+                    log(logger, logging.WARNING, "⚠️  汇总线程回复发送失败", channel=window.channel,
+                        error=f"{type(e).__name__}: {e}")
+                    break
+        
+        send_time = time.time()
+        with self.state_lock:
+            self.message_index = self.load_message_index()
+            for entry, _, _, content_hash in entries:
+                self.message_index.setdefault(entry_key(entry), {})[window.channel] = {
+                    'ts': ts, 'hash': content_hash, 'send_time': send_time}
+            self.save_message_index()
+        print(f"📦 汇总 {len(entries)} 条内容发送到 {window.channel}")
+        return ts
+    
+    def include_entry(self, entry, today_titles):
+        """是否推送：当天且符合关键词的消息"""
+        # 只推送当天内容
+        if not any(title in entry.title for title in today_titles):
+            return False
+        # 重复条目在 deliver 中按内容哈希跳过或原地更新
+        # 检查关键词过滤
+        return self.should_include_message(entry.title, entry.summary)
+    
+    def save_pending_delete(self, channel, ts, workspace='default'):
         """保存待删除消息"""
-        file = 'pending_deletes.json'
-        record = {'channel': channel, 'ts': ts, 'send_time': time.time()}
-        try:
-            with open(file, 'r') as f:
-                data = json.load(f)
-        except:
-            data = []
-        data.append(record)
-        with open(file, 'w') as f:
-            json.dump(data, f)
+        record = {'channel': channel, 'ts': ts, 'send_time': time.time(), 'workspace': workspace}
+        with self.state_lock, profile_stage('json: save_pending_delete'):
+            data = self.state_store.load('pending_deletes', [])
+            data.append(record)
+            self.state_store.save('pending_deletes', data)
     
     def delete_expired_messages(self):
-        """定时检查并删除过期消息"""
-        file = 'pending_deletes.json'
-        try:
-            with open(file, 'r') as f:
-                data = json.load(f)
-        except:
-            data = []
+        """定时检查并删除过期消息，多副本时只由持有 reaper 租约的副本执行；
+        整轮在 CYCLE_DEADLINE_SECONDS 内完成，未删完的消息留在列表中下一轮继续"""
+        if self.coordinator:
+            try:
+                self.coordinator.heartbeat()
+                if not self.coordinator.try_acquire('reaper'):
+                    return
+            except Exception as e:
+                print(f"❌ 协调数据库访问失败: {e}")
+                return
+        with cycle_deadline():
+            self._delete_expired_messages()
+    
+    def _delete_expired_messages(self):
+        with self.state_lock, profile_stage('json: load_pending_deletes'):
+            data = self.state_store.load('pending_deletes', [])
         
         if not data:
             return
         
-        print(f"🔍 检查 {len(data)} 条待删除消息...")
         current_time = time.time()
-        new_data = []
-        delete_after_seconds = 172800  # 48小时 = 48 * 60 * 60 = 172800秒
+        expired = [record for record in data if current_time - record['send_time'] >= Config.DELETE_AFTER_SECONDS]
         
-        for record in data:
-            time_diff = current_time - record['send_time']
-            hours_diff = time_diff / 3600
-            print(f"   消息 {record['ts']}: 已发送 {hours_diff:.1f} 小时")
-            
-            if time_diff >= delete_after_seconds:  # 48小时后删除
-                try:
-                    print(f"   🗑️  尝试删除消息: {record['ts']}")
-                    self.slack_client.chat_delete(channel=record['channel'], ts=record['ts'])
-                    print(f"   ✅ 成功删除消息: {record['ts']}")
-                except Exception as e:
-                    print(f"   ❌ 删除失败: {e}")
-                    new_data.append(record)  # 保留未成功删除的
-            else:
-                remaining_hours = (delete_after_seconds - time_diff) / 3600
-                print(f"   ⏳ 消息未过期，还需等待 {remaining_hours:.1f} 小时")
-                new_data.append(record)
+        if not expired:
+            # 没有到期消息时不逐条输出，也不重写文件
+            next_hours = (Config.DELETE_AFTER_SECONDS - (current_time - min(r['send_time'] for r in data))) / 3600
+            log(logger, logging.DEBUG, "⏳ 没有到期消息", pending=len(data), next_expiry_hours=round(next_hours, 1))
+            return
         
-        with open(file, 'w') as f:
-            json.dump(new_data, f)
+        log(logger, logging.INFO, "🔍 开始删除到期消息", pending=len(data), expired=len(expired))
+        deleted = set()
+        deferred = 0
+        progress = ProgressReporter(logger, "🗑️  删除到期消息", len(expired))
+        
+        for index, record in enumerate(expired):
+            workspace = self.workspaces.get(record.get('workspace'))
+            try:
+                with profile_stage('slack: chat_delete'):
+                    workspace.call('chat_delete', channel=record['channel'], ts=record['ts'])
+                progress.item(True, channel=record['channel'], ts=record['ts'])
+                record_event('delete', workspace.name, record['channel'], record['ts'], sent=record['send_time'])
+                record_deleted(workspace.name, record['channel'], record['ts'])
+                deleted.add((record['channel'], record['ts']))
+            except DeadlineExceeded:
+                # 本轮时限已到，其余记录保留到下一轮
+                deferred += len(expired) - index
+                break
+            except CircuitOpen:
+                # 该工作区已熔断，记录保留到下一轮，其他工作区继续
+                deferred += 1
+            except Exception as e:
+                error = e.response['error'] if isinstance(e, SlackApiError) else str(e)
+                progress.item(False, error=error, channel=record['channel'], ts=record['ts'])
+                record_event('delete_failed', workspace.name, record['channel'], record['ts'], sent=record['send_time'],
+                             error=e.response['error'] if isinstance(e, SlackApiError) else type(e).__name__)
+        progress.finish()
+        
+        # 删除期间可能有新消息写入，重新加载后只去掉已成功删除的记录，未成功删除的保留
+        with self.state_lock, profile_stage('json: save_pending_deletes'):
+            data = self.state_store.load('pending_deletes', [])
+            new_data = [record for record in data if (record['channel'], record['ts']) not in deleted]
+            self.state_store.save('pending_deletes', new_data)
+        
+        log(logger, logging.INFO, "📊 删除检查完成", remaining=len(new_data), deferred=deferred)
+    
+    def run_profiled(self, mode, output_file):
+        """在性能分析模式下执行一次抓取或删除任务"""
+        profiler = CycleProfiler(output_file)
+        if mode == 'purge':
+            profiler.run('delete_expired_messages', self.delete_expired_messages)
+        else:
+            profiler.run('fetch_and_process', self.fetch_and_process)
+    
+    def create_telegram_source(self):
+        """创建 Telegram 直连消息源"""
+        return TelegramChannelSource(
+            Config.TELEGRAM_BOT_TOKEN,
+            Config.TELEGRAM_GROUP_ID,
+            api_base=Config.TELEGRAM_API_BASE,
+            store=self.state_store,
+            poll_timeout=Config.TELEGRAM_POLL_TIMEOUT,
+        )
+    
+    def fetch_telegram_once(self):
+        """不等待，取走 Telegram 中积压的频道消息并处理一次"""
+        print(f"🔄 开始拉取Telegram频道消息: {Config.TELEGRAM_GROUP_ID}")
+        source = self.create_telegram_source()
+        try:
+            entries = source.get_updates(timeout=0)
+        except Exception as e:
+            print(f"❌ Telegram 拉取失败: {e}")
+            return
+        print(f"📝 获取到 {len(entries)} 条消息")
+        # 处理完成后才确认 offset，失败时下次运行重新拉取这一批
+        if not entries or self.process_entries(entries):
+            source.confirm()
+    
+    def start_telegram_listener(self):
+        """在后台线程长轮询 Telegram，新消息到达后立即推送"""
+        source = self.create_telegram_source()
+        thread = threading.Thread(target=source.poll_forever, args=(self.process_entries,),
+                                  name='telegram-listener', daemon=True)
+        thread.start()
+        print(f"📡 Telegram 直连监听已启动: {Config.TELEGRAM_GROUP_ID}")
+        return thread
+    
+    def handle_pushed_entries(self, entries, feed_name=None):
+        """处理推送来的条目，feed_name 为 topic 对应的订阅源（没有时为默认订阅源）；
+        返回没有推送成功的条目，推送接收服务会去掉它们的去重记录，之后再次推送时重新处理"""
+        undelivered = []
+        if not self.process_entries(entries, feed_name or DEFAULT_FEED, undelivered):
+            return list(entries)
+        return undelivered
+    
+    def start_push_receiver(self):
+        """启动推送接收服务，声明了 WebSub hub 的订阅源逐个自动订阅"""
+        self.push_receiver = PushReceiver(
+            self.handle_pushed_entries,
+            host=Config.PUSH_HOST,
+            port=Config.PUSH_PORT,
+            secret=Config.PUSH_SECRET,
+            workers=Config.PUSH_WORKERS,
+            seen=self.pushed_links,
+            # 去重记录与已发送消息索引保留同样长的时间
+            retention_seconds=2 * Config.DELETE_AFTER_SECONDS,
+            save_seen=self.save_pushed_links,
+        )
+        self.push_receiver.start()
         
-        print(f"📊 删除检查完成，剩余 {len(new_data)} 条待删除消息")
+        if not Config.PUSH_CALLBACK_URL:
+            print("⚠️  未设置PUSH_CALLBACK_URL，只接收主动推送，不发起WebSub订阅")
+            return
+        for feed_name, path in self.workspaces.feeds.items():
+            self.subscribe_feed(feed_name, path)
+    
+    def subscribe_feed(self, feed_name, path):
+        """向订阅源声明的 WebSub hub 订阅，推送按 topic 对应回这个订阅源"""
+        feed = self.fetch_rss_with_headers(path)
+        hub, topic = discover_hub(feed) if feed else (None, None)
+        if not hub:
+            print(f"⚠️  订阅源 {feed_name} 没有声明WebSub hub，只接收主动推送")
+            return
+        topic = topic or self.mirror_pool.mirrors[0] + path
+        try:
+            self.push_receiver.subscribe(hub, topic, Config.PUSH_CALLBACK_URL, feed=feed_name)
+        except Exception as e:
+            print(f"❌ WebSub订阅失败 {feed_name}: {e}")
+            # 稍后按续订的退避策略重试
+            self.push_receiver.schedule_renewal(self.push_receiver.renew_retry_seconds, hub, topic,
+                                                Config.PUSH_CALLBACK_URL, 864000, attempt=1)
     
     def run_scheduler(self):
         """运行定时任务"""
         print("🚀 RSS抓取机器人启动")
         print(f"📡 RSS地址: {self.rss_url}")
+        print(f"🏢 工作区: {', '.join(self.workspaces.workspaces)}")
         print(f"🎯 过滤关键词: {self.filter_keywords}")
-        print(f"⏰ 执行时间: 每周一到周五 10:00")
+        print(f"⏰ 执行时间: 每周一到周五 {self.settings.schedule_time}")
         print("=" * 50)
         
+        use_telegram = Config.INGEST_MODE == 'telegram'
+        
         # 检查是否在GitHub Actions环境中
         if os.getenv('GITHUB_ACTIONS'):
             print("🔧 检测到GitHub Actions环境，执行单次任务")
-            self.fetch_and_process()
+            if use_telegram:
+                self.fetch_telegram_once()
+            else:
+                self.fetch_and_process()
+            self.flush_digests(force=True)
+            if self.deferred_feeds or self.deferred_deliveries:
+                print(f"⚠️  单次任务没有下一轮，{len(self.deferred_feeds)} 个订阅源和 "
+                      f"{len(self.deferred_deliveries)} 条推送未完成")
+            self.state_store.flush()
+            if self.coordinator:
+                self.coordinator.leave()
             print("✅ 任务完成，退出")
             return
         
-        # 本地环境：立即执行一次
-        self.fetch_and_process()
+        if use_telegram:
+            # Telegram 直连：长轮询实时推送，调度器只负责删除过期消息
+            self.start_telegram_listener()
+        elif Config.INGEST_MODE == 'push':
+            # 推送模式：接收 WebSub/Webhook 推送，调度器只负责删除过期消息
+            self.start_push_receiver()
+        else:
+            # 本地环境：立即执行一次
+            self.fetch_and_process()
+            
+            # 设置定时任务：每周一到周五的早上10:00（SCHEDULE_TIME）
+            self.schedule_fetches()
         
-        # 设置定时任务：每周一到周五的早上10:00
-        schedule.every().monday.at("10:00").do(self.fetch_and_process)
-        schedule.every().tuesday.at("10:00").do(self.fetch_and_process)
-        schedule.every().wednesday.at("10:00").do(self.fetch_and_process)
-        schedule.every().thursday.at("10:00").do(self.fetch_and_process)
-        schedule.every().friday.at("10:00").do(self.fetch_and_process)
+        # 配置文件变化或收到 SIGHUP 时在后台重新加载
+        self.start_config_watcher()
         
         # 运行调度器
         while True:
             try:
+                if self.scheduled_time:
+                    self.schedule_fetches()
                 schedule.run_pending()
+                self.retry_deferred()
+                self.flush_digests()
                 self.delete_expired_messages()  # 定时检查并删除过期消息
+                self.state_store.flush()
                 time.sleep(60)
             except KeyboardInterrupt:
                 print("\n🛑 收到中断信号，正在退出...")
+                self.flush_digests(force=True)
+                if self.coordinator:
+                    self.coordinator.leave()
                 break
             except Exception as e:
                 print(f"❌ 调度器错误: {e}")
@@ -361,6 +1050,16 @@ class RSSSlackBot:
 
 def main():
     """主函数"""
+    Config.load()
+    parser = argparse.ArgumentParser(description="SoSoValue RSS 推送到 Slack")
+    parser.add_argument('--profile', choices=['fetch', 'purge'], default=Config.PROFILE_MODE,
+                        help="以性能分析模式执行一次抓取(fetch)或删除(purge)任务后退出")
+    parser.add_argument('--profile-output', default=Config.PROFILE_OUTPUT,
+                        help="性能分析报告输出文件")
+    parser.add_argument('--daemon', choices=['scheduler', 'async'], default=Config.DAEMON_MODE,
+                        help="常驻运行方式：单线程调度循环(scheduler)或异步守护进程(async)")
+    args = parser.parse_args()
+    
     # 检查配置
     if not Config.SLACK_BOT_TOKEN:
         print("❌ 错误: 未设置SLACK_BOT_TOKEN")
@@ -374,6 +1073,12 @@ def main():
     
     # 创建并运行机器人
     bot = RSSSlackBot()
+    if args.profile:
+        bot.run_profiled(args.profile, args.profile_output)
+        return
+    if args.daemon == 'async' and not os.getenv('GITHUB_ACTIONS'):
+        AsyncDaemon(bot).run()
+        return
     bot.run_scheduler()
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+已发送消息台账
+每条发出的 Slack 消息记录一行（工作区、频道、ts、订阅源、发送时间、到期时间），删除后做标记。
+删除工具直接按台账删除自己的消息，不需要读取频道历史；只有核对台账时才扫描历史：
+台账中有而频道中已不存在的消息标记为已删除，频道中有而台账中没有的本Bot消息补记到台账
+"""
+
+import sqlite3
+import threading
+import time
+from config import Config
+
+
+class SentLedger:
+    """已发送消息台账（SQLite）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS sent (
+                workspace TEXT NOT NULL, channel TEXT NOT NULL, ts TEXT NOT NULL, feed TEXT,
+                sent_at REAL NOT NULL, expires_at REAL, deleted_at REAL, PRIMARY KEY (workspace, channel, ts))""")
+            conn.execute("CREATE INDEX IF NOT EXISTS sent_live ON sent (deleted_at, expires_at)")
+
+    def connect(self):
+        # sqlite3 连接不能跨线程共用，每个线程一个连接
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def record(self, workspace, channel, ts, feed=None, expires_at=None, sent_at=None):
+        """记录一条已发送的消息，expires_at 为 None 表示永久保留"""
+        with self.connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO sent (workspace, channel, ts, feed, sent_at, expires_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (workspace, channel, ts, feed, sent_at or time.time(), expires_at))
+
+    def mark_deleted(self, workspace, channel, ts):
+        """记录消息已被删除（或在频道中已不存在）；按频道历史删除时不知道工作区，workspace 为 None 时按频道和 ts 匹配"""
+        with self.connect() as conn:
+            if workspace is None:
+                conn.execute("UPDATE sent SET deleted_at = ? WHERE channel = ? AND ts = ? AND deleted_at IS NULL",
+                             (time.time(), channel, ts))
+            else:
+                conn.execute("UPDATE sent SET deleted_at = ? WHERE workspace = ? AND channel = ? AND ts = ?",
+                             (time.time(), workspace, channel, ts))
+
+    def _where(self, workspace=None, channel=None, feed=None, expired_before=None, include_deleted=False):
+        clauses, args = [], []
+        if not include_deleted:
+            clauses.append("deleted_at IS NULL")
+        for name, value in (('workspace', workspace), ('channel', channel), ('feed', feed)):
+            if value:
+                clauses.append(f"{name} = ?")
+                args.append(value)
+        if expired_before:
+            clauses.append("expires_at <= ?")
+            args.append(expired_before)
+        return " AND ".join(clauses) or "1", args
+
+    def messages(self, limit=None, **filters):
+        """按条件查询台账（先发的在前），filters 支持 workspace、channel、feed、expired_before、include_deleted"""
+        where, args = self._where(**filters)
+        sql = f"SELECT workspace, channel, ts, feed, sent_at, expires_at, deleted_at FROM sent WHERE {where} ORDER BY sent_at"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.connect().execute(sql, args)]
+
+    def count(self, **filters):
+        where, args = self._where(**filters)
+        return self.connect().execute(f"SELECT COUNT(*) FROM sent WHERE {where}", args).fetchone()[0]
+
+    def channels(self, workspace=None):
+        """台账中仍有未删除消息的频道"""
+        where, args = self._where(workspace=workspace)
+        return [row[0] for row in self.connect().execute(f"SELECT DISTINCT channel FROM sent WHERE {where}", args)]
+
+    def reconcile(self, workspace, channel, history, user_id=None, bot_id=None):
+        """用全量同步过的频道历史（ChannelHistory.sync(channel, full=True)）核对台账，返回 (补记条数, 标记已删除条数)"""
+        present = {message['ts'] for message in history.messages(channel, user=user_id, bot_id=bot_id)}
+        rows = self.messages(workspace=workspace, channel=channel, include_deleted=True)
+        known = {row['ts'] for row in rows}
+        gone = [row['ts'] for row in rows if row['deleted_at'] is None and row['ts'] not in present]
+        missing = present - known
+        with self.connect() as conn:
+            conn.executemany("INSERT OR IGNORE INTO sent (workspace, channel, ts, feed, sent_at, expires_at) "
+                             "VALUES (?, ?, ?, NULL, ?, NULL)",
+                             [(workspace, channel, ts, float(ts)) for ts in missing])
+            conn.executemany("UPDATE sent SET deleted_at = ? WHERE workspace = ? AND channel = ? AND ts = ?",
+                             [(time.time(), workspace, channel, ts) for ts in gone])
+        return len(missing), len(gone)
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_sent_ledger():
+    """按 SENT_LEDGER_DB 返回进程内共用的台账，未配置时返回 None"""
+    global _ledger
+    if not Config.SENT_LEDGER_DB:
+        return None
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = SentLedger(Config.SENT_LEDGER_DB)
+        return _ledger
+
+
+def record_sent(workspace, channel, ts, feed=None, expires_at=None):
+    """记录已发送的消息，未配置台账时忽略；写入失败不影响发送"""
+    ledger = get_sent_ledger()
+    if ledger is None:
+        return
+    try:
+        ledger.record(workspace, channel, ts, feed, expires_at)
+    except sqlite3.Error as e:
+        print(f"⚠️  写入消息台账失败: {e}")
+
+
+def record_deleted(workspace, channel, ts):
+    """记录消息已删除，未配置台账时忽略；写入失败不影响删除。workspace 为 None 时按频道和 ts 匹配"""
+    ledger = get_sent_ledger()
+    if ledger is None:
+        return
+    try:
+        ledger.mark_deleted(workspace, channel, ts)
+    except sqlite3.Error as e:
+        print(f"⚠️  写入消息台账失败: {e}")
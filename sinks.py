@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+多目标投递
+同一条渲染好的内容可以同时投递到多个目标（sink）：Slack Web API（独立 token）、Slack incoming webhook、
+通用 HTTP/JSON webhook 和 JSONL 文件。每个目标有独立的限流、重试和熔断，目标之间并行、目标内按顺序发送。
+适合不需要删除的广播频道：webhook 不占用 Web API 的速率配额，多个目标合起来的吞吐不受单个 bot token 限制。
+目标在 WORKSPACES_FILE 的 sinks 中配置，也可以只设置 SLACK_WEBHOOK_URL
+"""
+
+import abc
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from slack_sdk.errors import SlackApiError
+from config import Config
+from mirror_fetch import get_session
+from profiler import profiled_call
+from rate_limit import RateLimiter
+from resilience import CircuitOpen, get_breaker
+
+
+def is_transient(e):
+    """投递异常是否值得重试：网络错误、超时、5xx 和 429"""
+    if isinstance(e, SlackApiError):
+        status = getattr(e.response, 'status_code', 0)
+        return status >= 500 or status == 429
+    if isinstance(e, requests.exceptions.HTTPError):
+        status = e.response.status_code if e.response is not None else 0
+        return status >= 500 or status == 429
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, OSError))
+
+
+def retry_after(e):
+    """429 响应中的 Retry-After（秒），没有时返回 None"""
+    response = getattr(e, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class Sink(abc.ABC):
+    """投递目标基类：子类实现 send，返回目标中的消息标识（没有时返回 None）"""
+
+    type = None
+    supports_update = False  # 内容变化时能否再次投递（webhook 无法修改已发出的消息）
+
+    def __init__(self, name, feeds, rate_per_second=1.0, retries=3, backoff=1.0):
+        self.name = name
+        self.feeds = feeds
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.breaker = get_breaker(f"sink:{name}")
+
+    @abc.abstractmethod
+    def send(self, payload, update=False):
+        """发送一次，不重试；update 表示同一条目的内容有变化"""
+
+    def deliver(self, payload, update=False):
+        """限流、熔断和指数退避重试；熔断中抛出 CircuitOpen，重试用尽后抛出最后一次的异常"""
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self.breaker.call(lambda: self.send(payload, update), is_transient)
+            except CircuitOpen:
+                raise
+            except Exception as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                delay = retry_after(e) or self.backoff * 2 ** attempt
+                print(f"🔁 投递到 {self.name} 失败，{delay:.1f} 秒后重试: {type(e).__name__}: {e}")
+                time.sleep(delay)
+
+
+class WebAPISink(Sink):
+    """Slack Web API chat_postMessage，使用单独的 token，不记录删除计划"""
+
+    type = 'web_api'
+
+    def __init__(self, name, feeds, client, channel, **kwargs):
+        super().__init__(name, feeds, **kwargs)
+        self.client = client
+        self.channel = channel
+
+    def send(self, payload, update=False):
+        response = self.client.chat_postMessage(channel=self.channel, blocks=payload['blocks'], text=payload['title'])
+        return response['ts']
+
+
+class IncomingWebhookSink(Sink):
+    """Slack incoming webhook，频道由 webhook 本身决定"""
+
+    type = 'incoming_webhook'
+
+    def __init__(self, name, feeds, url, timeout=10, **kwargs):
+        super().__init__(name, feeds, **kwargs)
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, payload, update=False):
+        response = get_session().post(self.url, json={'text': payload['title'], 'blocks': payload['blocks']},
+                                      timeout=self.timeout)
+        response.raise_for_status()
+        return None
+
+
+class WebhookSink(Sink):
+    """通用 HTTP/JSON webhook，POST 完整的内容，update 表示同一条目的内容有变化"""
+
+    type = 'webhook'
+    supports_update = True
+
+    def __init__(self, name, feeds, url, headers=None, timeout=10, **kwargs):
+        super().__init__(name, feeds, **kwargs)
+        self.url = url
+        self.headers = headers or {}
+        self.timeout = timeout
+
+    def send(self, payload, update=False):
+        response = get_session().post(self.url, json=dict(payload, update=update), headers=self.headers,
+                                      timeout=self.timeout)
+        response.raise_for_status()
+        return None
+
+
+class JSONLFileSink(Sink):
+    """追加写入 JSON Lines 文件，用于归档或交给其他程序处理"""
+
+    type = 'jsonl'
+    supports_update = True
+
+    def __init__(self, name, feeds, path, **kwargs):
+        kwargs.setdefault('rate_per_second', 1000)
+        super().__init__(name, feeds, **kwargs)
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, payload, update=False):
+        line = json.dumps(dict(payload, update=update, time=time.time()), ensure_ascii=False)
+        with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+        return None
+
+
+SINK_TYPES = {cls.type: cls for cls in (WebAPISink, IncomingWebhookSink, WebhookSink, JSONLFileSink)}
+
+
+def resolve_sink_item(item):
+    """把 url_env / token_env 替换成环境变量的值，得到用于比较和创建目标的配置"""
+    item = dict(item)
+    for key in ('url', 'token'):
+        env = item.pop(f'{key}_env', None)
+        if env:
+            item[key] = os.getenv(env)
+    return item
+
+
+def build_sink(item, client_for):
+    """按配置项创建目标；url 和 token 可以用 url_env / token_env 指向环境变量"""
+    config = resolve_sink_item(item)
+    item = dict(config)
+    sink_type = item.pop('type')
+    if sink_type not in SINK_TYPES:
+        raise ValueError(f"不支持的投递目标类型: {sink_type}")
+    name = item.pop('name', sink_type)
+    feeds = item.pop('feeds', None) or ['default']
+    if sink_type == 'web_api':
+        token = item.pop('token', None)
+        if not token:
+            raise ValueError(f"投递目标 {name} 没有配置 token")
+        item['client'] = client_for(token)
+    elif sink_type in ('incoming_webhook', 'webhook') and not item.get('url'):
+        raise ValueError(f"投递目标 {name} 没有配置 url")
+    sink = SINK_TYPES[sink_type](name, feeds, **item)
+    sink.config = config
+    return sink
+
+
+def load_sinks(client_for, path=None, previous=()):
+    """从 WORKSPACES_FILE 的 sinks 加载目标；设置了 SLACK_WEBHOOK_URL 时为默认订阅源加一个 incoming webhook。
+    previous 为重新加载前的目标，配置未变的目标沿用原对象，保留限流配额"""
+    path = path or Config.WORKSPACES_FILE
+    items = []
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            items = json.load(f).get('sinks', [])
+    if Config.SLACK_WEBHOOK_URL:
+        items.append({'type': 'incoming_webhook', 'name': 'webhook', 'url': Config.SLACK_WEBHOOK_URL})
+    existing = {sink.name: sink for sink in previous}
+    sinks = []
+    for item in items:
+        old = existing.get(item.get('name', item.get('type')))
+        if old is not None and getattr(old, 'config', None) == resolve_sink_item(item):
+            sinks.append(old)
+        else:
+            sinks.append(build_sink(item, client_for))
+    return sinks
+
+
+class SinkDispatcher:
+    """每个目标一个单线程执行器：目标之间并行，同一目标按提交顺序投递"""
+
+    def __init__(self):
+        self.executors = {}
+        self.lock = threading.Lock()
+
+    def submit(self, sink, func, *args):
+        with self.lock:
+            executor = self.executors.get(sink.name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sink-{sink.name}")
+                self.executors[sink.name] = executor
+        return executor.submit(profiled_call, func, *args)
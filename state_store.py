@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+状态存储
+去重记录、待删除消息、消息索引等状态统一经这里读写，可选本地JSON文件、SQLite或单文件压缩快照
+快照适合 GitHub Actions 单次运行：用 actions/cache 在两次运行之间保存和恢复一个文件即可
+"""
+
+import atexit
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from config import Config
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+class FileStateStore:
+    """每项状态一个JSON文件（默认，兼容原有的 pending_deletes.json 等文件）"""
+
+    def __init__(self, directory='.'):
+        self.directory = directory
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, name, default):
+        try:
+            with open(self.path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def save(self, name, value):
+        # 先写临时文件再替换，避免中途退出留下损坏的文件
+        path = self.path(name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(_dumps(value))
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        pass
+
+
+class SQLiteStateStore:
+    """所有状态存放在一个SQLite文件中。字典和列表按键（列表按元素）分行存放，save 时与库中已有的行比较，
+    只写入新增、修改和删除的行：pending_deletes、message_index 增减一条时不再重写整个状态。
+    其他值（和旧版本写入的整块状态）仍存放在 state 表中"""
+
+    def __init__(self, path='bot_state.db'):
+        self.path = path
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value BLOB NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS state_kinds (name TEXT PRIMARY KEY, kind TEXT NOT NULL)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS state_items (
+                name TEXT NOT NULL, key TEXT NOT NULL, seq INTEGER NOT NULL, value TEXT NOT NULL,
+                PRIMARY KEY (name, key))""")
+
+    def connect(self):
+        # sqlite3 连接不能跨线程共用，每个线程一个连接
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def load(self, name, default):
+        conn = self.connect()
+        row = conn.execute("SELECT kind FROM state_kinds WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            row = conn.execute("SELECT value FROM state WHERE name = ?", (name,)).fetchone()
+            return json.loads(row[0]) if row else default
+        items = conn.execute("SELECT key, value FROM state_items WHERE name = ? ORDER BY seq", (name,)).fetchall()
+        if row[0] == 'dict':
+            return {key: json.loads(value) for key, value in items}
+        return [json.loads(value) for _, value in items]
+
+    @staticmethod
+    def rows(value):
+        """字典为 [(键, 值JSON)]；列表元素以内容和出现次数为键，元素不变时键也不变"""
+        if isinstance(value, dict):
+            return [(str(key), _dumps(item)) for key, item in value.items()]
+        rows = []
+        seen = {}
+        for item in value:
+            encoded = _dumps(item)
+            count = seen.get(encoded, 0)
+            seen[encoded] = count + 1
+            rows.append((f"{hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:20]}:{count}", encoded))
+        return rows
+
+    def save(self, name, value):
+        conn = self.connect()
+        # 在写事务中与库中的行比较，多个进程共用一个文件时也不会互相覆盖
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if isinstance(value, (dict, list)):
+                self.save_items(conn, name, 'dict' if isinstance(value, dict) else 'list', self.rows(value))
+            else:
+                conn.execute("DELETE FROM state_kinds WHERE name = ?", (name,))
+                conn.execute("DELETE FROM state_items WHERE name = ?", (name,))
+                conn.execute("INSERT OR REPLACE INTO state (name, value) VALUES (?, ?)", (name, _dumps(value)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def save_items(self, conn, name, kind, rows):
+        old_kind = conn.execute("SELECT kind FROM state_kinds WHERE name = ?", (name,)).fetchone()
+        if old_kind is None or old_kind[0] != kind:
+            conn.execute("DELETE FROM state WHERE name = ?", (name,))
+            conn.execute("DELETE FROM state_items WHERE name = ?", (name,))
+            conn.execute("INSERT OR REPLACE INTO state_kinds (name, kind) VALUES (?, ?)", (name, kind))
+        existing = {key: (seq, value) for key, seq, value in
+                    conn.execute("SELECT key, seq, value FROM state_items WHERE name = ?", (name,))}
+        keys = {key for key, _ in rows}
+        removed = [(name, key) for key in existing if key not in keys]
+        conn.executemany("DELETE FROM state_items WHERE name = ? AND key = ?", removed)
+
+        # 保留的行顺序不变、新行都在末尾时（追加、删除、修改）只写变化的行，否则按新顺序重新编号
+        retained = [index for index, (key, _) in enumerate(rows) if key in existing]
+        seqs = [existing[rows[index][0]][0] for index in retained]
+        in_order = seqs == sorted(seqs) and (not retained or len(retained) == retained[-1] + 1)
+        next_seq = max((seq for seq, _ in existing.values()), default=-1) + 1
+        for index, (key, value) in enumerate(rows):
+            old = existing.get(key)
+            if in_order:
+                if old is None:
+                    conn.execute("INSERT INTO state_items (name, key, seq, value) VALUES (?, ?, ?, ?)",
+                                 (name, key, next_seq, value))
+                    next_seq += 1
+                elif old[1] != value:
+                    conn.execute("UPDATE state_items SET value = ? WHERE name = ? AND key = ?", (value, name, key))
+            elif old is None:
+                conn.execute("INSERT INTO state_items (name, key, seq, value) VALUES (?, ?, ?, ?)",
+                             (name, key, index, value))
+            elif old != (index, value):
+                conn.execute("UPDATE state_items SET seq = ?, value = ? WHERE name = ? AND key = ?",
+                             (index, value, name, key))
+
+    def flush(self):
+        pass
+
+
+class SnapshotStateStore:
+    """所有状态压缩成一个二进制快照文件，读写都在内存中进行，退出时写回一次"""
+
+    MAGIC = b'SSVS1'
+
+    def __init__(self, path='bot_state.snap'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.data = self.read()
+        atexit.register(self.flush)
+
+    def read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return {}
+        if not raw.startswith(self.MAGIC):
+            print(f"⚠️  状态快照格式无法识别，忽略: {self.path}")
+            return {}
+        return json.loads(zlib.decompress(raw[len(self.MAGIC):]))
+
+    def load(self, name, default):
+        # 返回副本，与其他后端一样，调用方修改后需显式 save 才会生效
+        with self.lock:
+            return copy.deepcopy(self.data.get(name, default))
+
+    def save(self, name, value):
+        with self.lock:
+            self.data[name] = copy.deepcopy(value)
+            self.dirty = True
+
+    def flush(self):
+        """把快照写回文件"""
+        with self.lock:
+            if not self.dirty:
+                return
+            raw = self.MAGIC + zlib.compress(_dumps(self.data).encode('utf-8'), 1)
+            self.dirty = False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_path, self.path)
+
+
+_store = None
+
+
+def get_state_store():
+    """按 STATE_BACKEND 配置返回进程内共用的状态存储"""
+    global _store
+    if _store is None:
+        backend = Config.STATE_BACKEND
+        if backend == 'sqlite':
+            _store = SQLiteStateStore(Config.STATE_PATH or 'bot_state.db')
+        elif backend == 'snapshot':
+            _store = SnapshotStateStore(Config.STATE_PATH or 'bot_state.snap')
+        else:
+            _store = FileStateStore(Config.STATE_PATH or '.')
+    return _store
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+发送与删除统计报表
+把发送/删除历史（DELIVERY_LOG）和当前待删除列表载入 pandas 列式表，全部用向量化运算计算：
+每个频道每天的发送量、删除耗时分布、逾期未删除的消息、按错误码的失败率和待删除积压的变化，
+用于评估保留时长和速率配额。结果输出到控制台，或用 --csv 导出
+"""
+
+import argparse
+import io
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from config import Config
+from delivery_log import COLUMNS
+from state_store import get_state_store
+
+# 删除耗时分布的分箱：删除时限之内，逾期 1、2、6、24 小时以内和更久
+OVERDUE_HOURS_BINS = (0, 1, 2, 6, 24)
+
+
+EVENT_DTYPES = {'event': 'category', 'time': 'float64', 'workspace': 'category', 'channel': 'category',
+                'sent': 'float64', 'expire': 'int8', 'error': 'category'}
+CACHE_VERSION = 1
+
+
+def empty_events():
+    return pd.DataFrame({name: pd.Series([], dtype=dtype) for name, dtype in EVENT_DTYPES.items()})
+
+
+def parse_events(source, header=True):
+    """用 C 解析器读取 CSV，只读取统计需要的列，文本列用 category 类型"""
+    return pd.read_csv(source, header=0 if header else None, names=None if header else COLUMNS,
+                       usecols=list(EVENT_DTYPES), dtype=EVENT_DTYPES, engine='c')
+
+
+def concat_events(old, new):
+    """拼接两段事件，合并 category 的取值，避免退化为 object 列"""
+    if not len(old):
+        return new
+    if not len(new):
+        return old
+    columns = {}
+    for name, dtype in EVENT_DTYPES.items():
+        if dtype == 'category':
+            columns[name] = union_categoricals([old[name].array, new[name].array])
+        else:
+            columns[name] = np.concatenate([old[name].to_numpy(), new[name].to_numpy()])
+    return pd.DataFrame(columns)
+
+
+def load_events(path, since=None, use_cache=True):
+    """载入事件日志。日志只追加，解析结果缓存在 <日志>.cache.pkl，之后只解析新增的部分；
+    日志被截断或替换时重新解析"""
+    if not path or not os.path.exists(path):
+        return empty_events()
+    cache_path = f"{path}.cache.pkl"
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+        events, offset = None, 0
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as cache_file:
+                    cache = pickle.load(cache_file)
+                if (cache['version'] == CACHE_VERSION and cache['head'] == head[:len(cache['head'])]
+                        and cache['offset'] <= os.fstat(f.fileno()).st_size):
+                    events, offset = cache['events'], cache['offset']
+            except (OSError, ValueError, KeyError, pickle.UnpicklingError, EOFError):
+                events = None
+        f.seek(offset)
+        data = f.read()
+    # 只解析到最后一个完整行，正在写入的半行留到下次
+    end = data.rfind(b'\n') + 1
+    if events is None:
+        events = parse_events(io.BytesIO(data[:end])) if end else empty_events()
+    elif end:
+        events = concat_events(events, parse_events(io.BytesIO(data[:end]), header=False))
+    if use_cache and end:
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'wb') as cache_file:
+            pickle.dump({'version': CACHE_VERSION, 'head': head[:256], 'offset': offset + end, 'events': events},
+                        cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    if since is not None:
+        events = events[events['time'] >= since]
+    return events
+
+
+def load_pending(store):
+    """载入当前待删除列表（pending_deletes）"""
+    data = store.load('pending_deletes', [])
+    return pd.DataFrame({
+        'workspace': pd.Categorical([record.get('workspace', 'default') for record in data]),
+        'channel': pd.Categorical([record['channel'] for record in data]),
+        'send_time': np.fromiter((record['send_time'] for record in data), dtype='float64', count=len(data)),
+    })
+
+
+def local_day(seconds):
+    """时间戳数组转为本地日序号（按当前时区偏移整除，不逐行解析日期）"""
+    offset = time.localtime().tm_gmtoff
+    return (seconds.astype('int64') + offset) // 86400
+
+
+def day_index(first, count):
+    """连续 count 天的日期索引"""
+    return pd.Index(pd.to_datetime(np.arange(first, first + count) * 86400, unit='s').date, name='day')
+
+
+def column(events, name):
+    return events[name].to_numpy()
+
+
+def is_event(events, name):
+    """事件类型掩码：比较 category 编码，不展开成字符串"""
+    categories = events['event'].cat.categories
+    if name not in categories:
+        return np.zeros(len(events), dtype=bool)
+    return events['event'].cat.codes.to_numpy() == categories.get_loc(name)
+
+
+def posts_per_channel_day(events):
+    """每个频道每天成功发送的消息数：按 (日, 频道编码) 计数，不复制整张表"""
+    mask = is_event(events, 'post')
+    if not mask.any():
+        return pd.DataFrame(index=day_index(0, 0))
+    days = local_day(column(events, 'time')[mask])
+    codes = events['channel'].cat.codes.to_numpy()[mask].astype('int64')
+    channels = events['channel'].cat.categories
+    first, count = days.min(), days.max() - days.min() + 1
+    counts = np.bincount((days - first) * len(channels) + codes, minlength=count * len(channels))
+    table = pd.DataFrame(counts.reshape(count, len(channels)), index=day_index(first, count), columns=channels)
+    table.columns.name = 'channel'
+    return table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
+
+
+def time_to_delete(events):
+    """删除耗时（小时）的分位数和分布，以及超过时限的比例"""
+    sent = column(events, 'sent')
+    mask = is_event(events, 'delete') & ~np.isnan(sent)
+    hours = (column(events, 'time')[mask] - sent[mask]) / 3600
+    labels = ['p50', 'p90', 'p99', 'max']
+    values = np.quantile(hours, [0.5, 0.9, 0.99, 1.0]) if len(hours) else [np.nan] * 4
+    summary = pd.Series(values, index=labels)
+    summary['count'] = len(hours)
+    limit_hours = Config.DELETE_AFTER_SECONDS / 3600
+    summary['late_ratio'] = float((hours > limit_hours + 1).mean()) if len(hours) else np.nan
+    bins = [0] + [limit_hours + extra for extra in OVERDUE_HOURS_BINS] + [np.inf]
+    counts, _ = np.histogram(hours, bins)
+    histogram = pd.Series(counts, index=[f"[{low:g}, {high:g})" for low, high in zip(bins[:-1], bins[1:])])
+    return summary.round(3), histogram
+
+
+def overdue_deletions(pending, now=None, grace=3600):
+    """已超过删除时限（再加 grace 秒）仍在待删除列表中的消息，按工作区和频道汇总"""
+    now = now or time.time()
+    age = now - pending['send_time']
+    overdue = pending[age > Config.DELETE_AFTER_SECONDS + grace]
+    overdue_hours = (now - overdue['send_time']) / 3600
+    table = overdue.assign(overdue_hours=overdue_hours - Config.DELETE_AFTER_SECONDS / 3600).groupby(
+        ['workspace', 'channel'], observed=True)['overdue_hours'].agg(['count', 'max', 'median'])
+    return table.round(2).sort_values('count', ascending=False)
+
+
+def failure_rates(events):
+    """按操作和错误码统计失败次数及失败率"""
+    counts = events['event'].value_counts()
+    rows = []
+    for action in ('post', 'delete'):
+        attempts = int(counts.get(action, 0) + counts.get(f'{action}_failed', 0))
+        mask = is_event(events, f'{action}_failed')
+        if not mask.any():
+            continue
+        errors = events['error'].cat.codes.to_numpy()[mask]
+        for code, failures in enumerate(np.bincount(errors[errors >= 0], minlength=len(events['error'].cat.categories))):
+            if failures:
+                rows.append((action, events['error'].cat.categories[code], int(failures), attempts))
+    table = pd.DataFrame(rows, columns=['action', 'error', 'failures', 'attempts']).set_index(['action', 'error'])
+    table['rate'] = (table['failures'] / table['attempts']).round(4)
+    return table.sort_values('failures', ascending=False)
+
+
+def backlog_growth(events, pending_now=None):
+    """每天新增的待删除消息（会过期的发送）、删除数和积压变化；给出当前积压时倒推每天结束时的积压"""
+    times = column(events, 'time')
+    added = local_day(times[is_event(events, 'post') & (column(events, 'expire') == 1)])
+    removed = local_day(times[is_event(events, 'delete')])
+    if not len(added) and not len(removed):
+        return pd.DataFrame(columns=['added', 'deleted', 'net'], index=day_index(0, 0))
+    first = min(days.min() for days in (added, removed) if len(days))
+    last = max(days.max() for days in (added, removed) if len(days))
+    count = last - first + 1
+    table = pd.DataFrame({
+        'added': np.bincount(added - first, minlength=count),
+        'deleted': np.bincount(removed - first, minlength=count),
+    }, index=day_index(first, count))
+    table['net'] = table['added'] - table['deleted']
+    if pending_now is not None:
+        # 最后一天结束时的积压等于当前积压，向前依次减去之后各天的净增
+        table['backlog'] = pending_now - table['net'][::-1].cumsum()[::-1] + table['net']
+    else:
+        table['backlog_change'] = table['net'].cumsum()
+    return table
+
+
+def build_report(events, pending):
+    """计算全部报表，返回 名称 -> DataFrame"""
+    delete_summary, delete_histogram = time_to_delete(events)
+    return {
+        'posts_per_channel_day': posts_per_channel_day(events),
+        'time_to_delete_hours': delete_summary.to_frame('value'),
+        'time_to_delete_histogram': delete_histogram.to_frame('messages'),
+        'overdue_deletions': overdue_deletions(pending),
+        'failure_rates': failure_rates(events),
+        'backlog_growth': backlog_growth(events, len(pending)),
+    }
+
+
+TITLES = {
+    'posts_per_channel_day': "📅 每个频道每天的发送量",
+    'time_to_delete_hours': "⏳ 删除耗时（小时）",
+    'time_to_delete_histogram': "📊 删除耗时分布（小时）",
+    'overdue_deletions': "⚠️  逾期未删除（超过时限的小时数）",
+    'failure_rates': "❌ 按错误码的失败率",
+    'backlog_growth': "📈 待删除积压变化",
+}
+
+
+def main():
+    """主函数"""
+    Config.load()
+    parser = argparse.ArgumentParser(description="发送与删除统计报表")
+    parser.add_argument('--log', default=Config.DELIVERY_LOG, help="发送与删除历史文件")
+    parser.add_argument('--days', type=int, help="只统计最近 N 天")
+    parser.add_argument('--csv', metavar='DIR', help="把各报表导出为 CSV 文件到该目录")
+    parser.add_argument('--no-cache', action='store_true', help="不使用解析缓存，重新解析整个日志")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    since = time.time() - args.days * 86400 if args.days else None
+    events = load_events(args.log, since, use_cache=not args.no_cache)
+    pending = load_pending(get_state_store())
+    loaded = time.perf_counter()
+    report = build_report(events, pending)
+    computed = time.perf_counter()
+
+    if args.csv:
+        os.makedirs(args.csv, exist_ok=True)
+        for name, table in report.items():
+            table.to_csv(os.path.join(args.csv, f"{name}.csv"))
+        print(f"💾 报表已导出到 {args.csv}")
+    else:
+        with pd.option_context('display.max_rows', 60, 'display.max_columns', 20, 'display.width', 160):
+            for name, table in report.items():
+                print(f"\n{TITLES[name]}")
+                print(table.to_string() if len(table) else "（无数据）")
+    print(f"\n⏱️  {len(events)} 条事件、{len(pending)} 条待删除：载入 {loaded - start:.2f} 秒，"
+          f"计算 {computed - loaded:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Telegram 频道直连抓取
+通过 Bot API 长轮询 getUpdates 获取频道消息，转换成与 feedparser 相同的条目格式，绕过 rsshub
+"""
+
+import html
+import json
+import time
+from datetime import datetime
+import requests
+from feedparser import FeedParserDict
+
+# Telegram 实体类型对应的 HTML 标签
+ENTITY_TAGS = {
+    'bold': ('<b>', '</b>'),
+    'italic': ('<i>', '</i>'),
+    'code': ('<code>', '</code>'),
+    'pre': ('<pre>', '</pre>'),
+}
+
+
+def _utf16_slice(encoded, start, end):
+    """按 UTF-16 偏移截取文本（Telegram 实体偏移以 UTF-16 码元计）"""
+    return encoded[start * 2:end * 2].decode('utf-16-le')
+
+
+def _escape(text):
+    """转义HTML并把换行转成 <br>，与 rsshub 输出保持一致"""
+    return html.escape(text, quote=False).replace('\n', '<br>')
+
+
+def message_to_html(text, entities):
+    """把 Telegram 文本和实体转换为 HTML"""
+    encoded = text.encode('utf-16-le')
+    length = len(encoded) // 2
+
+    # 按位置生成开闭标签事件，Telegram 的实体保证正确嵌套
+    opens = {}
+    closes = {}
+    for index, entity in enumerate(sorted(entities or [], key=lambda e: (e['offset'], -e['length']))):
+        start = entity['offset']
+        end = start + entity['length']
+        if entity['type'] == 'text_link':
+            tags = (f'<a href="{html.escape(entity["url"])}">', '</a>')
+        elif entity['type'] == 'url':
+            url = _utf16_slice(encoded, start, end)
+            tags = (f'<a href="{html.escape(url)}">', '</a>')
+        elif entity['type'] in ENTITY_TAGS:
+            tags = ENTITY_TAGS[entity['type']]
+        else:
+            continue
+        opens.setdefault(start, []).append(tags[0])
+        closes.setdefault(end, []).insert(0, tags[1])
+
+    parts = []
+    boundaries = sorted({0, length, *opens, *closes})
+    for pos, next_pos in zip(boundaries, boundaries[1:] + [None]):
+        parts.extend(closes.get(pos, []))
+        parts.extend(opens.get(pos, []))
+        if next_pos is not None:
+            parts.append(_escape(_utf16_slice(encoded, pos, next_pos)))
+    return ''.join(parts)
+
+
+def message_to_entry(message):
+    """把频道消息转换成 feedparser 条目（title/summary/link/id/published）"""
+    text = message.get('text') or message.get('caption') or ''
+    entities = message.get('entities') or message.get('caption_entities') or []
+    chat = message['chat']
+
+    title = next((line.strip() for line in text.splitlines() if line.strip()), '')[:100]
+    if chat.get('username'):
+        link = f"https://t.me/{chat['username']}/{message['message_id']}"
+    else:
+        link = f"https://t.me/c/{str(chat['id']).removeprefix('-100')}/{message['message_id']}"
+    published = datetime.fromtimestamp(message.get('edit_date') or message['date'])
+
+    return FeedParserDict({
+        'title': title,
+        'summary': message_to_html(text, entities),
+        'link': link,
+        'id': link,
+        'published': published.strftime('%a, %d %b %Y %H:%M:%S'),
+        'published_parsed': published.timetuple(),
+    })
+
+
+class TelegramChannelSource:
+    """Telegram Bot API 频道消息源"""
+
+    def __init__(self, token, chat_id, store, api_base='https://api.telegram.org', poll_timeout=30):
+        self.api_url = f"{api_base.rstrip('/')}/bot{token}"
+        self.chat_id = str(chat_id) if chat_id else None
+        self.store = store
+        self.poll_timeout = poll_timeout
+        self.session = requests.Session()
+        self.offset = self.load_offset()
+        # 已取到、但还没有确认处理完成的下一个 update_id
+        self.pending_offset = None
+
+    def load_offset(self):
+        """加载上次确认的 update_id"""
+        return self.store.load('telegram_offset', {}).get('offset')
+
+    def save_offset(self):
+        """保存 update_id，下次从这里继续"""
+        self.store.save('telegram_offset', {'offset': self.offset})
+        self.store.flush()
+
+    def is_target_chat(self, chat):
+        """判断消息是否来自配置的频道（支持数字ID或@用户名）"""
+        if not self.chat_id:
+            return True
+        return self.chat_id in (str(chat['id']), f"@{chat.get('username')}")
+
+    def get_updates(self, timeout=None):
+        """长轮询一次 getUpdates，返回频道消息转换后的条目。
+        offset 只在 confirm() 后前进：处理失败或进程退出时，下次轮询 Telegram 会重新返回这一批"""
+        timeout = self.poll_timeout if timeout is None else timeout
+        params = {
+            'timeout': timeout,
+            'allowed_updates': json.dumps(['channel_post', 'edited_channel_post']),
+        }
+        if self.offset is not None:
+            params['offset'] = self.offset
+
+        response = self.session.get(f"{self.api_url}/getUpdates", params=params, timeout=timeout + 10)
+        data = response.json()
+        if not data.get('ok'):
+            raise RuntimeError(f"getUpdates 失败: {data.get('description', response.status_code)}")
+
+        entries = []
+        for update in data['result']:
+            self.pending_offset = update['update_id'] + 1
+            message = update.get('channel_post') or update.get('edited_channel_post')
+            if message and self.is_target_chat(message['chat']):
+                entries.append(message_to_entry(message))
+        return entries
+
+    def confirm(self):
+        """上一批条目处理完成后确认，保存 offset"""
+        if self.pending_offset is None:
+            return
+        self.offset, self.pending_offset = self.pending_offset, None
+        self.save_offset()
+
+    def poll_forever(self, handler, stop_event=None):
+        """持续长轮询，每批新消息交给 handler 处理；handler 抛出异常或返回 False 时不确认，稍后重新拉取这一批"""
+        while not (stop_event and stop_event.is_set()):
+            try:
+                entries = self.get_updates()
+            except Exception as e:
+                print(f"❌ Telegram 轮询失败: {e}")
+                time.sleep(5)
+                continue
+            try:
+                ok = handler(entries) if entries else True
+            except Exception as e:
+                print(f"❌ Telegram 消息处理失败，稍后重新拉取: {e}")
+                ok = False
+            if ok is False:
+                self.pending_offset = None
+                time.sleep(5)
+                continue
+            self.confirm()
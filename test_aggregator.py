@@ -0,0 +1,93 @@
+"""窗口聚合测试：汇总消息发送失败时窗口放回聚合器，之后重试，不丢失条目"""
+
+import pytest
+from feedparser import FeedParserDict
+from slack_sdk.errors import SlackApiError
+
+from aggregator import DigestAggregator
+from resilience import CircuitOpen
+
+WORKSPACES = {
+    'feeds': {'default': '/telegram/channel/SoSoValue_CN'},
+    'workspaces': [{'name': 'main', 'token': 'xoxb-main', 'routes': {'default': ['C1']}}],
+}
+
+
+def make_entry(number, text):
+    return FeedParserDict({
+        'title': f"每日加密热点新闻榜单｜2025/6/{number}",
+        'summary': f"1/ {text} – <a href=\"https://x.com/{number}\">source</a>",
+        'link': f"https://t.me/SoSoValue_CN/{number}",
+        'id': f"https://t.me/SoSoValue_CN/{number}",
+    })
+
+
+@pytest.fixture
+def bot(make_bot):
+    return make_bot(WORKSPACES, AGGREGATE_WINDOW_SECONDS=60)
+
+
+def add(bot, number, text):
+    entry = make_entry(number, text)
+    workspace = bot.workspaces.get('main')
+    return bot.aggregate('default', entry, bot.format_message_for_channel_a(entry), 'C1', workspace)
+
+
+@pytest.mark.parametrize('error', [
+    SlackApiError('ratelimited', {'ok': False, 'error': 'ratelimited'}),
+    OSError('connection reset'),
+    CircuitOpen('slack:main'),
+])
+def test_failed_digest_is_restored_and_retried(bot, error):
+    assert add(bot, 1, '比特币突破十万美元')
+    assert add(bot, 2, '以太坊现货ETF获批')
+    bot.fake_slack.fail['chat_postMessage'] = error
+    bot.flush_digests(force=True)
+
+    assert bot.fake_slack.posts() == []
+    (window,) = bot.aggregator.windows.values()
+    assert len(window.entries) == 2 and window.attempts == 1
+    # 未发送的条目仍在窗口中，再次抓取到时不会重复加入
+    assert not add(bot, 1, '比特币突破十万美元')
+
+    # 期间新到的条目并入放回的窗口
+    assert add(bot, 3, '美联储宣布降息')
+    del bot.fake_slack.fail['chat_postMessage']
+    window.opened -= 60  # 放回的窗口保留原来的开启时间，到期后按正常流程重试
+    bot.flush_digests()
+    (post,) = bot.fake_slack.posts()
+    assert bot.aggregator.windows == {}
+    message = post['blocks'][2]['text']['text']
+    assert all(text in message for text in ('比特币突破十万美元', '以太坊现货ETF获批', '美联储宣布降息'))
+    index = bot.load_message_index()
+    assert set(index) == {f"https://t.me/SoSoValue_CN/{n}" for n in (1, 2, 3)}
+    assert len({channels['C1']['ts'] for channels in index.values()}) == 1
+
+
+def test_window_is_dropped_after_repeated_failures(bot, monkeypatch):
+    monkeypatch.setattr('rss_to_slack.MAX_DIGEST_ATTEMPTS', 2)
+    add(bot, 1, '比特币突破十万美元')
+    bot.fake_slack.fail['chat_postMessage'] = OSError('down')
+    bot.flush_digests(force=True)
+    assert len(bot.aggregator.windows) == 1
+    bot.flush_digests(force=True)
+    assert bot.aggregator.windows == {}
+    assert bot.load_message_index() == {}
+
+
+def test_restore_merges_newer_window():
+    aggregator = DigestAggregator(60)
+
+    class Workspace:
+        name = 'main'
+
+    workspace = Workspace()
+    aggregator.add('a', 'e1', make_entry(1, 'x'), [], 'old', 'h1', workspace, 'C1')
+    (window,) = aggregator.pop_due(force=True)
+    aggregator.add('b', 'e1', make_entry(1, 'x'), [], 'new', 'h2', workspace, 'C1')
+    aggregator.add('a', 'e2', make_entry(2, 'y'), [], 'other', 'h3', workspace, 'C1')
+    aggregator.restore(window)
+    # 分组键包含订阅源：b 的窗口是另一个窗口，a 的新条目并入放回的窗口
+    restored = aggregator.windows[window.key]
+    assert restored is window and set(restored.entries) == {'e1', 'e2'}
+    assert len(aggregator.windows) == 2
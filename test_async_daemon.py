@@ -0,0 +1,108 @@
+"""异步守护进程测试：退出时发完所有推送队列（包括退出过程中才入队的内容），并等待后台的聚合发送结束"""
+
+import asyncio
+import os
+import signal
+import threading
+import time
+
+from async_daemon import AsyncDaemon
+
+
+class Workspace:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeBot:
+    """只实现守护进程用到的接口：每轮抓取把 items 交给推送队列，记录推送和聚合发送的顺序"""
+
+    def __init__(self, items):
+        self.items = items
+        self.delivered = []
+        self.events = []
+        self.delivery_queue = None
+        self.scheduled_time = None
+        self.aggregator = True
+        self.coordinator = None
+        self.state_store = self
+        self.config_watcher = self
+        self.daemon = None
+        self.lock = threading.Lock()
+
+    def fetch_and_process(self):
+        for item in self.items:
+            self.delivery_queue.put(*item)
+
+    def deliver_or_defer(self, entry, content, channel, workspace, feed=None):
+        time.sleep(0.01)
+        with self.lock:
+            self.delivered.append(entry)
+        if entry == 'a-last':
+            # 模拟推送过程中其他线程（Telegram 监听等）在退出时才交来的内容
+            self.daemon.put('late', 'content', 'C1', Workspace('late'))
+        return True
+
+    def flush_digests(self, force=False):
+        time.sleep(0.2)
+        self.events.append('forced flush' if force else 'flush')
+
+    def schedule_fetches(self):
+        pass
+
+    def retry_deferred(self):
+        pass
+
+    def delete_expired_messages(self):
+        pass
+
+    def flush(self):
+        self.events.append('state flush')
+
+    def start_config_watcher(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def test_shutdown_drains_queues_and_waits_for_flush(monkeypatch):
+    monkeypatch.setattr('config.Config.INGEST_MODE', 'rss')
+    items = [(f"a-{i}", 'content', 'C1', Workspace('a')) for i in range(10)]
+    items += [('a-last', 'content', 'C1', Workspace('a'))]
+    items += [(f"b-{i}", 'content', 'C2', Workspace('b')) for i in range(10)]
+    bot = FakeBot(items)
+    daemon = bot.daemon = AsyncDaemon(bot, tick_seconds=0.05, reap_seconds=60)
+
+    # 抓取一轮、启动后台聚合发送后立即收到 SIGTERM
+    threading.Timer(0.1, os.kill, (os.getpid(), signal.SIGTERM)).start()
+    asyncio.run(daemon.main())
+
+    assert sorted(bot.delivered) == sorted([item[0] for item in items] + ['late'])
+    assert [entry for entry in bot.delivered if entry.startswith('a-')] == [item[0] for item in items[:11]]
+    assert daemon.flush_future is not None and daemon.flush_future.done()
+    # 后台聚合发送完成后才做最后一次强制发送，之后写回状态
+    flushes = [event for event in bot.events if event != 'state flush']
+    assert flushes == ['flush', 'forced flush'] and bot.events[-1] == 'state flush'
+    assert all(queue.empty() for queue in daemon.queues.values())
+
+
+def test_drain_restarts_consumer_for_items_enqueued_after_it_exited():
+    async def scenario():
+        bot = FakeBot([])
+        daemon = bot.daemon = AsyncDaemon(bot)
+        daemon.loop = asyncio.get_running_loop()
+        daemon.stop_event = asyncio.Event()
+        daemon.enqueue(('a-1', 'content', 'C1', Workspace('a')))
+        daemon.stop_event.set()
+        await daemon.consumers['a']
+        assert bot.delivered == ['a-1']
+
+        # 推送任务已经退出，再入队时重新创建
+        daemon.put('a-2', 'content', 'C1', Workspace('a'))
+        await daemon.drain()
+        assert bot.delivered == ['a-1', 'a-2']
+        for executor in daemon.executors.values():
+            executor.shutdown()
+
+    asyncio.run(scenario())
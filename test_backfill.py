@@ -0,0 +1,87 @@
+"""历史回填测试：推送中途出错时不中断整个回填，断点和汇总照常写入，重新运行只补推未完成的部分；
+回填的消息记在所回填的订阅源名下"""
+
+from datetime import date
+
+from feedparser import FeedParserDict
+
+import sent_ledger
+from backfill import Backfill
+from config import Config
+
+WORKSPACES = {
+    'feeds': {'default': '/telegram/channel/SoSoValue_CN'},
+    'workspaces': [{'name': 'main', 'token': 'xoxb-main', 'routes': {'default': ['C1', 'C2']}}],
+}
+
+
+def make_entries(days):
+    return [FeedParserDict({
+        'title': f"每日加密热点新闻榜单｜2025/6/{day}",
+        'summary': f"{day}/ 第{day}天的新闻 – <a href=\"https://x.com/{day}\">source</a>",
+        'link': f"https://t.me/SoSoValue_CN/{day}",
+        'id': f"https://t.me/SoSoValue_CN/{day}",
+    }) for day in days]
+
+
+def posted(bot):
+    return sorted((post['channel'], post['text']) for post in bot.fake_slack.posts())
+
+
+def test_failures_partway_still_write_checkpoint_and_summary(make_bot):
+    bot = make_bot(WORKSPACES)
+    calls = []
+
+    def fail_after_three(kwargs):
+        calls.append(kwargs)
+        return OSError('connection reset') if len(calls) > 3 else None
+
+    bot.fake_slack.fail['chat_postMessage'] = fail_after_three
+    backfill = Backfill(bot, date(2025, 6, 1), date(2025, 6, 30), checkpoint_every=1)
+    summary = backfill.run(make_entries(range(1, 7)))
+
+    assert summary is not None
+    assert summary['entries'] == 6 and summary['channels'] == 2
+    assert summary['delivered'] == 3
+    # 网络错误和随后的熔断都记为失败，而不是让整个回填中断
+    assert summary['failed'] == 12 - 3
+    assert summary['aborted_channels'] == 0
+
+    checkpoint = bot.state_store.load(backfill.checkpoint_name, {})
+    assert len(checkpoint['done']) == 3
+    assert backfill.progress.errors.keys() >= {'OSError'}
+
+    # 重新运行：已完成的条目跳过，其余补推，每个条目在每个频道只推送一次
+    retry_bot = make_bot(WORKSPACES)
+    retry = Backfill(retry_bot, date(2025, 6, 1), date(2025, 6, 30))
+    summary = retry.run(make_entries(range(1, 7)))
+    assert summary['delivered'] == 9 and summary['failed'] == 0 and summary['skipped'] == 3
+    delivered = posted(bot) + posted(retry_bot)
+    assert len(delivered) == len(set(delivered)) == 12
+
+
+def test_unexpected_error_in_one_channel_keeps_others_and_checkpoint(make_bot):
+    bot = make_bot(WORKSPACES)
+    bot.fake_slack.fail['chat_postMessage'] = lambda kwargs: KeyError('boom') if kwargs['channel'] == 'C2' else None
+    backfill = Backfill(bot, date(2025, 6, 1), date(2025, 6, 30))
+    summary = backfill.run(make_entries(range(1, 4)))
+
+    assert summary['aborted_channels'] == 1
+    assert summary['delivered'] == 3
+    assert {channel for channel, _ in posted(bot)} == {'C1'}
+    done = bot.state_store.load(backfill.checkpoint_name, {})['done']
+    assert len(done) == 3 and all(mark.endswith('|C1') for mark in done)
+
+
+def test_messages_are_attributed_to_backfilled_feed(make_bot, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SENT_LEDGER_DB', str(tmp_path / 'sent_ledger.db'))
+    monkeypatch.setattr(sent_ledger, '_ledger', None)
+    workspaces = {
+        'feeds': {'default': '/telegram/channel/SoSoValue_CN', 'other': '/telegram/channel/other'},
+        'workspaces': [{'name': 'main', 'token': 'xoxb-main', 'routes': {'default': ['C1'], 'other': ['C9']}}],
+    }
+    bot = make_bot(workspaces)
+    summary = Backfill(bot, date(2025, 6, 1), date(2025, 6, 30), feed_name='other').run(make_entries(range(1, 3)))
+    assert summary['delivered'] == 2
+    rows = sent_ledger.get_sent_ledger().messages()
+    assert [(row['channel'], row['feed']) for row in rows] == [('C9', 'other'), ('C9', 'other')]
@@ -0,0 +1,87 @@
+"""频道历史镜像测试：增量同步从上次同步到的 ts 继续，多次同步不产生重复，编辑和删除反映到本地"""
+
+import pytest
+
+from channel_history import ChannelHistory
+
+
+class HistorySlack:
+    """按 ts 排列的频道历史，conversations_history 按 oldest 过滤并分页"""
+
+    def __init__(self, page_size=2):
+        self.channels = {}
+        self.page_size = page_size
+        self.requests = []
+
+    def post(self, channel, ts, text, user='U1', bot_id=None):
+        self.channels.setdefault(channel, {})[ts] = {'ts': ts, 'text': text, 'user': user, 'bot_id': bot_id}
+
+    def conversations_history(self, channel, limit, oldest=None, cursor=None):
+        self.requests.append({'oldest': oldest, 'cursor': cursor})
+        messages = sorted((message for ts, message in self.channels.get(channel, {}).items()
+                           if oldest is None or float(ts) > float(oldest)),
+                          key=lambda message: float(message['ts']), reverse=True)
+        start = int(cursor or 0)
+        page = messages[start:start + self.page_size]
+        more = start + self.page_size < len(messages)
+        return {'messages': [dict(message) for message in page], 'has_more': more,
+                'response_metadata': {'next_cursor': str(start + self.page_size) if more else ''}}
+
+
+@pytest.fixture
+def slack():
+    slack = HistorySlack()
+    for index in range(1, 6):
+        slack.post('C1', f"{index}.000100", f"消息{index}")
+    return slack
+
+
+@pytest.fixture
+def history(slack, tmp_path):
+    return ChannelHistory(slack, str(tmp_path / 'channel_history.db'))
+
+
+def texts(history, **filters):
+    return [message['text'] for message in history.messages('C1', **filters)]
+
+
+def test_incremental_sync_resumes_from_stored_cursor(slack, history, tmp_path):
+    assert history.sync('C1') == 5
+    assert history.latest_ts('C1') == '5.000100'
+    # 分页读完全部历史
+    assert [request['cursor'] for request in slack.requests] == [None, '2', '4']
+
+    slack.post('C1', '6.000100', '消息6')
+    slack.post('C1', '10.000100', '消息10')
+    slack.requests.clear()
+    # 重新打开镜像也从保存的位置继续，只读新增的部分
+    reopened = ChannelHistory(slack, str(tmp_path / 'channel_history.db'))
+    assert reopened.sync('C1') == 2
+    assert slack.requests == [{'oldest': '5.000100', 'cursor': None}]
+    # ts 按数值比较：10.x 比 6.x 新
+    assert reopened.latest_ts('C1') == '10.000100'
+    assert texts(reopened, limit=2) == ['消息10', '消息6']
+
+
+def test_repeated_syncs_do_not_duplicate_messages(slack, history):
+    assert history.sync('C1') == 5
+    assert history.sync('C1') == 0
+    assert history.sync('C1', full=True) == 0
+    assert history.count('C1') == 5
+    assert len(set(texts(history))) == 5
+
+
+def test_edits_and_deletes_are_reflected(slack, history):
+    history.sync('C1')
+    slack.post('C1', '2.000100', '消息2（已编辑）')
+    del slack.channels['C1']['3.000100']
+    assert history.sync('C1', full=True) == 0
+    assert texts(history) == ['消息5', '消息4', '消息2（已编辑）', '消息1']
+    # 已删除的消息保留标记，查询时可以包含
+    deleted = [message for message in history.messages('C1', include_deleted=True) if message['deleted_at']]
+    assert [message['text'] for message in deleted] == ['消息3']
+
+    # 删除工具删除的消息直接标记，不等下一次同步
+    history.mark_deleted('C1', '5.000100')
+    assert history.count('C1') == 3
+    assert history.count('C1', include_deleted=True) == 5
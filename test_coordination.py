@@ -0,0 +1,153 @@
+"""多副本协调测试：多个本地进程共用一个 SQLite 文件，检查每个订阅源只推送一次、副本退出后租约转移和哈希环重新分配"""
+
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from coordination import Coordinator, HashRing
+
+FEEDS = [f"feed{i}" for i in range(40)]
+LEASE_SECONDS = 1.5
+
+
+def replica(db_path, worker_id, commands, replies):
+    """副本进程：后台线程持续心跳，收到 run 命令时对所有订阅源执行一轮，把负责的订阅源写入 posts 表"""
+    coordinator = Coordinator(db_path, worker_id, lease_seconds=LEASE_SECONDS)
+    stop = threading.Event()
+
+    def beat():
+        heartbeat = Coordinator(db_path, worker_id, lease_seconds=LEASE_SECONDS)
+        while not stop.wait(0.2):
+            heartbeat.heartbeat()
+
+    threading.Thread(target=beat, daemon=True).start()
+    replies.put((worker_id, 'ready', None))
+    while True:
+        command, round_id = commands.get()
+        if command == 'exit':
+            stop.set()
+            coordinator.leave()
+            replies.put((worker_id, 'left', None))
+            return
+        handled = [feed for feed in FEEDS if coordinator.should_handle(feed)]
+        with sqlite3.connect(db_path, timeout=30) as conn:
+            conn.executemany("INSERT INTO posts (round, feed, worker) VALUES (?, ?, ?)",
+                             [(round_id, feed, worker_id) for feed in handled])
+        replies.put((worker_id, 'done', handled))
+
+
+class Cluster:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.context = multiprocessing.get_context('spawn')
+        self.replies = self.context.Queue()
+        self.processes = {}
+        self.commands = {}
+        self.round = 0
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE posts (round INTEGER, feed TEXT, worker TEXT)")
+
+    def start(self, worker_id):
+        commands = self.context.Queue()
+        process = self.context.Process(target=replica, args=(self.db_path, worker_id, commands, self.replies))
+        process.start()
+        self.processes[worker_id] = process
+        self.commands[worker_id] = commands
+        assert self.replies.get(timeout=30) == (worker_id, 'ready', None)
+
+    def kill(self, worker_id):
+        """不注销、不释放租约，模拟进程崩溃"""
+        process = self.processes.pop(worker_id)
+        self.commands.pop(worker_id)
+        process.kill()
+        process.join()
+
+    def run_round(self):
+        """所有存活副本同时执行一轮，返回 订阅源 -> [推送的副本]"""
+        self.round += 1
+        for commands in self.commands.values():
+            commands.put(('run', self.round))
+        for _ in self.commands:
+            assert self.replies.get(timeout=30)[1] == 'done'
+        posts = {}
+        with sqlite3.connect(self.db_path) as conn:
+            for feed, worker in conn.execute("SELECT feed, worker FROM posts WHERE round = ?", (self.round,)):
+                posts.setdefault(feed, []).append(worker)
+        return posts
+
+    def close(self):
+        for worker_id, commands in self.commands.items():
+            commands.put(('exit', None))
+        for process in self.processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    cluster = Cluster(str(tmp_path / 'coordination.db'))
+    yield cluster
+    cluster.close()
+
+
+def assert_exactly_once(posts, feeds=FEEDS):
+    assert sorted(posts) == sorted(feeds)
+    assert all(len(workers) == 1 for workers in posts.values()), posts
+
+
+def test_replicas_post_each_feed_once_and_fail_over(cluster):
+    for worker_id in ('r1', 'r2', 'r3'):
+        cluster.start(worker_id)
+
+    # 三个副本同时运行：每个订阅源只由一个副本推送，且归属与一致性哈希一致
+    posts = cluster.run_round()
+    assert_exactly_once(posts)
+    ring = HashRing(['r1', 'r2', 'r3'])
+    assert {feed: workers[0] for feed, workers in posts.items()} == {feed: ring.node_for(feed) for feed in FEEDS}
+    assert {workers[0] for workers in posts.values()} == {'r1', 'r2', 'r3'}
+    # 同样的成员再运行一轮，归属不变
+    assert cluster.run_round() == posts
+
+    # r2 崩溃：心跳和租约过期前，其他副本不会接管它的订阅源（不会重复推送）
+    orphaned = {feed for feed, workers in posts.items() if workers == ['r2']}
+    cluster.kill('r2')
+    posts = cluster.run_round()
+    assert set(posts) == set(FEEDS) - orphaned
+    assert all(len(workers) == 1 for workers in posts.values())
+
+    # 过期后 r2 的订阅源转移到其他副本，原本属于 r1、r3 的订阅源归属不变
+    time.sleep(LEASE_SECONDS + 0.5)
+    after_failover = cluster.run_round()
+    assert_exactly_once(after_failover)
+    assert {workers[0] for feed, workers in after_failover.items() if feed in orphaned} <= {'r1', 'r3'}
+    assert all(after_failover[feed] == workers for feed, workers in posts.items())
+
+
+def test_hash_ring_rebalances_when_replica_joins(cluster):
+    cluster.start('r1')
+    cluster.start('r2')
+    before = {feed: workers[0] for feed, workers in cluster.run_round().items()}
+
+    # 新副本加入：只有哈希到新副本的订阅源会移动，原持有者的租约过期前两边都不推送这些订阅源
+    cluster.start('r3')
+    moved = {feed for feed in FEEDS if HashRing(['r1', 'r2', 'r3']).node_for(feed) == 'r3'}
+    assert moved and len(moved) < len(FEEDS)
+    during = cluster.run_round()
+    assert all(len(workers) == 1 for workers in during.values())
+    assert {feed: workers[0] for feed, workers in during.items() if feed not in moved} == \
+        {feed: owner for feed, owner in before.items() if feed not in moved}
+
+    time.sleep(LEASE_SECONDS + 0.5)
+    after = cluster.run_round()
+    assert_exactly_once(after)
+    assert {feed for feed, workers in after.items() if workers == ['r3']} == moved
+
+    # 正常退出时立即释放租约和成员资格，剩下的副本下一轮就接管
+    cluster.commands.pop('r3').put(('exit', None))
+    assert cluster.replies.get(timeout=30) == ('r3', 'left', None)
+    cluster.processes.pop('r3').join(timeout=30)
+    assert {feed: workers[0] for feed, workers in cluster.run_round().items()} == before
@@ -0,0 +1,88 @@
+"""配置热加载测试：配置未变的工作区和投递目标沿用原对象，只替换变化的部分，聚合窗口按名称使用新配置"""
+
+import json
+
+import pytest
+from feedparser import FeedParserDict
+
+from config import Config
+
+RELOADED = ('SLACK_CHANNEL_A', 'SLACK_CHANNEL_B', 'SLACK_TARGET_CHANNEL', 'WORKSPACES_FILE', 'SLACK_WEBHOOK_URL',
+            'RSS_FEED_PATH', 'CONTENT_FILTER_KEYWORDS', 'SCHEDULE_TIME')
+
+
+def make_config(tmp_path, rate_b=1000, routes_a=('C1',)):
+    return {
+        'feeds': {'default': '/telegram/channel/SoSoValue_CN'},
+        'workspaces': [
+            {'name': 'a', 'token': 'xoxb-a', 'rate_per_second': 1000, 'routes': {'default': list(routes_a)}},
+            {'name': 'b', 'token': 'xoxb-b', 'rate_per_second': rate_b, 'routes': {'default': ['C2']}},
+        ],
+        'sinks': [{'type': 'jsonl', 'name': 'archive', 'path': str(tmp_path / 'archive.jsonl')}],
+    }
+
+
+@pytest.fixture
+def bot(make_bot, tmp_path, monkeypatch):
+    for key in RELOADED:
+        monkeypatch.setattr(Config, key, getattr(Config, key))
+    bot = make_bot(make_config(tmp_path), AGGREGATE_WINDOW_SECONDS=60)
+    monkeypatch.setenv('WORKSPACES_FILE', Config.WORKSPACES_FILE)
+    return bot
+
+
+def rewrite(bot, config):
+    with open(Config.WORKSPACES_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    bot.reload_config()
+    for workspace in bot.workspaces.workspaces.values():
+        workspace.client = bot.fake_slack
+
+
+def test_unchanged_workspaces_and_sinks_are_reused(bot, tmp_path):
+    before = dict(bot.workspaces.workspaces)
+    (sink,) = bot.settings.sinks
+    rewrite(bot, make_config(tmp_path))
+    assert bot.workspaces.workspaces == before
+    assert all(bot.workspaces.get(name) is workspace for name, workspace in before.items())
+    assert bot.settings.sinks == [sink]
+
+    # 只改了 b 的速率：a 仍是原对象，b 重新创建
+    rewrite(bot, make_config(tmp_path, rate_b=5))
+    assert bot.workspaces.get('a') is before['a']
+    assert bot.workspaces.get('b') is not before['b']
+    assert bot.workspaces.get('b').rate_limiter.rate == 5
+    assert bot.settings.sinks[0] is sink
+
+    # 只改了 a 的路由：新对象使用新路由，沿用原来的限流器
+    rewrite(bot, make_config(tmp_path, rate_b=5, routes_a=('C1', 'C3')))
+    a = bot.workspaces.get('a')
+    assert a is not before['a'] and a.rate_limiter is before['a'].rate_limiter
+    assert a.channels_for('default') == ['C1', 'C3']
+    assert before['a'].channels_for('default') == ['C1']
+
+
+def test_changed_sink_is_rebuilt(bot, tmp_path):
+    (sink,) = bot.settings.sinks
+    config = make_config(tmp_path)
+    config['sinks'][0]['path'] = str(tmp_path / 'other.jsonl')
+    rewrite(bot, config)
+    (rebuilt,) = bot.settings.sinks
+    assert rebuilt is not sink and rebuilt.path.endswith('other.jsonl')
+
+
+def test_pending_digest_uses_reloaded_workspace(bot, tmp_path, monkeypatch):
+    entry = FeedParserDict({'title': '每日加密热点新闻榜单｜2025/6/1', 'summary': '1/ 比特币新高',
+                            'link': 'https://t.me/SoSoValue_CN/1', 'id': 'https://t.me/SoSoValue_CN/1'})
+    old = bot.workspaces.get('b')
+    bot.aggregate('default', entry, bot.format_message_for_channel_a(entry), 'C2', old)
+
+    rewrite(bot, make_config(tmp_path, rate_b=5))
+    new = bot.workspaces.get('b')
+    calls = []
+    monkeypatch.setattr(old, 'call', lambda *args, **kwargs: calls.append('old'))
+    bot.flush_digests(force=True)
+    assert calls == []
+    (post,) = bot.fake_slack.posts()
+    assert post['channel'] == 'C2'
+    assert new.rate_limiter.rate == 5
@@ -0,0 +1,55 @@
+"""HTML 转 mrkdwn 测试：基本格式转换、行内截断不切断标记、预格式化文本保留空行、链接地址转义"""
+
+import re
+
+import pytest
+
+from html_mrkdwn import html_to_mrkdwn
+
+# 完整的 Slack 链接 <url> 或 <url|文字>
+LINK = re.compile(r'<[^<>|]+(\|[^<>]*)?>')
+
+
+def test_basic_conversion():
+    html = ('<p>比特币 &amp; 以太坊</p><p>第一行<br>第二行</p>'
+            '<ul><li>一</li><li><b>二</b> <i>三</i></li></ul>'
+            '<ol><li>甲</li><li>乙</li></ol><script>alert(1)</script>'
+            '<a href="https://x.com/1">source</a> <a href="https://x.com/2">https://x.com/2</a>')
+    assert html_to_mrkdwn(html) == (
+        '比特币 &amp; 以太坊\n第一行\n第二行\n• 一\n• *二* _三_\n1. 甲\n2. 乙\n'
+        '<https://x.com/1|source> <https://x.com/2>')
+
+
+def test_line_budget_truncates_on_line_boundary():
+    assert html_to_mrkdwn('<p>aaaa</p><p>bbbb</p><p>cccc</p>', 10) == 'aaaa\nbbbb...'
+
+
+def test_long_link_keeps_url_prefix_and_closing_bracket():
+    text = html_to_mrkdwn('<a href="http://x">' + 'y' * 600 + '</a>', 500)
+    assert text.startswith('<http://x|yyy') and text.endswith('y>...')
+    assert len(text) == 500 + len('...')
+    assert LINK.fullmatch(text[:-3])
+
+
+@pytest.mark.parametrize('limit', [3, 8, 20, 40, 60])
+def test_inline_truncation_never_splits_markup(limit):
+    html = '<b>粗体 &amp; 文字</b> 说明 <a href="https://example.com/a?b=1&c=2">链接文字很长很长</a> 结尾'
+    text = html_to_mrkdwn(html, limit)
+    assert text.endswith('...')
+    body = text[:-3]
+    assert len(body) <= limit
+    # 链接要么完整保留前缀和右尖括号，要么整个省略；转义字符不被切断
+    assert '<' not in LINK.sub('', body) and '>' not in LINK.sub('', body)
+    assert not re.search(r'&[a-z]{0,3}$', body)
+    assert body.count('*') % 2 == 0
+
+
+def test_pre_keeps_blank_lines():
+    assert html_to_mrkdwn('<pre>line1\n\nline3</pre>') == '```line1\n\nline3```'
+    assert html_to_mrkdwn('<p>before</p><pre>a\n\n\nb</pre><p>after</p>') == 'before\n```a\n\n\nb```\nafter'
+
+
+def test_link_url_is_escaped():
+    text = html_to_mrkdwn('<a href="https://x.com/?a=1&amp;b=2|3>4">文字</a>')
+    assert text == '<https://x.com/?a=1&amp;b=2%7C3&gt;4|文字>'
+    assert LINK.fullmatch(text)
@@ -0,0 +1,56 @@
+"""结构化日志测试：缓冲的日志在刷新间隔内写出，不需要后续日志触发"""
+
+import io
+import logging
+import logging.handlers
+import queue
+import time
+
+from log_utils import BufferedStreamHandler, FlushingQueueListener, TextFormatter
+
+
+def make_logger(stream, flush_interval):
+    handler = BufferedStreamHandler(stream, capacity=200, flush_interval=flush_interval)
+    handler.setFormatter(TextFormatter())
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger(f'test_log_utils.{flush_interval}')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    listener = FlushingQueueListener(log_queue, handler)
+    listener.start()
+    return logger, listener
+
+
+def wait_for(stream, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not stream.getvalue():
+        time.sleep(0.01)
+    return stream.getvalue()
+
+
+def test_single_info_record_is_written_within_interval():
+    stream = io.StringIO()
+    logger, listener = make_logger(stream, 0.2)
+    try:
+        logger.info("📡 开始抓取")  # 紧接着的第二条不满足刷新条件，留在缓冲区
+        logger.info("✅ 抓取完成")
+        start = time.monotonic()
+        assert wait_for(stream, 2) == "📡 开始抓取\n✅ 抓取完成\n"
+        assert time.monotonic() - start < 1
+    finally:
+        listener.stop()
+
+
+def test_warning_is_written_immediately_and_stop_flushes():
+    stream = io.StringIO()
+    logger, listener = make_logger(stream, 60)
+    logger.info("📡 开始抓取")
+    logger.warning("⚠️  镜像抓取失败")
+    assert wait_for(stream, 2) == "📡 开始抓取\n⚠️  镜像抓取失败\n"
+    logger.info("✅ 抓取完成")
+    time.sleep(0.1)
+    assert stream.getvalue().count("\n") == 2
+    listener.stop()
+    listener.handler.flush()
+    assert stream.getvalue().endswith("✅ 抓取完成\n")
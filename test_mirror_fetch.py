@@ -0,0 +1,77 @@
+"""流式解压测试：压缩炸弹在字节上限内被拒绝，brotli 只在能限制单次输出时启用"""
+
+import zlib
+
+import pytest
+
+import mirror_fetch
+from mirror_fetch import ResponseTooLarge, StreamDecoder, accept_encoding
+
+BOMB = zlib.compress(b'\0' * (20 * 1024 * 1024), 9)
+
+
+class BoundedDecompressor:
+    """模拟 brotli >= 1.2 的 Decompressor：output_buffer_limit 限制单次输出，未取完的输出留在内部
+    （用 zlib 数据代替 brotli 数据）"""
+
+    outputs = []
+
+    def __init__(self):
+        self.zlib = zlib.decompressobj()
+        self.pending = b''
+
+    def process(self, data, output_buffer_limit=None):
+        assert not (data and self.pending), '有未取出的输出时不能继续输入'
+        self.pending += self.zlib.decompress(data) if data else b''
+        size = len(self.pending) if output_buffer_limit is None else output_buffer_limit
+        output, self.pending = self.pending[:size], self.pending[size:]
+        self.outputs.append(len(output))
+        return output
+
+    def can_accept_more_data(self):
+        return not self.pending
+
+
+class UnboundedDecompressor:
+    """旧版 brotli：process 一次返回全部输出"""
+
+    def process(self, data):
+        return zlib.decompress(data)
+
+
+class FakeBrotli:
+    def __init__(self, decompressor):
+        self.Decompressor = decompressor
+
+
+@pytest.mark.parametrize('encoding, body', [('gzip', BOMB), ('deflate', BOMB)])
+def test_zlib_bomb_is_rejected_at_limit(encoding, body):
+    decoder = StreamDecoder(encoding, 1024 * 1024)
+    with pytest.raises(ResponseTooLarge):
+        for start in range(0, len(body), 16384):
+            decoder.decode(body[start:start + 16384])
+
+
+def test_bounded_brotli_stops_at_limit(monkeypatch):
+    monkeypatch.setattr(mirror_fetch, 'brotli', FakeBrotli(BoundedDecompressor))
+    BoundedDecompressor.outputs = []
+    assert 'br' in accept_encoding()
+    decoder = StreamDecoder('br', 1024 * 1024)
+    with pytest.raises(ResponseTooLarge):
+        decoder.decode(BOMB)
+    # 每次解压的输出不超过剩余额度加一字节
+    assert max(BoundedDecompressor.outputs) <= 1024 * 1024 + 1
+    assert sum(BoundedDecompressor.outputs) == 1024 * 1024 + 1
+
+    small = zlib.compress('中文'.encode() * 1000)
+    decoder = StreamDecoder('br', 1024 * 1024)
+    body = b''.join(decoder.decode(small[start:start + 100]) for start in range(0, len(small), 100))
+    assert body + decoder.flush() == '中文'.encode() * 1000
+
+
+@pytest.mark.parametrize('module', [None, FakeBrotli(UnboundedDecompressor)])
+def test_brotli_without_output_limit_is_not_used(monkeypatch, module):
+    monkeypatch.setattr(mirror_fetch, 'brotli', module)
+    assert accept_encoding() == 'gzip, deflate'
+    with pytest.raises(ValueError):
+        StreamDecoder('br', 1024)
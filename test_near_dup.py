@@ -0,0 +1,137 @@
+"""近似重复检测测试：改写过的新闻能检出、不同新闻不误报，按推送目标分别判断，推送失败的内容不留在索引中"""
+
+import random
+from datetime import datetime
+
+import pytest
+from feedparser import FeedParserDict
+from slack_sdk.errors import SlackApiError
+
+from near_dup import DestinationIndex, NearDuplicateIndex
+
+CHARS = [chr(code) for code in range(0x4e00, 0x4e00 + 3000)]
+
+NEWS = '美国证券交易委员会批准以太坊现货ETF上市交易'
+REWRITTEN = '【快讯】美国证监会批准以太坊现货ETF上市交易！'
+OTHER = '贝莱德比特币信托单日净流入创下历史新高'
+
+
+def make_headline(rng):
+    return ''.join(rng.choice(CHARS) for _ in range(rng.randint(18, 40)))
+
+
+def rewrite(rng, headline):
+    """模拟另一个频道的措辞：替换两个字，加上前缀和标点"""
+    chars = list(headline)
+    for _ in range(2):
+        chars[rng.randrange(len(chars))] = rng.choice(CHARS)
+    return '【快讯】' + ''.join(chars) + '！'
+
+
+def test_detects_rewrites_without_false_positives():
+    rng = random.Random(1)
+    index = NearDuplicateIndex(window_seconds=86400)
+    headlines = [make_headline(rng) for _ in range(2000)]
+    for number, headline in enumerate(headlines):
+        assert index.check(headline, ('indexed', number), now=1000) is None
+    detected = sum(1 for _ in range(500) if index.check(rewrite(rng, rng.choice(headlines)), 'query', now=1000))
+    false_positives = sum(1 for _ in range(500) if index.check(make_headline(rng), 'query', now=1000))
+    assert detected >= 375 and false_positives <= 5
+
+
+def test_same_owner_and_window_expiry():
+    index = NearDuplicateIndex(window_seconds=60)
+    assert index.check(NEWS, 'a', now=1000) is None
+    # 同一条目再次出现不算重复，也不重复加入
+    assert index.check(NEWS, 'a', now=1001) is None and len(index) == 1
+    owner, similarity = index.check(REWRITTEN, 'b', now=1002)
+    assert owner == 'a' and similarity >= 0.6
+    # 超出窗口后淘汰
+    assert index.check(REWRITTEN, 'b', now=1100) is None
+    assert index.stats()['items'] == 1
+
+
+def test_discard_removes_owner_and_survives_eviction():
+    index = NearDuplicateIndex(window_seconds=60, capacity=2)
+    index.check(NEWS, 'a', now=1000)
+    index.check(OTHER, 'a', now=1000)
+    index.check(make_headline(random.Random(2)), 'c', now=1001)
+    assert index.discard('a') == 2 and index.discard('a') == 0
+    assert index.check(REWRITTEN, 'b', now=1002) is None
+    # 去掉的内容和其他内容一起淘汰，不影响之后的加入和查询
+    assert index.check(OTHER, 'd', now=1200) is None
+    assert index.check(NEWS, 'e', now=1200) is None
+    assert len(index) == 2 and index.check(REWRITTEN, 'f', now=1201)[0] == 'e'
+
+
+def test_destinations_are_independent():
+    index = DestinationIndex(window_seconds=86400)
+    assert index.check(('main', 'C1'), NEWS, 'a') is None
+    assert index.check(('main', 'C1'), REWRITTEN, 'b')[0] == 'a'
+    # 其他频道、其他工作区同名频道和投递目标中没有推送过
+    assert index.check(('main', 'C2'), REWRITTEN, 'b') is None
+    assert index.check(('other', 'C1'), REWRITTEN, 'b') is None
+    assert index.check(('sink', 'archive'), REWRITTEN, 'b') is None
+    assert index.discard(('main', 'C1'), 'a') == 1
+    assert index.check(('main', 'C1'), REWRITTEN, 'b') is None
+    assert index.stats() == {'destinations': 4, 'items': 5}
+
+
+# 订阅源 a 只推送到 C1，订阅源 b 推送到 C1 和 C2
+WORKSPACES = {
+    'feeds': {'a': '/telegram/channel/a', 'b': '/telegram/channel/b'},
+    'workspaces': [{'name': 'main', 'token': 'xoxb-main', 'routes': {'a': ['C1'], 'b': ['C1', 'C2']}}],
+}
+
+
+def make_entry(number, *lines):
+    today = datetime.now().strftime('%Y/%-m/%-d')
+    summary = '<br>'.join(f"{index}/ {line} – <a href=\"https://x.com/{number}/{index}\">source</a>"
+                          for index, line in enumerate(lines, 1))
+    return FeedParserDict({'title': f"每日加密热点新闻榜单｜{today}", 'summary': summary,
+                           'link': f"https://t.me/news/{number}", 'id': f"https://t.me/news/{number}"})
+
+
+@pytest.fixture
+def bot(make_bot):
+    return make_bot(WORKSPACES, NEAR_DUP_WINDOW_SECONDS=86400)
+
+
+def posted(bot, channel):
+    return [post['blocks'] for post in bot.fake_slack.posts() if post['channel'] == channel]
+
+
+def text_of(blocks):
+    return str(blocks)
+
+
+def test_duplicate_is_only_dropped_where_it_was_posted(bot):
+    assert bot.process_entries([make_entry(1, NEWS)], 'a')
+    assert bot.process_entries([make_entry(2, REWRITTEN, OTHER)], 'b')
+
+    (first, second) = posted(bot, 'C1')
+    assert '以太坊' in text_of(first)
+    # C1 已经推送过这条新闻，只发剩下的；C2 没有推送过，两条都发
+    assert '以太坊' not in text_of(second) and '贝莱德' in text_of(second)
+    (c2,) = posted(bot, 'C2')
+    assert '以太坊' in text_of(c2) and '贝莱德' in text_of(c2)
+
+
+def test_entry_dropped_only_when_duplicate_everywhere(bot):
+    assert bot.process_entries([make_entry(1, NEWS)], 'b')
+    assert bot.process_entries([make_entry(2, REWRITTEN)], 'a')
+    assert bot.process_entries([make_entry(3, REWRITTEN)], 'b')
+    assert len(posted(bot, 'C1')) == 1 and len(posted(bot, 'C2')) == 1
+
+
+def test_failed_delivery_does_not_suppress_later_duplicates(bot):
+    bot.fake_slack.fail['chat_postMessage'] = SlackApiError('channel_not_found', {'ok': False,
+                                                                                 'error': 'channel_not_found'})
+    assert bot.process_entries([make_entry(1, NEWS)], 'a')
+    assert bot.fake_slack.posts() == []
+
+    # 第一条没有推送出去，改写后的同一条新闻仍推送到 C1
+    del bot.fake_slack.fail['chat_postMessage']
+    assert bot.process_entries([make_entry(2, REWRITTEN)], 'b')
+    assert '以太坊' in text_of(posted(bot, 'C1')[0])
+    assert len(posted(bot, 'C2')) == 1
@@ -0,0 +1,100 @@
+"""流水线测试：下游慢时有界队列让上游等待（背压），阶段出错时异常交给调用方而不会卡住，结束时所有阶段线程都已退出"""
+
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline, map_stage
+
+
+class Source:
+    """记录被流水线取走了多少条"""
+
+    def __init__(self, count):
+        self.count = count
+        self.pulled = 0
+
+    def __iter__(self):
+        for index in range(self.count):
+            self.pulled += 1
+            yield index
+
+
+def run_in_thread(pipeline, items):
+    """在后台线程中运行流水线，返回线程和结果"""
+    result = {}
+
+    def target():
+        try:
+            result['value'] = pipeline.run(items)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread, result
+
+
+def stage_threads(name):
+    return [thread for thread in threading.enumerate() if thread.name.startswith(f"{name}-")]
+
+
+def test_full_queue_blocks_producer():
+    release = threading.Event()
+    consumed = []
+
+    def consume(item):
+        release.wait(5)
+        consumed.append(item)
+        return item
+
+    source = Source(100)
+    pipeline = Pipeline([('double', map_stage(lambda item: item * 2)), ('consume', map_stage(consume))],
+                        queue_size=1, name='backpressure')
+    thread, result = run_in_thread(pipeline, source)
+    time.sleep(0.3)
+    # 下游卡住时，两个队列各放一条，来源、double、consume 线程手里各一条，上游最多取走 5 条
+    assert consumed == []
+    assert source.pulled <= 5
+
+    release.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert result['value'] == 100 and source.pulled == 100
+    assert consumed == [item * 2 for item in range(100)]
+    # 上游在队列满处等待的时间计入 wait_out
+    assert pipeline.stats[0].wait_out > 0.1
+
+
+@pytest.mark.parametrize('failing', ['first', 'last'])
+def test_stage_error_reaches_caller(failing):
+    def fail_on_third(item):
+        if item == 3:
+            raise ValueError('第三条出错')
+        return item
+
+    stages = [('first', map_stage(lambda item: item)), ('last', map_stage(lambda item: item))]
+    stages[[name for name, _ in stages].index(failing)] = (failing, map_stage(fail_on_third))
+    pipeline = Pipeline(stages, queue_size=2, name=f"error-{failing}")
+    thread, result = run_in_thread(pipeline, Source(1000))
+    thread.join(5)
+    assert not thread.is_alive()
+    assert isinstance(result['error'], ValueError) and str(result['error']) == '第三条出错'
+    assert stage_threads(f"error-{failing}") == []
+
+
+def test_shutdown_joins_every_thread():
+    started = []
+
+    def slow(item):
+        started.append(threading.current_thread().name)
+        time.sleep(0.01)
+        return item
+
+    pipeline = Pipeline([('parse', map_stage(slow)), ('render', map_stage(slow)), ('deliver', map_stage(slow))],
+                        queue_size=2, name='shutdown')
+    assert pipeline.run(range(10)) == 10
+    assert set(started) == {'shutdown-parse', 'shutdown-render', 'shutdown-deliver'}
+    # run 返回时来源线程和各阶段线程都已结束
+    assert stage_threads('shutdown') == []
@@ -0,0 +1,82 @@
+"""性能分析工具测试"""
+
+import threading
+
+import pytest
+
+import profiler
+from pipeline import Pipeline, map_stage
+from profiler import CycleProfiler, profile_stage, record_stage
+
+
+def test_profile_stage_is_noop_without_active_profiler():
+    with profile_stage('idle'):
+        pass
+    record_stage('idle', 1.0, 1.0)
+    assert profiler._active_profiler is None
+
+
+def test_run_records_stages_and_writes_report(tmp_path):
+    output = tmp_path / 'report.txt'
+    cycle = CycleProfiler(str(output))
+
+    def work():
+        for _ in range(3):
+            with profile_stage('regex: extract'):
+                sum(range(1000))
+        record_stage('pipeline: render', 0.5, 0.25)
+        return 'done'
+
+    assert cycle.run('fetch', work) == 'done'
+    assert profiler._active_profiler is None
+    assert cycle.stages['regex: extract']['calls'] == 3
+    assert cycle.stages['pipeline: render'] == {'calls': 1, 'wall': 0.5, 'cpu': 0.25}
+    assert 'fetch' in cycle.stages
+
+    report = output.read_text(encoding='utf-8')
+    assert report.startswith('# 性能分析报告: fetch')
+    assert '## 阶段耗时' in report and 'regex: extract' in report
+    assert '## 内存分配热点' in report and '## cProfile' in report
+
+
+def test_run_writes_report_when_task_fails(tmp_path):
+    output = tmp_path / 'report.txt'
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        CycleProfiler(str(output)).run('purge', fail)
+    assert profiler._active_profiler is None
+    assert '# 性能分析报告: purge' in output.read_text(encoding='utf-8')
+
+
+def busy_in_stage_thread(item):
+    return sum(range(item * 1000))
+
+
+def test_worker_threads_are_profiled_and_merged(tmp_path):
+    output = tmp_path / 'report.txt'
+    cycle = CycleProfiler(str(output))
+    pipeline = Pipeline([('square', map_stage(busy_in_stage_thread))], queue_size=2, name='test')
+    assert cycle.run('fetch', pipeline.run, range(20)) == 20
+    assert len(cycle.thread_profiles) == 1
+
+    # 只在阶段线程中调用的函数也出现在 cProfile 报告中
+    report = output.read_text(encoding='utf-8')
+    assert '1 个工作线程' in report and 'busy_in_stage_thread' in report
+
+
+def test_add_stage_from_many_threads():
+    cycle = CycleProfiler('unused')
+
+    def add():
+        for _ in range(1000):
+            cycle.add_stage('sinks: send', 0.001, 0.0)
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cycle.stages['sinks: send']['calls'] == 8000
@@ -0,0 +1,224 @@
+"""推送接收服务测试：WebSub 续订失败后的退避重试，只确认自己发起的订阅，推送按 topic 对应到订阅源，
+推送失败的条目之后重新处理，去重记录按保留时间淘汰"""
+
+import hashlib
+import hmac
+import time
+
+import pytest
+import requests
+from feedparser import FeedParserDict
+from slack_sdk.errors import SlackApiError
+
+from push_receiver import PushReceiver, entry_fingerprint
+
+
+class Response:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+class Timers:
+    """代替 threading.Timer，记录计划的续订而不真正等待"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def __call__(self, delay, function, args=()):
+        timers = self
+
+        class Timer:
+            daemon = False
+            cancelled = False
+
+            def start(self):
+                timers.scheduled.append((delay, function, args, self))
+
+            def cancel(self):
+                self.cancelled = True
+
+        return Timer()
+
+    def run_next(self):
+        delay, function, args, _ = self.scheduled.pop(0)
+        function(*args)
+        return delay
+
+
+def make_receiver(monkeypatch, replies):
+    timers = Timers()
+    posts = []
+
+    def post(url, data, timeout):
+        posts.append(data)
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr('push_receiver.threading.Timer', timers)
+    monkeypatch.setattr('push_receiver.requests.post', post)
+    receiver = PushReceiver(lambda entries: None, renew_retry_seconds=10, renew_retry_max_seconds=30)
+    return receiver, timers, posts
+
+
+def test_renewal_failures_are_retried_with_backoff(monkeypatch):
+    replies = [Response(202), Response(500, 'hub error'), requests.ConnectionError('down'),
+               Response(400, 'bad'), Response(404), Response(204)]
+    receiver, timers, posts = make_receiver(monkeypatch, replies)
+
+    receiver.subscribe('https://hub', 'https://feed', 'https://cb', lease_seconds=1000)
+    assert timers.run_next() == 800  # 租约的 80% 时续订
+
+    delays = [timers.run_next() for _ in range(4)]
+    # 每次失败都重新计划续订，间隔翻倍但不超过上限
+    assert delays == [10, 20, 30, 30]
+    assert len(posts) == 6
+    assert timers.scheduled[0][0] == 800  # 续订成功后回到正常周期
+    assert receiver.topics == {'https://feed': None}
+
+
+def test_initial_subscribe_failure_raises(monkeypatch):
+    receiver, timers, _ = make_receiver(monkeypatch, [Response(500)])
+    try:
+        receiver.subscribe('https://hub', 'https://feed', 'https://cb')
+    except RuntimeError as e:
+        assert '500' in str(e)
+    else:
+        raise AssertionError('订阅失败应抛出异常')
+    assert timers.scheduled == []
+
+
+def test_stop_cancels_pending_renewals(monkeypatch):
+    receiver, timers, _ = make_receiver(monkeypatch, [Response(202)])
+    receiver.subscribe('https://hub', 'https://feed', 'https://cb')
+    timer = timers.scheduled[0][3]
+    receiver.stop()
+    assert timer.cancelled and receiver.timers == {}
+
+
+def make_body(*numbers, topic='https://rsshub.app/telegram/channel/a'):
+    items = ''.join(f"<item><title>每日加密热点新闻榜单</title><guid>https://t.me/news/{number}</guid>"
+                    f"<description>1/ 新闻{number}</description></item>" for number in numbers)
+    return (f'<?xml version="1.0"?><rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+            f'<atom:link rel="self" href="{topic}"/>{items}</channel></rss>').encode()
+
+
+@pytest.fixture
+def server():
+    """在本机随机端口启动的接收服务，handler 记录 (条目键, 订阅源)，返回 failing 中的条目"""
+    handled = []
+    failing = set()
+
+    def handler(entries, feed):
+        handled.extend((entry.id, feed) for entry in entries)
+        return [entry for entry in entries if entry.id in failing]
+
+    receiver = PushReceiver(handler, host='127.0.0.1', port=0, secret='s3cret', workers=1)
+    receiver.start()
+    receiver.handled, receiver.failing = handled, failing
+    receiver.url = f"http://127.0.0.1:{receiver.server.server_port}/websub"
+    yield receiver
+    receiver.stop()
+
+
+def post(receiver, body, topic=None, secret='s3cret'):
+    signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    headers = {'X-Hub-Signature-256': f"sha256={signature}"}
+    if topic:
+        headers['Link'] = f'<https://hub>; rel="hub", <{topic}>; rel="self"'
+    response = requests.post(receiver.url, data=body, headers=headers, timeout=5)
+    receiver.queue.join()
+    return response.status_code
+
+
+def test_verification_only_for_subscribed_topics(server):
+    params = {'hub.mode': 'subscribe', 'hub.topic': 'https://feed', 'hub.challenge': 'xyz'}
+    # 还没有任何订阅时也不确认
+    assert requests.get(server.url, params=params, timeout=5).status_code == 404
+    server.topics['https://feed'] = 'a'
+    response = requests.get(server.url, params=params, timeout=5)
+    assert response.status_code == 200 and response.text == 'xyz'
+    params['hub.topic'] = 'https://other'
+    assert requests.get(server.url, params=params, timeout=5).status_code == 404
+
+
+def test_pushes_are_routed_by_topic(server):
+    server.topics.update({'https://feed/a': 'a', 'https://feed/b': 'b'})
+    assert post(server, make_body(1), topic='https://feed/b') == 202
+    # 没有 Link 头时使用内容中已订阅的 self 链接，没有 topic 的主动推送交给默认订阅源
+    assert post(server, make_body(2, topic='https://feed/a')) == 202
+    assert post(server, make_body(3, topic='https://elsewhere')) == 202
+    # 未订阅的 topic 和签名不符的推送丢弃
+    assert post(server, make_body(4), topic='https://feed/c') == 202
+    assert post(server, make_body(5), topic='https://feed/a', secret='wrong') == 202
+    assert server.handled == [('https://t.me/news/1', 'b'), ('https://t.me/news/2', 'a'),
+                              ('https://t.me/news/3', None)]
+
+
+def test_failed_entries_are_processed_again(server):
+    server.topics['https://feed/a'] = 'a'
+    server.failing.add('https://t.me/news/2')
+    assert post(server, make_body(1, 2), topic='https://feed/a') == 202
+    server.failing.clear()
+    # hub 重新推送时只重新处理上次失败的条目
+    assert post(server, make_body(1, 2), topic='https://feed/a') == 202
+    assert [key for key, _ in server.handled] == ['https://t.me/news/1', 'https://t.me/news/2', 'https://t.me/news/2']
+
+
+def test_receiver_without_secret_listens_on_localhost_only():
+    receiver = PushReceiver(lambda entries, feed: [], host='0.0.0.0', port=0, workers=1)
+    receiver.start()
+    try:
+        assert receiver.server.server_address[0] == '127.0.0.1'
+    finally:
+        receiver.stop()
+
+
+def test_seen_fingerprints_expire():
+    receiver = PushReceiver(lambda entries, feed: [], retention_seconds=60)
+    old = FeedParserDict({'id': 'old', 'summary': 'a'})
+    receiver.seen[entry_fingerprint(old)] = time.time() - 120
+    entry = FeedParserDict({'id': 'new', 'summary': 'b'})
+    assert receiver.mark_new(entry) and not receiver.mark_new(entry)
+    assert list(receiver.seen) == [entry_fingerprint(entry)]
+    assert receiver.mark_new(old)
+
+
+# 订阅源 a 推送到 C1，订阅源 b 推送到 C2
+WORKSPACES = {
+    'feeds': {'a': '/telegram/channel/a', 'b': '/telegram/channel/b'},
+    'workspaces': [{'name': 'main', 'token': 'xoxb-main', 'routes': {'a': ['C1'], 'b': ['C2']}}],
+}
+
+
+def daily_entry(number):
+    today = time.strftime('%Y/%-m/%-d')
+    return FeedParserDict({'title': f"每日加密热点新闻榜单｜{today}", 'summary': f"1/ 新闻{number}",
+                           'id': f"https://t.me/news/{number}", 'link': f"https://t.me/news/{number}"})
+
+
+def test_bot_subscribes_every_feed_and_routes_pushes(make_bot, monkeypatch):
+    bot = make_bot(WORKSPACES, PUSH_CALLBACK_URL='https://cb', PUSH_SECRET='s3cret', PUSH_PORT=0, PUSH_WORKERS=1)
+    topics = {'/telegram/channel/a': 'https://hub/a', '/telegram/channel/b': 'https://hub/b'}
+    monkeypatch.setattr(bot, 'fetch_rss_with_headers', lambda path: FeedParserDict({'feed': {'links': [
+        {'rel': 'hub', 'href': 'https://hub'}, {'rel': 'self', 'href': topics[path]}]}}))
+    subscribed = []
+    monkeypatch.setattr(PushReceiver, 'subscribe', lambda receiver, hub, topic, callback, feed=None:
+                        (subscribed.append((topic, feed)), receiver.topics.__setitem__(topic, feed)))
+    bot.start_push_receiver()
+    try:
+        assert subscribed == [('https://hub/a', 'a'), ('https://hub/b', 'b')]
+
+        # topic b 的推送发到 b 的频道；推送失败的条目交还给接收服务
+        bot.fake_slack.fail['chat_postMessage'] = lambda kwargs: (
+            SlackApiError('channel_not_found', {'ok': False, 'error': 'channel_not_found'})
+            if '新闻2' in str(kwargs) else None)
+        assert bot.handle_pushed_entries([daily_entry(1)], 'b') == []
+        failed = daily_entry(2)
+        assert bot.handle_pushed_entries([failed], 'b') == [failed]
+        assert [post['channel'] for post in bot.fake_slack.posts()] == ['C2']
+        assert bot.push_receiver.retention_seconds == 2 * 172800
+    finally:
+        bot.push_receiver.stop()
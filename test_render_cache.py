@@ -0,0 +1,94 @@
+"""渲染缓存测试：容量满时淘汰最久未使用的条目，摘要或模板版本变化后重新渲染，淘汰和退出时写入磁盘、重新运行能读回"""
+
+import os
+import time
+
+from feedparser import FeedParserDict
+
+import rss_to_slack
+from render_cache import RenderCache, content_hash
+
+
+def test_evicts_least_recently_used_at_capacity():
+    cache = RenderCache(capacity=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'  # a 变成最近使用
+    cache.put('c', 'C')
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.get('b') is None
+
+    # 覆盖已有的键也算最近使用，字节数不重复计算
+    cache.put('a', 'AA')
+    cache.put('d', 'D')
+    assert list(cache.entries) == ['a', 'd']
+    assert cache.stats()['bytes'] == len('"AA"') + len('"D"')
+
+
+def test_changed_summary_or_template_version_renders_again(make_bot, monkeypatch):
+    bot = make_bot()
+    entry = FeedParserDict({'title': '每日加密热点新闻榜单｜2025/6/1', 'summary': '1/ 比特币新高',
+                            'link': 'https://t.me/SoSoValue_CN/1', 'id': 'https://t.me/SoSoValue_CN/1'})
+    rendered = []
+    render = bot._format_message_for_channel_a
+    monkeypatch.setattr(bot, '_format_message_for_channel_a', lambda entry: rendered.append(1) or render(entry))
+
+    assert bot.format_message_for_channel_a(entry) == '1. 比特币新高'
+    assert bot.format_message_for_channel_a(entry) == '1. 比特币新高'
+    assert len(rendered) == 1
+
+    # 同一条目被编辑后按新的摘要重新渲染
+    entry['summary'] = '1/ 以太坊新高'
+    assert bot.format_message_for_channel_a(entry) == '1. 以太坊新高'
+    assert len(rendered) == 2
+
+    # 模板版本加一后旧结果不再命中
+    monkeypatch.setitem(rss_to_slack.TEMPLATE_VERSIONS, 'channel_a', 2)
+    bot.format_message_for_channel_a(entry)
+    assert len(rendered) == 3
+    assert bot.render_cache.stats()['hits'] == 1
+
+
+def test_spilled_entries_are_reloaded(tmp_path):
+    spill_dir = str(tmp_path / 'cache')
+    cache = RenderCache(capacity=1, spill_dir=spill_dir)
+    first = cache.key('channel_a', 1, content_hash('第一天'))
+    second = cache.key('channel_a', 1, content_hash('第二天'))
+    cache.put(first, '1. 第一天')
+    cache.put(second, {'blocks': ['第二天']})
+    # 被淘汰的条目已写入磁盘，读回后重新放进内存
+    assert len(os.listdir(spill_dir)) == 1
+    assert cache.get(first) == '1. 第一天'
+    assert cache.stats()['disk_hits'] == 1 and list(cache.entries) == [first]
+
+    # 退出时写出内存中的条目，重新运行也能命中
+    cache.flush()
+    reloaded = RenderCache(capacity=4, spill_dir=spill_dir)
+    assert reloaded.get(second) == {'blocks': ['第二天']}
+    assert reloaded.get(first) == '1. 第一天'
+    assert reloaded.stats()['disk_hits'] == 2 and reloaded.stats()['misses'] == 0
+
+
+def test_flush_removes_stale_spill_files(tmp_path):
+    spill_dir = str(tmp_path / 'cache')
+    cache = RenderCache(capacity=1, spill_dir=spill_dir, spill_max_age=60)
+    cache.put('old', 'old')
+    cache.put('new', 'new')
+    old_path = cache.spill_path('old')
+    os.utime(old_path, (time.time() - 120, time.time() - 120))
+    cache.flush()
+    assert os.listdir(spill_dir) == [os.path.basename(cache.spill_path('new'))]
+    assert cache.get('old') is None
+
+
+def test_expire_notice_follows_delete_window(make_bot, monkeypatch):
+    bot = make_bot()
+    _, blocks = bot.build_blocks('1. 比特币新高', '标题')
+    assert '本消息 48 小时后自动删除' in str(blocks)
+
+    # 删除时间改变后提示随之变化，不命中按旧时间渲染的缓存
+    monkeypatch.setattr(rss_to_slack.Config, 'DELETE_AFTER_SECONDS', 5400)
+    _, blocks = bot.build_blocks('1. 比特币新高', '标题')
+    assert '本消息 1.5 小时后自动删除' in str(blocks)
+    _, blocks = bot.build_blocks('1. 比特币新高', '标题', expire=False)
+    assert '自动删除' not in str(blocks)
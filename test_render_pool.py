@@ -0,0 +1,112 @@
+"""渲染进程池测试：进程池的结果与逐条渲染一致且按输入顺序返回，工作进程不加载配置和日志，
+从脚本启动时重新导入主脚本也没有副作用"""
+
+import json
+import os
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+from formatting import extract_numbered_content, format_channel_a, run_chunk
+from render_pool import RenderPool
+
+
+def make_summary(day):
+    lines = [f"2025.6.{day % 28 + 1}<br>"]
+    lines += [f'{number}/ 第{day}天新闻{number} – <a href="https://example.com/{day}/{number}">source</a><br>'
+              for number in range(1, 11)]
+    return ''.join(lines)
+
+
+SUMMARIES = [make_summary(day) for day in range(60)] + ['<p>没有编号的 <b>摘要</b></p>']
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(2, min_batch=4, chunk_size=3)
+    yield pool
+    pool.shutdown()
+
+
+def test_pooled_output_equals_serial(pool):
+    assert pool.map(format_channel_a, SUMMARIES) == [format_channel_a(summary) for summary in SUMMARIES]
+    assert pool.map(extract_numbered_content, SUMMARIES) == [extract_numbered_content(s) for s in SUMMARIES]
+    assert pool.stats()['remote'] == 2 * len(SUMMARIES) and pool.stats()['inline'] == 0
+
+
+def test_imap_keeps_order_and_skips_missing_payloads(pool):
+    # 偶数条目模拟渲染缓存命中：不发送，结果为 None
+    items = list(range(len(SUMMARIES)))
+    payload = lambda index: SUMMARIES[index] if index % 2 else None
+    results = list(pool.imap(format_channel_a, items, payload))
+    assert [item for item, _ in results] == items
+    assert [result for _, result in results] == [format_channel_a(SUMMARIES[index]) if index % 2 else None
+                                                 for index in items]
+
+
+def test_small_batches_run_inline():
+    pool = RenderPool(2, min_batch=100)
+    assert pool.map(format_channel_a, SUMMARIES[:5]) == [format_channel_a(summary) for summary in SUMMARIES[:5]]
+    assert pool.executor is None and pool.stats()['inline'] == 5
+    assert RenderPool(1).map(format_channel_a, SUMMARIES[:3]) == [format_channel_a(s) for s in SUMMARIES[:3]]
+
+
+def test_worker_task_does_not_import_config():
+    # 工作进程反序列化任务时只导入 formatting 和 html_mrkdwn
+    task = pickle.dumps((run_chunk, format_channel_a, SUMMARIES[:2]))
+    script = ("import pickle, sys\n"
+              "func, render, payloads = pickle.loads(sys.stdin.buffer.read())\n"
+              "func(render, payloads)\n"
+              "print(sorted({'config', 'log_utils', 'render_pool', 'dotenv'} & set(sys.modules)))\n")
+    result = subprocess.run([sys.executable, '-c', script], input=task, capture_output=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.stdout.decode().strip() == '[]'
+
+
+SPAWN_SCRIPT = '''
+import json
+import sys
+import threading
+
+import dotenv
+
+# 记录导入期间是否加载了配置文件；工作进程重新导入本脚本时同样会先执行这里
+dotenv_calls = []
+dotenv.load_dotenv = lambda *args, **kwargs: dotenv_calls.append(args)
+
+import rss_to_slack
+import backfill
+from render_pool import RenderPool
+
+
+def probe(payload):
+    """在工作进程中报告重新导入主脚本时做了什么"""
+    log_utils = sys.modules.get('log_utils')
+    return {'main': __name__, 'dotenv_calls': len(dotenv_calls),
+            'listener': log_utils is not None and log_utils._listener is not None,
+            'threads': [thread.name for thread in threading.enumerate()]}
+
+
+if __name__ == '__main__':
+    parent = probe(None)
+    pool = RenderPool(2, min_batch=1, chunk_size=1)
+    workers = pool.map(probe, [0, 1])
+    pool.shutdown()
+    print(json.dumps({'parent': parent, 'workers': workers, 'remote': pool.stats()['remote']}))
+'''
+
+
+def test_spawned_workers_reimport_main_script_without_side_effects(tmp_path):
+    # spawn 的工作进程以 __mp_main__ 重新导入父进程的主脚本：导入 rss_to_slack 和 backfill 不能加载配置或启动日志线程
+    script = tmp_path / 'spawn_probe.py'
+    script.write_text(SPAWN_SCRIPT, encoding='utf-8')
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, str(script)], capture_output=True, check=True, cwd=tmp_path, env=env,
+                            timeout=60)
+    # 启动进程池的日志也写到标准输出
+    report = json.loads(next(line for line in result.stdout.decode().splitlines() if line.startswith('{')))
+    assert report['remote'] == 2
+    assert report['parent'] == {'main': '__main__', 'dotenv_calls': 0, 'listener': False, 'threads': ['MainThread']}
+    assert report['workers'] == [{'main': '__mp_main__', 'dotenv_calls': 0, 'listener': False, 'threads': ['MainThread']}] * 2
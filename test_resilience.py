@@ -0,0 +1,155 @@
+"""周期时限与熔断测试：熔断器在连续失败后熔断、冷却后放行一个试探请求、按试探结果恢复或重新熔断；
+时限过后未完成的抓取和推送推迟到下一轮"""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from feedparser import FeedParserDict
+
+import resilience
+from resilience import (CircuitBreaker, CircuitOpen, DeadlineExceeded, check_deadline, current_deadline,
+                        cycle_deadline)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, 'time', clock)
+    return clock
+
+
+def fail():
+    raise ConnectionError('down')
+
+
+def test_breaker_opens_after_threshold_failures(clock):
+    breaker = CircuitBreaker('feed:rsshub.app', failure_threshold=3, reset_seconds=60)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.snapshot() == {'state': 'closed', 'failures': 2}
+    # 成功一次后重新计数
+    assert breaker.call(lambda: 'ok') == 'ok'
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == 'open'
+
+    # 熔断中请求不发出
+    calls = []
+    with pytest.raises(CircuitOpen):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+
+
+def test_half_open_trial_closes_on_success(clock):
+    breaker = CircuitBreaker('slack:main', failure_threshold=1, reset_seconds=60)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    clock.now += 59
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+    # 冷却结束后只放行一个试探请求
+    clock.now += 1
+    breaker.allow()
+    assert breaker.state == 'half_open'
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.record(True)
+    assert breaker.snapshot() == {'state': 'closed', 'failures': 0}
+    assert breaker.call(lambda: 'ok') == 'ok'
+
+
+def test_half_open_trial_reopens_on_failure(clock):
+    breaker = CircuitBreaker('slack:main', failure_threshold=3, reset_seconds=60)
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    clock.now += 60
+    # 试探失败时立即重新熔断，不需要再失败 threshold 次
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == 'open'
+    clock.now += 30
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+    # 与依赖健康无关的异常不计入，也不占用试探名额
+    clock.now += 30
+    with pytest.raises(KeyError):
+        breaker.call(lambda: {}['missing'], is_failure=lambda e: None)
+    assert breaker.state == 'half_open'
+    assert breaker.call(lambda: 'ok') == 'ok' and breaker.state == 'closed'
+
+
+def test_deadline_is_scoped_to_cycle_and_copied_to_threads():
+    assert current_deadline() is None
+    check_deadline()
+    with cycle_deadline(0.05) as deadline:
+        assert current_deadline() is deadline
+        # 嵌套的周期不限时，结束后恢复外层时限
+        with cycle_deadline(0):
+            assert current_deadline() is None
+        assert current_deadline() is deadline
+        time.sleep(0.06)
+        with pytest.raises(DeadlineExceeded):
+            check_deadline()
+        with pytest.raises(DeadlineExceeded):
+            deadline.timeout(30)
+    assert current_deadline() is None
+
+    # 普通线程取不到调用方的时限，流水线用 copy_context 传入
+    seen = []
+    with cycle_deadline(10):
+        thread = threading.Thread(target=lambda: seen.append(current_deadline()))
+        thread.start()
+        thread.join()
+    assert seen == [None]
+
+
+def daily_entry(number):
+    today = datetime.now().strftime('%Y/%-m/%-d')
+    return FeedParserDict({'title': f"每日加密热点新闻榜单｜{today}", 'summary': f"1/ 新闻{number}",
+                           'id': f"https://t.me/news/{number}", 'link': f"https://t.me/news/{number}"})
+
+
+def test_deliveries_after_deadline_are_deferred(make_bot):
+    bot = make_bot()
+    with cycle_deadline(0.01):
+        time.sleep(0.02)
+        assert bot.process_entries([daily_entry(1), daily_entry(2)])
+    assert bot.fake_slack.attempts == []
+    assert sorted(bot.deferred_deliveries) == [('https://t.me/news/1', 'C06AUSCKYKF'),
+                                               ('https://t.me/news/2', 'C06AUSCKYKF')]
+
+    # 下一轮重新计时，推迟的推送完成
+    bot.retry_deferred()
+    assert len(bot.fake_slack.posts()) == 2 and bot.deferred_deliveries == {}
+
+
+def test_feeds_after_deadline_are_deferred(make_bot, monkeypatch):
+    workspaces = {
+        'feeds': {'a': '/telegram/channel/a', 'b': '/telegram/channel/b'},
+        'workspaces': [{'name': 'main', 'token': 'xoxb-main', 'routes': {'a': ['C1'], 'b': ['C2']}}],
+    }
+    bot = make_bot(workspaces, CYCLE_DEADLINE_SECONDS=0.05)
+    fetched = []
+
+    def slow_fetch(feed_name, path):
+        fetched.append(feed_name)
+        time.sleep(0.1)
+
+    monkeypatch.setattr(bot, 'fetch_feed', slow_fetch)
+    bot.fetch_and_process()
+    assert fetched == ['a'] and bot.deferred_feeds == {'b'}
@@ -0,0 +1,133 @@
+"""已发送消息台账测试：各删除工具删除成功后都在台账中标记，核对台账时逐个工作区进行"""
+
+import json
+import time
+
+import pytest
+from slack_sdk.errors import SlackApiError
+
+import sent_ledger
+import state_store
+import workspaces
+from config import Config
+from conftest import FakeSlack
+
+WORKSPACES = {
+    'feeds': {'default': '/telegram/channel/SoSoValue_CN'},
+    'workspaces': [{'name': 'main', 'token': 'xoxb-main', 'routes': {'default': ['C1']}},
+                   {'name': 'other', 'token': 'xoxb-other', 'routes': {'default': ['C9']}}],
+}
+
+
+class ChannelSlack(FakeSlack):
+    """带频道历史的 Slack 替身"""
+
+    def __init__(self, user_id, history=None):
+        super().__init__()
+        self.user_id = user_id
+        self.history = history or {}
+
+    def auth_test(self):
+        return {'user_id': self.user_id, 'bot_id': None}
+
+    def conversations_history(self, channel, **kwargs):
+        return {'messages': [{'ts': ts, 'user': self.user_id} for ts in self.history.get(channel, [])]}
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = tmp_path / 'workspaces.json'
+    path.write_text(json.dumps(WORKSPACES), encoding='utf-8')
+    monkeypatch.setattr(Config, 'WORKSPACES_FILE', str(path))
+    monkeypatch.setattr(Config, 'SENT_LEDGER_DB', str(tmp_path / 'sent_ledger.db'))
+    monkeypatch.setattr(Config, 'HISTORY_DB', str(tmp_path / 'channel_history.db'))
+    monkeypatch.setattr(sent_ledger, '_ledger', None)
+    monkeypatch.setattr(state_store, '_store', state_store.FileStateStore(str(tmp_path)))
+    monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+    return sent_ledger.get_sent_ledger()
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    clients = {'main': ChannelSlack('U_MAIN'), 'other': ChannelSlack('U_OTHER')}
+    monkeypatch.setitem(workspaces._clients, 'xoxb-main', clients['main'])
+    monkeypatch.setitem(workspaces._clients, 'xoxb-other', clients['other'])
+    monkeypatch.setitem(workspaces._clients, Config.SLACK_BOT_TOKEN, clients['main'])
+    return clients
+
+
+def live(ledger):
+    return sorted((row['workspace'], row['channel'], row['ts']) for row in ledger.messages())
+
+
+def add_pending(ledger, records):
+    for workspace, channel, ts in records:
+        ledger.record(workspace, channel, ts)
+    state_store.get_state_store().save('pending_deletes', [
+        {'channel': channel, 'ts': ts, 'send_time': time.time(), 'workspace': workspace}
+        for workspace, channel, ts in records])
+
+
+def not_deletable(kwargs):
+    if kwargs['ts'] == '3.0':
+        return SlackApiError('cant_delete_message', {'ok': False, 'error': 'cant_delete_message'})
+    if kwargs['ts'] == '2.0':
+        return SlackApiError('message_not_found', {'ok': False, 'error': 'message_not_found'})
+    return None
+
+
+@pytest.mark.parametrize('tool', ['delete_channel_messages', 'delete_bot_messages'])
+def test_pending_deletes_mark_ledger(ledger, clients, tool):
+    add_pending(ledger, [('main', 'C1', '1.0'), ('other', 'C9', '2.0'), ('other', 'C9', '3.0')])
+    clients['other'].fail['chat_delete'] = not_deletable
+    if tool == 'delete_channel_messages':
+        from delete_channel_messages import SlackMessageDeleter
+        SlackMessageDeleter().delete_pending_deletes()
+    else:
+        from delete_bot_messages import delete_pending_deletes
+        delete_pending_deletes()
+
+    # 删除成功和消息已不存在的都标记，删除失败的仍留在台账中
+    assert live(ledger) == [('other', 'C9', '3.0')]
+    assert [kwargs['ts'] for _, kwargs in clients['main'].calls] == ['1.0']
+
+
+def test_history_based_deletes_mark_ledger(ledger, clients):
+    from delete_channel_messages import SlackMessageDeleter
+    from quick_delete_all import delete_all_messages_in_channel
+    for ts in ('1.0', '2.0', '3.0'):
+        ledger.record('main', 'C1', ts)
+    ledger.record('main', 'C2', '4.0')
+    clients['main'].history = {'C1': ['1.0', '2.0'], 'C2': ['4.0']}
+
+    # 按频道历史删除时不知道工作区，按频道和 ts 匹配
+    delete_all_messages_in_channel('C1', 'C1')
+    assert live(ledger) == [('main', 'C1', '3.0'), ('main', 'C2', '4.0')]
+    SlackMessageDeleter().delete_all_messages('C2', 'C2')
+    assert live(ledger) == [('main', 'C1', '3.0')]
+
+
+def test_search_delete_marks_ledger(ledger, clients):
+    import delete_c06_channel
+    ledger.record('main', delete_c06_channel.CHANNEL_ID, '5.0')
+    clients['main'].search_messages = lambda **kwargs: {'messages': {'matches': [{'ts': '5.0'}]}}
+    delete_c06_channel.try_delete_by_search()
+    assert live(ledger) == []
+
+
+def test_reconcile_checks_every_workspace(ledger, clients):
+    from delete_bot_messages import reconcile_channels
+    ledger.record('main', 'C1', '1.0')
+    ledger.record('other', 'C9', '2.0')
+    ledger.record('other', 'C9', '3.0')
+    # other 工作区的 C9 中 2.0 已被删除，7.0 是台账启用前发出的
+    clients['main'].history = {'C1': ['1.0']}
+    clients['other'].history = {'C9': ['3.0', '7.0']}
+
+    reconcile_channels([('C1', '频道')])
+    assert live(ledger) == [('main', 'C1', '1.0'), ('other', 'C9', '3.0'), ('other', 'C9', '7.0')]
+
+    # only 只核对指定频道
+    clients['other'].history = {'C9': []}
+    reconcile_channels([('C1', '频道')], only='C1')
+    assert ('other', 'C9', '3.0') in live(ledger)
@@ -0,0 +1,103 @@
+"""多目标投递测试：一个目标失败或变慢不影响其他目标，每个目标分别重试、熔断并记录投递状态"""
+
+import json
+import threading
+from datetime import datetime
+
+import pytest
+import requests
+from feedparser import FeedParserDict
+
+import sinks
+from sinks import JSONLFileSink, Sink, SinkDispatcher
+
+
+class Response:
+    def raise_for_status(self):
+        pass
+
+
+class Session:
+    """记录 webhook 请求，down 时连接失败"""
+
+    def __init__(self):
+        self.posts = []
+        self.down = True
+
+    def post(self, url, **kwargs):
+        self.posts.append(url)
+        if self.down:
+            raise requests.ConnectionError('connection refused')
+        return Response()
+
+
+class BlockingSink(Sink):
+    type = 'blocking'
+
+    def __init__(self, name, feeds):
+        super().__init__(name, feeds, rate_per_second=1000)
+        self.release = threading.Event()
+
+    def send(self, payload, update=False):
+        self.release.wait(5)
+        return None
+
+
+def test_sink_requires_send():
+    with pytest.raises(TypeError):
+        Sink('incomplete', ['default'])
+
+
+def test_slow_sink_does_not_block_others(tmp_path):
+    blocking = BlockingSink('slow', ['default'])
+    archive = JSONLFileSink('archive', ['default'], str(tmp_path / 'archive.jsonl'))
+    dispatcher = SinkDispatcher()
+    payload = {'key': 'k', 'title': '标题', 'blocks': []}
+    slow = dispatcher.submit(blocking, blocking.deliver, payload)
+    fast = [dispatcher.submit(archive, archive.deliver, dict(payload, key=str(index))) for index in range(3)]
+    # 慢目标还在发送时，其他目标照常完成
+    for future in fast:
+        future.result(timeout=5)
+    assert not slow.done()
+    blocking.release.set()
+    slow.result(timeout=5)
+    assert len((tmp_path / 'archive.jsonl').read_text(encoding='utf-8').splitlines()) == 3
+
+
+def daily_entry(number):
+    today = datetime.now().strftime('%Y/%-m/%-d')
+    return FeedParserDict({'title': f"每日加密热点新闻榜单｜{today}", 'summary': f"1/ 新闻{number}",
+                           'id': f"https://t.me/news/{number}", 'link': f"https://t.me/news/{number}"})
+
+
+def test_failing_sink_is_retried_and_recorded_per_sink(make_bot, tmp_path, monkeypatch):
+    archive_path = tmp_path / 'archive.jsonl'
+    bot = make_bot({
+        'feeds': {'default': '/telegram/channel/SoSoValue_CN'},
+        'workspaces': [{'name': 'main', 'token': 'xoxb-main', 'routes': {'default': ['C1']}}],
+        'sinks': [{'type': 'webhook', 'name': 'ops', 'url': 'https://example.com/hook', 'retries': 1, 'backoff': 0,
+                   'rate_per_second': 1000},
+                  {'type': 'jsonl', 'name': 'archive', 'path': str(archive_path)}],
+    })
+    session = Session()
+    monkeypatch.setattr(sinks, 'get_session', lambda: session)
+    monkeypatch.setattr(sinks.time, 'sleep', lambda seconds: None)
+
+    assert bot.process_entries([daily_entry(1)])
+    # 出错的目标重试一次后放弃，Slack 频道和其他目标照常投递
+    assert len(session.posts) == 2
+    assert [post['channel'] for post in bot.fake_slack.posts()] == ['C1']
+    assert [json.loads(line)['key'] for line in archive_path.read_text(encoding='utf-8').splitlines()] == [
+        'https://t.me/news/1']
+    index = bot.load_message_index()['https://t.me/news/1']
+    assert 'sink:archive' in index and 'sink:ops' not in index
+    assert bot.settings.sinks[0].breaker.snapshot() == {'state': 'closed', 'failures': 2}
+    assert bot.settings.sinks[1].breaker.snapshot() == {'state': 'closed', 'failures': 0}
+
+    # 再次处理同一条目：只补投失败的目标，已投递的目标和频道不重复
+    session.down = False
+    assert bot.process_entries([daily_entry(1)])
+    assert len(session.posts) == 3
+    assert len(archive_path.read_text(encoding='utf-8').splitlines()) == 1
+    assert len(bot.fake_slack.posts()) == 1
+    assert 'sink:ops' in bot.load_message_index()['https://t.me/news/1']
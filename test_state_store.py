@@ -0,0 +1,132 @@
+"""状态存储测试：各后端的读写往返、SQLite 按行增量写入、快照返回副本"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from state_store import FileStateStore, SnapshotStateStore, SQLiteStateStore
+
+STATES = {
+    'pending_deletes': [{'channel': 'C1', 'ts': '1.1', 'delete_at': 10, 'workspace': 'default'},
+                        {'channel': 'C1', 'ts': '1.1', 'delete_at': 10, 'workspace': 'default'},
+                        {'channel': 'C2', 'ts': '2.2', 'delete_at': 20, 'workspace': 'w2'}],
+    'message_index': {'https://t.me/a/1': {'C1': ['1.1', 'abc']}, '2': {}},
+    'telegram_offset': {'offset': 13},
+    'pushed_links': [],
+    'scalar': 42,
+    'text': '中文',
+}
+
+
+def make_store(backend, tmp_path):
+    if backend == 'file':
+        return FileStateStore(str(tmp_path))
+    if backend == 'sqlite':
+        return SQLiteStateStore(str(tmp_path / 'state.db'))
+    return SnapshotStateStore(str(tmp_path / 'state.snap'))
+
+
+@pytest.mark.parametrize('backend', ['file', 'sqlite', 'snapshot'])
+def test_round_trip_survives_reopen(backend, tmp_path):
+    store = make_store(backend, tmp_path)
+    assert store.load('missing', {'default': True}) == {'default': True}
+    for name, value in STATES.items():
+        store.save(name, value)
+    store.flush()
+
+    reopened = make_store(backend, tmp_path)
+    for name, value in STATES.items():
+        assert reopened.load(name, None) == value
+
+    # 类型改变（列表 -> 数值 -> 字典）后仍能正确读回
+    reopened.save('pushed_links', 7)
+    reopened.save('scalar', {'now': 'dict'})
+    reopened.flush()
+    again = make_store(backend, tmp_path)
+    assert again.load('pushed_links', None) == 7
+    assert again.load('scalar', None) == {'now': 'dict'}
+
+
+@pytest.mark.parametrize('backend', ['file', 'sqlite', 'snapshot'])
+def test_loaded_values_are_copies(backend, tmp_path):
+    store = make_store(backend, tmp_path)
+    store.save('pending_deletes', [{'ts': '1'}])
+    data = store.load('pending_deletes', [])
+    data.append({'ts': '2'})
+    data[0]['ts'] = 'changed'
+    assert store.load('pending_deletes', []) == [{'ts': '1'}]
+
+    value = [{'ts': '3'}]
+    store.save('pending_deletes', value)
+    value.append({'ts': '4'})
+    assert store.load('pending_deletes', []) == [{'ts': '3'}]
+
+
+def count_writes(store):
+    """统计之后执行的写语句"""
+    writes = []
+    store.connect().set_trace_callback(
+        lambda sql: writes.append(sql) if sql.split()[0] in ('INSERT', 'UPDATE', 'DELETE') else None)
+    return writes
+
+
+def test_sqlite_save_writes_only_changed_rows(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / 'state.db'))
+    pending = [{'channel': 'C1', 'ts': str(i), 'delete_at': i} for i in range(500)]
+    store.save('pending_deletes', pending)
+
+    writes = count_writes(store)
+    store.save('pending_deletes', pending + [{'channel': 'C1', 'ts': 'new', 'delete_at': 999}])
+    assert len(writes) == 1 and writes[0].startswith('INSERT')
+
+    writes.clear()
+    remaining = pending[3:] + [{'channel': 'C1', 'ts': 'new', 'delete_at': 999}]
+    store.save('pending_deletes', remaining)
+    assert len(writes) == 3 and all(sql.startswith('DELETE') for sql in writes)
+    assert store.load('pending_deletes', None) == remaining
+
+    index = {f"key{i}": {'C1': [str(i), 'hash']} for i in range(300)}
+    store.save('message_index', index)
+    writes.clear()
+    index['key5'] = {'C1': ['5', 'changed']}
+    store.save('message_index', index)
+    assert len(writes) == 1 and writes[0].startswith('UPDATE')
+    assert store.load('message_index', None)['key5'] == {'C1': ['5', 'changed']}
+
+
+def test_sqlite_preserves_order_when_list_is_reordered(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / 'state.db'))
+    store.save('items', ['a', 'b', 'c'])
+    store.save('items', ['c', 'x', 'a'])
+    assert store.load('items', None) == ['c', 'x', 'a']
+    store.save('items', ['c', 'x', 'a', 'a'])
+    assert SQLiteStateStore(str(tmp_path / 'state.db')).load('items', None) == ['c', 'x', 'a', 'a']
+
+
+def test_sqlite_reads_blobs_written_by_older_versions(tmp_path):
+    path = str(tmp_path / 'state.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE state (name TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        conn.execute("INSERT INTO state VALUES ('pending_deletes', '[{\"ts\":\"1\"}]')")
+    store = SQLiteStateStore(path)
+    assert store.load('pending_deletes', None) == [{'ts': '1'}]
+    store.save('pending_deletes', [{'ts': '1'}, {'ts': '2'}])
+    assert SQLiteStateStore(path).load('pending_deletes', None) == [{'ts': '1'}, {'ts': '2'}]
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM state").fetchone()[0] == 0
+
+
+def test_sqlite_is_usable_from_several_threads(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / 'state.db'))
+
+    def worker(n):
+        for i in range(20):
+            store.save(f"thread{n}", {'i': i})
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [store.load(f"thread{n}", None) for n in range(4)] == [{'i': 19}] * 4
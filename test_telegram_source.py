@@ -0,0 +1,174 @@
+"""Telegram 直连抓取测试：用本地 HTTP 服务模拟 Bot API"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from telegram_source import TelegramChannelSource, message_to_entry, message_to_html
+
+CHAT = {'id': -1001234567890, 'username': 'SoSoValue_CN', 'type': 'channel'}
+
+
+class MemoryStore:
+    def __init__(self):
+        self.data = {}
+        self.flushes = 0
+
+    def load(self, name, default):
+        return self.data.get(name, default)
+
+    def save(self, name, value):
+        self.data[name] = value
+
+    def flush(self):
+        self.flushes += 1
+
+
+class FakeBotAPI:
+    """按 offset 返回未确认的 update，与 Telegram 一样：只有带上更大的 offset 才算确认"""
+
+    def __init__(self, updates):
+        self.updates = updates
+        self.requests = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                api.requests.append((url.path, params))
+                offset = int(params.get('offset', 0))
+                result = [update for update in api.updates if update['update_id'] >= offset]
+                body = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def post(update_id, message_id, text, entities=None, edited=False, chat=CHAT):
+    message = {'message_id': message_id, 'chat': chat, 'date': 1750809600, 'text': text}
+    if entities:
+        message['entities'] = entities
+    if edited:
+        message['edit_date'] = 1750813200
+    return {'update_id': update_id, 'edited_channel_post' if edited else 'channel_post': message}
+
+
+@pytest.fixture
+def api():
+    server = FakeBotAPI([])
+    yield server
+    server.close()
+
+
+def make_source(api, store=None, chat_id='@SoSoValue_CN'):
+    return TelegramChannelSource('TOKEN', chat_id, store or MemoryStore(), api_base=api.base, poll_timeout=0)
+
+
+def test_entities_become_html_with_utf16_offsets():
+    text = "🚀 1/ 比特币 – source\nhttps://x.com & <b>"
+    # 🚀 占两个 UTF-16 码元，后面的偏移都要按码元计算
+    entities = [
+        {'type': 'bold', 'offset': 6, 'length': 3},
+        {'type': 'text_link', 'offset': 12, 'length': 6, 'url': 'https://t.me/a?b=1&c=2'},
+        {'type': 'url', 'offset': 19, 'length': 13},
+        {'type': 'mention', 'offset': 0, 'length': 2},
+    ]
+    assert message_to_html(text, entities) == (
+        '🚀 1/ <b>比特币</b> – <a href="https://t.me/a?b=1&amp;c=2">source</a><br>'
+        '<a href="https://x.com">https://x.com</a> &amp; &lt;b&gt;'
+    )
+
+
+def test_nested_entities_close_in_order():
+    entities = [{'type': 'bold', 'offset': 0, 'length': 5}, {'type': 'italic', 'offset': 2, 'length': 3}]
+    assert message_to_html('abcde', entities) == '<b>ab<i>cde</i></b>'
+
+
+def test_edited_post_keeps_link_and_uses_edit_date():
+    original = message_to_entry(post(1, 42, '每日加密热点新闻榜单｜2025/6/25\n1/ 旧')['channel_post'])
+    edited = message_to_entry(post(2, 42, '每日加密热点新闻榜单｜2025/6/25\n1/ 新', edited=True)['edited_channel_post'])
+    assert edited.id == original.id == 'https://t.me/SoSoValue_CN/42'
+    assert edited.title == '每日加密热点新闻榜单｜2025/6/25'
+    assert '1/ 新' in edited.summary
+    assert edited.published_parsed > original.published_parsed
+
+
+def test_private_channel_link_uses_internal_id():
+    chat = {'id': -1009876543210, 'type': 'channel'}
+    assert message_to_entry(post(1, 7, 'x', chat=chat)['channel_post']).link == 'https://t.me/c/9876543210/7'
+
+
+def test_offset_is_saved_only_after_confirm(api):
+    api.updates = [post(10, 1, 'one'), post(11, 2, 'two', edited=True),
+                   post(12, 3, 'other', chat={'id': -100555, 'username': 'other'})]
+    store = MemoryStore()
+    source = make_source(api, store)
+
+    entries = source.get_updates()
+    assert [entry.summary for entry in entries] == ['one', 'two']
+    assert 'offset' not in api.requests[-1][1]
+    assert 'telegram_offset' not in store.data
+
+    # 未确认就重新拉取时，Telegram 会再次返回同一批
+    assert [entry.summary for entry in make_source(api, store).get_updates()] == ['one', 'two']
+
+    source.confirm()
+    assert store.data['telegram_offset'] == {'offset': 13}
+    assert store.flushes == 1
+    assert make_source(api, store).get_updates() == []
+    assert api.requests[-1][1]['offset'] == '13'
+
+
+def test_poll_forever_redelivers_batch_after_handler_failure(api, monkeypatch):
+    api.updates = [post(20, 1, 'one'), post(21, 2, 'two')]
+    store = MemoryStore()
+    source = make_source(api, store)
+    monkeypatch.setattr('telegram_source.time.sleep', lambda seconds: None)
+    stop = threading.Event()
+    batches = []
+
+    def handler(entries):
+        batches.append([entry.summary for entry in entries])
+        if len(batches) == 1:
+            raise RuntimeError('slack down')
+        if len(batches) == 2:
+            return False
+        stop.set()
+        return True
+
+    source.poll_forever(handler, stop)
+    assert batches == [['one', 'two']] * 3
+    assert store.data['telegram_offset'] == {'offset': 22}
+
+
+def test_poll_forever_confirms_updates_from_other_chats(api):
+    api.updates = [post(30, 1, 'elsewhere', chat={'id': -100555, 'username': 'other'})]
+    store = MemoryStore()
+    source = make_source(api, store)
+    stop = threading.Event()
+    original = source.get_updates
+
+    def get_updates_once(timeout=None):
+        entries = original(timeout)
+        stop.set()
+        return entries
+
+    source.get_updates = get_updates_once
+    source.poll_forever(lambda entries: pytest.fail('不应处理其他频道的消息'), stop)
+    assert store.data['telegram_offset'] == {'offset': 31}
@@ -0,0 +1,97 @@
+"""流量录制与回放测试：录制一段会话后回放，订阅源和 Slack 调用得到与录制时相同的结果和异常类型"""
+
+import pytest
+import requests
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.slack_response import SlackResponse
+
+import mirror_fetch
+import resilience
+import traffic
+from config import Config
+from mirror_fetch import ResponseTooLarge, download
+from traffic import TrafficWebClient
+
+FEED = b'<rss version="2.0"><channel><title>\xe6\xb5\x8b\xe8\xaf\x95</title></channel></rss>'
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    """切换录制/回放模式，每次切换都重新打开档案"""
+    path = str(tmp_path / 'traffic.jsonl.gz')
+    monkeypatch.setattr(Config, 'TRAFFIC_ARCHIVE', path)
+    monkeypatch.setattr(Config, 'REPLAY_SPEED', 0)
+
+    def use(mode):
+        if traffic._archive is not None:
+            traffic._archive.close()
+        monkeypatch.setattr(traffic, '_archive', None)
+        monkeypatch.setattr(Config, 'TRAFFIC_MODE', mode)
+        with resilience._breakers_lock:
+            resilience._breakers.clear()
+
+    yield use
+    if traffic._archive is not None:
+        traffic._archive.close()
+
+
+def outcome(call):
+    try:
+        return 'ok', call()
+    except Exception as e:
+        return type(e), str(e)
+
+
+def feed_session():
+    return [outcome(lambda: download('https://rsshub.app/telegram/channel/a', {}, 1024)) for _ in range(3)]
+
+
+def slack_session(client):
+    return [outcome(lambda: client.api_call('chat_postMessage', json={'channel': 'C1'}).data) for _ in range(3)]
+
+
+def test_replay_reproduces_recorded_feed_outcomes(archive, monkeypatch):
+    results = [FEED, requests.Timeout('read timed out'), ResponseTooLarge('超过 1024 字节')]
+
+    def live_download(*args):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    archive('record')
+    monkeypatch.setattr(mirror_fetch, '_download', live_download)
+    recorded = feed_session()
+    assert [kind for kind, _ in recorded] == ['ok', requests.Timeout, ResponseTooLarge]
+
+    archive('replay')
+    monkeypatch.setattr(mirror_fetch, '_download', lambda *args: pytest.fail('回放时不应访问网络'))
+    assert feed_session() == recorded
+
+
+def test_replay_reproduces_recorded_slack_outcomes(archive, monkeypatch):
+    replies = [{'ok': True, 'ts': '1.0'}, {'ok': False, 'error': 'channel_not_found'}, TimeoutError('timed out')]
+
+    def live_api_call(self, api_method, **kwargs):
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return SlackResponse(client=self, http_verb='POST', api_url=self.base_url + api_method, req_args=kwargs,
+                             data=reply, headers={}, status_code=200).validate()
+
+    archive('record')
+    monkeypatch.setattr(WebClient, 'api_call', live_api_call)
+    recorded = slack_session(TrafficWebClient(token='xoxb-test'))
+    assert [kind for kind, _ in recorded] == ['ok', SlackApiError, TimeoutError]
+
+    archive('replay')
+    monkeypatch.setattr(WebClient, 'api_call', lambda *args, **kwargs: pytest.fail('回放时不应访问网络'))
+    assert slack_session(TrafficWebClient(token='xoxb-test')) == recorded
+
+
+def test_unknown_recorded_error_falls_back_to_oserror():
+    error = traffic._replay_error({'error': 'Boom: x', 'error_type': 'not_loaded.Boom', 'message': 'x'}, OSError)
+    assert type(error) is OSError and str(error) == 'Boom: x'
+    # 旧档案没有记录异常类
+    assert type(traffic._replay_error({'error': 'ConnectionError: down'}, OSError)) is OSError
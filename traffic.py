@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+流量录制与回放
+录制模式把订阅源原始响应和所有 Slack Web API 请求/响应写入一个 gzip 压缩的 JSON Lines 档案；
+回放模式从档案按顺序返回响应（可按原始耗时或加速等待），不访问网络，用于离线复现格式问题和性能回归
+"""
+
+import atexit
+import base64
+import gzip
+import json
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from slack_sdk import WebClient
+from slack_sdk.web.slack_response import SlackResponse
+from config import Config
+
+
+class ReplayMissing(LookupError):
+    """档案中没有对应的录制记录"""
+
+
+def _encode_body(body):
+    # 文本直接存放，压缩效果比 base64 好；二进制内容才用 base64
+    try:
+        return {'text': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'b64': base64.b64encode(body).decode('ascii')}
+
+
+def _decode_body(event):
+    if 'text' in event:
+        return event['text'].encode('utf-8')
+    return base64.b64decode(event['b64'])
+
+
+def _replay_error(event, default):
+    """按录制时的异常类重新构造异常（如 requests.Timeout、ResponseTooLarge），调用方走与实际运行相同的分支；
+    只使用已导入模块中的异常类，找不到或无法构造时（包括旧档案）用 default"""
+    module_name, _, name = event.get('error_type', '').rpartition('.')
+    cls = getattr(sys.modules.get(module_name), name, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        try:
+            return cls(event.get('message', event['error']))
+        except TypeError:
+            pass
+    return default(event['error'])
+
+
+class TrafficArchive:
+    """录制或回放一个档案"""
+
+    def __init__(self, mode, path, speed=1.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"不支持的流量模式: {mode}")
+        self.mode = mode
+        self.path = path
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        if mode == 'record':
+            self.file = gzip.open(path, 'wt', encoding='utf-8')
+            atexit.register(self.close)
+        else:
+            self.events = defaultdict(deque)
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    event = json.loads(line)
+                    self.events[(event['kind'], event['key'])].append(event)
+
+    def write(self, event):
+        event['at'] = round(time.monotonic() - self.start, 4)
+        with self.lock:
+            self.file.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def close(self):
+        if self.mode == 'record':
+            with self.lock:
+                if not self.file.closed:
+                    self.file.close()
+
+    def next_event(self, kind, key):
+        """按录制顺序取出下一条记录，并按回放速度模拟原始耗时"""
+        with self.lock:
+            queue = self.events.get((kind, key))
+            if not queue:
+                raise ReplayMissing(f"回放档案中没有更多记录: {kind} {key}")
+            event = queue.popleft()
+        if self.speed > 0:
+            time.sleep(event['elapsed'] / self.speed)
+        return event
+
+    def record_call(self, kind, key, call, encode, extra=None):
+        """执行真实请求并记录结果或异常"""
+        start = time.monotonic()
+        event = {'kind': kind, 'key': key, **(extra or {})}
+        try:
+            result = call()
+        except Exception as e:
+            event.update(elapsed=round(time.monotonic() - start, 4), error=f"{type(e).__name__}: {e}",
+                         error_type=f"{type(e).__module__}.{type(e).__qualname__}", message=str(e))
+            response = getattr(e, 'response', None)
+            if isinstance(response, SlackResponse):
+                # Slack 返回的错误（ok=false）按正常响应保存，回放时同样抛出 SlackApiError
+                for field in ('error', 'error_type', 'message'):
+                    event.pop(field)
+                event.update(encode(response))
+            self.write(event)
+            raise
+        event.update(elapsed=round(time.monotonic() - start, 4), **encode(result))
+        self.write(event)
+        return result
+
+    def feed(self, url, fetch):
+        """订阅源下载：fetch 返回解压后的字节"""
+        if self.mode == 'record':
+            return self.record_call('feed', url, fetch, _encode_body)
+        event = self.next_event('feed', url)
+        if 'error' in event:
+            raise _replay_error(event, OSError)
+        return _decode_body(event)
+
+    def slack(self, client, api_method, http_verb, request, call):
+        """Slack Web API 调用：call 执行真实请求并返回 SlackResponse"""
+        if self.mode == 'record':
+            encode = lambda response: {'status': response.status_code, 'headers': dict(response.headers),
+                                       'data': response.data}
+            return self.record_call('slack', api_method, call, encode, {'request': request})
+        event = self.next_event('slack', api_method)
+        if 'error' in event:
+            raise _replay_error(event, ConnectionError)
+        response = SlackResponse(client=client, http_verb=http_verb, api_url=client.base_url + api_method,
+                                 req_args=request, data=event['data'], headers=event['headers'],
+                                 status_code=event['status'])
+        return response.validate()
+
+
+class TrafficWebClient(WebClient):
+    """经过录制/回放的 WebClient"""
+
+    def api_call(self, api_method, *, http_verb='POST', files=None, data=None, params=None,
+                 json=None, headers=None, auth=None):
+        # 只记录请求参数，不记录 token 和上传文件内容
+        request = {'params': params, 'json': json, 'data': data, 'files': sorted(files) if files else None}
+        call = lambda: super(TrafficWebClient, self).api_call(
+            api_method, http_verb=http_verb, files=files, data=data, params=params,
+            json=json, headers=headers, auth=auth)
+        return get_traffic().slack(self, api_method, http_verb, request, call)
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_traffic():
+    """按 TRAFFIC_MODE 返回进程内共用的档案，未启用时返回 None"""
+    global _archive
+    if not Config.TRAFFIC_MODE:
+        return None
+    with _archive_lock:
+        if _archive is None:
+            _archive = TrafficArchive(Config.TRAFFIC_MODE, Config.TRAFFIC_ARCHIVE, Config.REPLAY_SPEED)
+        return _archive
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+多工作区路由
+一个进程服务多个 Slack 工作区：每个 token 复用同一个 WebClient，每个工作区有独立的限流配额，
+订阅源与频道的对应关系由 WORKSPACES_FILE 配置；每个工作区有一个熔断器，Slack 不可用时请求立即失败
+"""
+
+import json
+import os
+import threading
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+from config import Config
+from rate_limit import RateLimiter
+from resilience import DeadlineExceeded, check_deadline, get_breaker
+from traffic import TrafficWebClient, get_traffic
+
+DEFAULT_FEED = 'default'
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_slack_client(token=None):
+    """按 token 返回进程内共用的 WebClient，遇到 429 时按 Retry-After 自动重试；启用 TRAFFIC_MODE 时经过录制/回放"""
+    token = token or Config.SLACK_BOT_TOKEN
+    with _clients_lock:
+        client = _clients.get(token)
+        if client is None:
+            client_class = TrafficWebClient if get_traffic() else WebClient
+            client = client_class(token=token, timeout=Config.SLACK_TIMEOUT,
+                                  retry_handlers=[RateLimitErrorRetryHandler(max_retry_count=3)])
+            _clients[token] = client
+        return client
+
+
+def is_slack_outage(e):
+    """Slack 调用异常是否说明服务不可用：网络错误、5xx 和重试后仍然 429 计入，channel_not_found 等业务错误不计入"""
+    if isinstance(e, DeadlineExceeded):
+        return None
+    if isinstance(e, SlackApiError):
+        status = getattr(e.response, 'status_code', 0)
+        return status >= 500 or status == 429
+    return True
+
+
+class Workspace:
+    """一个 Slack 工作区：客户端、限流器和 订阅源 -> 频道 路由"""
+
+    def __init__(self, name, token, routes, rate_per_second=1.0, rate_limiter=None):
+        self.name = name
+        self.token = token
+        self.routes = routes
+        self.rate_per_second = rate_per_second
+        self.client = get_slack_client(token)
+        self.rate_limiter = rate_limiter or RateLimiter(rate_per_second)
+        self.breaker = get_breaker(f"slack:{name}")
+
+    def call(self, method, **kwargs):
+        """经过熔断器和限流器调用 Slack API；熔断中抛出 CircuitOpen，本轮时限已到时抛出 DeadlineExceeded"""
+        check_deadline()
+
+        def request():
+            self.rate_limiter.acquire()
+            check_deadline()
+            return getattr(self.client, method)(**kwargs)
+
+        return self.breaker.call(request, is_slack_outage)
+
+    def channels_for(self, feed):
+        return self.routes.get(feed, [])
+
+
+def reuse_workspace(previous, name, token, routes, rate_per_second):
+    """重新加载时按名称复用工作区：配置完全相同时返回原对象，只有路由变化时沿用原来的限流器，
+    token 或速率变化时新建"""
+    old = previous.workspaces.get(name) if previous is not None else None
+    if old is None or old.token != token or old.rate_per_second != rate_per_second:
+        return Workspace(name, token, routes, rate_per_second)
+    if old.routes == routes:
+        return old
+    return Workspace(name, token, routes, rate_per_second, rate_limiter=old.rate_limiter)
+
+
+class WorkspaceRegistry:
+    """工作区和订阅源注册表"""
+
+    def __init__(self, workspaces, feeds):
+        self.workspaces = {workspace.name: workspace for workspace in workspaces}
+        self.feeds = feeds
+        self.default = workspaces[0]
+
+    @classmethod
+    def load(cls, path=None, previous=None):
+        """从 WORKSPACES_FILE 加载；未配置时使用 .env 中的单个工作区。
+        previous 为重新加载前的注册表，配置未变的工作区沿用原对象，限流配额不会因为重新加载而重置"""
+        path = path or Config.WORKSPACES_FILE
+        if not path or not os.path.exists(path):
+            workspace = reuse_workspace(previous, 'default', Config.SLACK_BOT_TOKEN,
+                                        {DEFAULT_FEED: [Config.SLACK_TARGET_CHANNEL]},
+                                        Config.SLACK_RATE_PER_SECOND)
+            return cls([workspace], {DEFAULT_FEED: Config.RSS_FEED_PATH})
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        feeds = data.get('feeds') or {DEFAULT_FEED: Config.RSS_FEED_PATH}
+        workspaces = []
+        for item in data['workspaces']:
+            # token 可直接写在文件里，也可以用 token_env 指向环境变量
+            token = item.get('token') or os.getenv(item.get('token_env', ''))
+            if not token:
+                raise ValueError(f"工作区 {item['name']} 没有配置 token")
+            workspaces.append(reuse_workspace(previous, item['name'], token, item.get('routes', {}),
+                                              item.get('rate_per_second', Config.SLACK_RATE_PER_SECOND)))
+        return cls(workspaces, feeds)
+
+    def get(self, name):
+        """按名称查找工作区，找不到时返回默认工作区"""
+        return self.workspaces.get(name, self.default)
+
+    def routes_for(self, feed):
+        """订阅过该订阅源的 (工作区, 频道) 列表"""
+        return [(workspace, channel)
+                for workspace in self.workspaces.values()
+                for channel in workspace.channels_for(feed)]